@@ -3,11 +3,12 @@
 
 import adsk.core
 import adsk.fusion
-import json
 import math
 import os
 import  traceback
 
+from . import offsets_attributes
+from . import offsets_batch
 from . import offsets_draw
 from . import offsets_reader
 
@@ -18,9 +19,10 @@ _ui  = None
 # Global set of event handlers to keep them referenced for the duration of the command
 _handlers = []
 
-# current set of offset data points (a dicitonary of lines and cross sections)
-_offset_data = {} # TODO: pass values in attributes
-_user_filename = '' # TODO: save in attributes
+# current set of hulls, (filename, offset data) pairs where the offset data is a
+# dicitonary of lines and cross sections, read from the files the user picked
+# or from the design attributes they were saved in
+_hulls = []
 
 # Command inputs
 _roTextBox = adsk.core.TextBoxCommandInput.cast(None)
@@ -29,6 +31,10 @@ _bowAngle = adsk.core.ValueCommandInput.cast(None)
 _transomAngle = adsk.core.ValueCommandInput.cast(None)
 _scaleFactor = adsk.core.ValueCommandInput.cast(None)
 _halfHull = adsk.core.DropDownCommandInput.cast(None)
+_loftBody = adsk.core.DropDownCommandInput.cast(None)
+_splineTolerance = adsk.core.ValueCommandInput.cast(None)
+_layout = adsk.core.DropDownCommandInput.cast(None)
+_layoutGap = adsk.core.ValueCommandInput.cast(None)
 _errMessage = adsk.core.TextBoxCommandInput.cast(None)
 
 
@@ -77,37 +83,60 @@ class IotCommandExecuteHandler(adsk.core.CommandEventHandler):
             eventArgs = adsk.core.CommandEventArgs.cast(args)
             unitsMgr = _app.activeProduct.unitsManager
 
-            global _offset_data, _user_filename
-
-            if not _offset_data:
+            if not _hulls:
                 _ui.messageBox('Load an offset table')
                 return
 
             # Run the actual command code here
             des = adsk.fusion.Design.cast(_app.activeProduct)
-            attribs = des.attributes
-            attribs.add('ImportOffset', 'filename', str(_user_filename))
-
-            bindex = 0
-            tindex = len(_offset_data['sections']) - 1
 
-            if 'angle' in _offset_data:
-                bowAngle = _offset_data['angle'][bindex]
-                transomAngle = _offset_data['angle'][tindex]
-            else:
-                bowAngle = math.degrees(unitsMgr.evaluateExpression(_bowAngle.expression, "deg"))
-                transomAngle = math.degrees(unitsMgr.evaluateExpression(_transomAngle.expression, "deg"))
-
-            _offset_data = offsets_reader.rake_angle(_offset_data, bindex, 90 - bowAngle)
-            _offset_data = offsets_reader.rake_angle(_offset_data, tindex, 90 - transomAngle)
+            # the angles for tables that do not give their own
+            bowAngle = math.degrees(unitsMgr.evaluateExpression(_bowAngle.expression, "deg"))
+            transomAngle = math.degrees(unitsMgr.evaluateExpression(_transomAngle.expression, "deg"))
 
             if _halfHull.selectedItem.name == 'Full':
                 half_hull = False
             else:
                 half_hull = True
 
+            # Wireframe only, or loft a solid or surface body as well
+            loft = _loftBody.selectedItem.name.lower()
+
             scale_factor = float(_scaleFactor.value)
-            offsets_draw.draw(des, _offset_data, scale_factor, half_hull)
+            tolerance = float(_splineTolerance.value)
+
+            # Several hulls are either laid over each other or side by side
+            side_by_side = _layout.selectedItem.name == 'Side by Side'
+            gap = float(_layoutGap.value)
+
+            # Keep the hulls and settings in the design so they can be drawn
+            # again without the tables, then draw from what was kept
+            offsets_attributes.save_hulls(des.attributes, _hulls,
+                                          bowAngle=math.radians(bowAngle),
+                                          transomAngle=math.radians(transomAngle),
+                                          scaleFactor=scale_factor,
+                                          halfHull=half_hull, loftBody=loft,
+                                          splineTolerance=tolerance,
+                                          sideBySide=side_by_side,
+                                          layoutGap=gap)
+            hulls = []
+            for filename, offset_data in offsets_attributes.load_hulls(des.attributes):
+                bindex = 0
+                tindex = len(offset_data['sections']) - 1
+                if 'angle' in offset_data:
+                    bow = offset_data['angle'][bindex]
+                    transom = offset_data['angle'][tindex]
+                else:
+                    bow, transom = bowAngle, transomAngle
+                offset_data = offsets_reader.rake_angle(offset_data, bindex, 90 - bow)
+                offset_data = offsets_reader.rake_angle(offset_data, tindex, 90 - transom)
+                hulls.append(offset_data)
+
+            if loft == 'wireframe':
+                loft = None
+            offsets = offsets_batch.layout(hulls, gap if side_by_side else None)
+            offsets_draw.draw_all(des, hulls, scale_factor, half_hull, loft,
+                                  tolerance, offsets)
 
         except:
             if _ui:
@@ -123,22 +152,19 @@ class IotCommandInputChangedHandler(adsk.core.InputChangedEventHandler):
             eventArgs = adsk.core.InputChangedEventArgs.cast(args)
             changedInput = eventArgs.input
 
-            global _roTextBox, _offset_data # TODO: pass values in attributes
+            global _roTextBox, _hulls
 
             # Determine what changed from changedInput.id and act on it
             if changedInput.id == 'select_file_button':
-                filename = get_user_file()
-                if filename:
-                    fn = os.path.split(filename)[-1]
-                    if filename.endswith('.json'):
-                        _roTextBox.text = 'Using:\n{}'.format(fn)
-                        with open(filename, 'r') as f:
-                            _offset_data = json.load(f)
-                            _user_filename = filename
-                    elif filename.endswith('.csv'):
-                        _roTextBox.text = 'Using:\n{}'.format(fn)
-                        _offset_data = offsets_reader.offset_reader(filename)
-                        _user_filename = filename
+                filenames = get_user_files()
+                if filenames:
+                    # read all the tables up front on worker threads
+                    hulls = offsets_batch.read_tables(filenames)
+                    _hulls = [(hull.filename, hull.offset_data) for hull in hulls
+                              if hull.offset_data]
+                    text = ['Using:'] + [os.path.split(f)[-1] for f, _ in _hulls]
+                    text += [hull.error for hull in hulls if hull.error]
+                    _roTextBox.text = '\n'.join(text)
 
         except:
             if _ui:
@@ -174,7 +200,12 @@ class IotCommandValidateInputsHandler(adsk.core.ValidateInputsEventHandler):
                 eventArgs.areInputsValid = False
                 return
 
-            if not _offset_data:
+            if _splineTolerance.value < 0:
+                _errMessage.text = 'spline tolerance must not be negative'
+                eventArgs.areInputsValid = False
+                return
+
+            if not _hulls:
                 _errMessage.text = 'Select a file to import'
                 eventArgs.areInputsValid = False
                 return
@@ -202,24 +233,27 @@ class IotCommandCreatedHandler(adsk.core.CommandCreatedEventHandler):
 
             getOffsetFile = False
 
-            initialBowAngle = 90.0 * (math.pi / 180)
-            bowAngleAttrib = des.attributes.itemByName('ImportOffset', 'bowAngle')
-            if bowAngleAttrib:
-                initialBowAngle = bowAngleAttrib.value
-
-            initialTransomAngle = 90.0 * (math.pi / 180)
-            transomAngleAttrib = des.attributes.itemByName('ImportOffset', 'transomAngle')
-            if transomAngleAttrib:
-                initialTransomAngle = transomAngleAttrib.value
-
-            scaleFactor = '0.1'
-            scaleFactorAttrib = des.attributes.itemByName('ImportOffset', 'scaleFactor')
-            if scaleFactorAttrib:
-                scaleFactor = scaleFactorAttrib.value
+            # Start from the settings and hull saved in the design, if any
+            settings = offsets_attributes.load_settings(des.attributes)
+            initialBowAngle = settings['bowAngle']
+            initialTransomAngle = settings['transomAngle']
+            scaleFactor = settings['scaleFactor']
+
+            global _hulls
+            savedMessage = ''
+            try:
+                saved = offsets_attributes.load_hulls(des.attributes)
+                if saved:
+                    _hulls = saved
+                    savedMessage = '\n'.join(['Using (saved in the design):'] +
+                        [os.path.split(f)[-1] or 'offsets table' for f, _ in saved])
+            except ValueError as e:
+                savedMessage = str(e)
 
             # Connect to the variable the command will provide inputs for
             global _roTextBox, _getOffsetFile, _bowAngle, _transomAngle
-            global _scaleFactor, _halfHull, _errMessage
+            global _scaleFactor, _halfHull, _loftBody, _splineTolerance
+            global _layout, _layoutGap, _errMessage
 
             # Connect to additional command created events
             onDestroy = IotCommandDestroyHandler()
@@ -245,7 +279,7 @@ class IotCommandCreatedHandler(adsk.core.CommandCreatedEventHandler):
             inputs = cmd.commandInputs
 
             # Create a read only textbox input. 2nd param is a field lable
-            _roTextBox = inputs.addTextBoxCommandInput('readonly_textBox_1', '', '', 2, True)
+            _roTextBox = inputs.addTextBoxCommandInput('readonly_textBox_1', '', savedMessage, 2, True)
             _roTextBox.isFullWidth = True
 
             # Add additional UI widgets here
@@ -260,11 +294,29 @@ class IotCommandCreatedHandler(adsk.core.CommandCreatedEventHandler):
 
             _scaleFactor = inputs.addValueInput('scaleFactor', 'Scale Factor', '', adsk.core.ValueInput.createByReal(float(scaleFactor)))
 
+            # Table units the splines may stray from the points, 0 uses every point
+            _splineTolerance = inputs.addValueInput('splineTolerance', 'Spline Tolerance', '', adsk.core.ValueInput.createByReal(settings['splineTolerance']))
+
             # Create dropdown input with radio style.
             _halfHull = inputs.addDropDownCommandInput('Generate Hull', 'Generate Hull', adsk.core.DropDownStyles.LabeledIconDropDownStyle);
             halfHullItems = _halfHull.listItems
-            halfHullItems.add('Half', True, '')
-            halfHullItems.add('Full', False, '')
+            halfHullItems.add('Half', settings['halfHull'], '')
+            halfHullItems.add('Full', not settings['halfHull'], '')
+
+            # Create dropdown input choosing the body lofted through the sections
+            _loftBody = inputs.addDropDownCommandInput('Loft Body', 'Loft Body', adsk.core.DropDownStyles.LabeledIconDropDownStyle);
+            loftBodyItems = _loftBody.listItems
+            for name in ('Wireframe', 'Solid', 'Surface'):
+                loftBodyItems.add(name, name.lower() == settings['loftBody'], '')
+
+            # Create dropdown input placing several hulls over or beside each other
+            _layout = inputs.addDropDownCommandInput('Layout', 'Layout', adsk.core.DropDownStyles.LabeledIconDropDownStyle);
+            layoutItems = _layout.listItems
+            layoutItems.add('Overlaid', not settings['sideBySide'], '')
+            layoutItems.add('Side by Side', settings['sideBySide'], '')
+
+            # Table units between the hulls laid side by side
+            _layoutGap = inputs.addValueInput('layoutGap', 'Layout Gap', '', adsk.core.ValueInput.createByReal(settings['layoutGap']))
 
             # Add an error message box at bottom
             _errMessage = inputs.addTextBoxCommandInput('errMessage', '', '', 2, True)
@@ -274,17 +326,16 @@ class IotCommandCreatedHandler(adsk.core.CommandCreatedEventHandler):
             _ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
 
 
-def get_user_file():
-    '''User select offset file to open'''
+def get_user_files():
+    '''User select offset files to open'''
     # Set up the file dialog.
     fileDlg = _ui.createFileDialog()
-    fileDlg.isMultiSelectEnabled = False
+    fileDlg.isMultiSelectEnabled = True
     fileDlg.title = 'Open'
     fileDlg.filter = '*.json;*.csv'
     dlgResult = fileDlg.showOpen()
     if dlgResult == adsk.core.DialogResults.DialogOK:
-        user_file = fileDlg.filenames[0]
-        return user_file
+        return list(fileDlg.filenames)
     else:
         return None
 
@@ -0,0 +1,718 @@
+# -*- coding: utf-8 -*-
+
+"""
+The linestable command. One entry point for the conversions that are
+otherwise spread over the offsets_*.py scripts:
+
+    linestable convert table.csv        offset_data JSON (table.json)
+    linestable scad table.csv           OpenSCAD model (table.scad)
+    linestable mesh table.csv           STL mesh (table.stl)
+    linestable plan table.csv           lines plan drawing (table.svg)
+    linestable panels table.csv         flat panel patterns (table.panels.svg)
+    linestable frames table.csv         station mold cut files (table.frames.nc)
+    linestable bevels table.csv         bevel table for the molds (table.bevels.csv)
+    linestable profile table.csv        keel, stem, sternpost and sheer (table.profile.csv)
+    linestable nest table.csv           molds and panels on sheets (table.nest.svg)
+    linestable hydro table.csv          section areas and volume
+    linestable resample table.csv new.csv --stations 40
+    linestable table table.csv -o new.csv --units fie
+    linestable scan hull.ply hull.csv   table from a point cloud scan
+    linestable slice hull.stl hull.csv  table from an STL mesh
+    linestable library update lib/      index a folder of tables
+    linestable library similar lib/ new.csv -n 5
+    linestable validate *.csv           check tables for mistakes
+    linestable bench                    time each stage of the pipeline
+
+Only argparse is imported up front. Each subcommand imports the modules
+it needs when it runs, so the common convert path starts quickly when
+build scripts call it for every table.
+"""
+
+__author__ = "Robert Marchese"
+__version__ = "0.1.0"
+__license__ = "MIT"
+
+import argparse
+import importlib
+import os
+import sys
+
+
+def _load(name):
+    '''Import a sibling module when a subcommand needs it'''
+    if __package__:
+        return importlib.import_module('.' + name, __package__)
+    return importlib.import_module(name)
+
+
+def _output(args, filename, ext):
+    if args.output:
+        return args.output
+    return os.path.splitext(filename)[0] + ext
+
+
+def _open(filename, mode='w', newline=None):
+    '''Open an output file, '-' is stdout'''
+    if filename == '-':
+        return os.fdopen(os.dup(sys.stdout.fileno()), mode, newline=newline)
+    return open(filename, mode, newline=newline)
+
+
+def _offset_data(args, filename, rake=True, rows=None):
+    '''The offset_data of a table, from its rows when they were already
+    read'''
+    reader = _load('offsets_reader')
+    if rows is None:
+        offset_data = reader.offset_reader(filename)
+    else:
+        offset_data = reader.offsets_from_rows(rows)
+    if rake:
+        offset_data = reader.rake_ends(offset_data, args.bow_angle,
+                                       args.transom_angle)
+    return offset_data
+
+
+def convert(args):
+    if args.chunked:
+        for option, given in (('--area-curve', args.area_curve),
+                              ('--backend', args.backend != 'json')):
+            if given:
+                sys.stderr.write('linestable convert: {0} needs the whole '
+                                 'table, leave out --chunked\n'.format(option))
+                return 2
+        chunked = _load('offsets_chunked')
+        for filename in args.filenames:
+            chunked.convert(filename, ['json'], args.bow_angle,
+                            args.transom_angle, args.block, args.precision,
+                            output=args.output)
+        return 0
+
+    writer = _load('offsets_writer')
+    for filename in args.filenames:
+        if args.area_curve:
+            # the areas are of the square sections, before the ends are
+            # raked
+            offset_data = _offset_data(args, filename, rake=False)
+            curve = _load('offsets_hydro').area_curve(
+                offset_data['sections'], args.waterline,
+                args.rule or 'simpson')
+            offset_data = _load('offsets_reader').rake_ends(
+                offset_data, args.bow_angle, args.transom_angle)
+            offset_data['area_curve'] = curve
+        else:
+            offset_data = _offset_data(args, filename)
+        with _open(_output(args, filename, '.json')) as opf:
+            writer.write_json(opf, offset_data, args.precision, args.backend)
+    return 0
+
+
+def scad(args):
+    offsets_scad = _load('offsets_scad')
+    for filename in args.filenames:
+        offset_data = _offset_data(args, filename)
+        with _open(_output(args, filename, '.scad')) as opf:
+            offsets_scad.write_scad(opf, offset_data,
+                                    os.path.basename(filename),
+                                    not args.full, args.scale)
+    return 0
+
+
+def mesh(args):
+    if args.chunked:
+        if args.output == '-' or args.ascii:
+            sys.stderr.write('linestable mesh: --chunked writes a binary '
+                             'mesh to a file, leave out --ascii and -o -\n')
+            return 2
+        chunked = _load('offsets_chunked')
+        for filename in args.filenames:
+            chunked.convert(filename, ['stl'], args.bow_angle,
+                            args.transom_angle, args.block,
+                            half_hull=not args.full, output=args.output)
+        return 0
+
+    offsets_mesh = _load('offsets_mesh')
+    for filename in args.filenames:
+        offset_data = _offset_data(args, filename)
+        triangles = offsets_mesh.hull_triangles(offset_data['sections'],
+                                                not args.full)
+        with _open(_output(args, filename, '.stl'), 'wb') as opf:
+            offsets_mesh.write_stl(opf, triangles, binary=not args.ascii)
+    return 0
+
+
+def plan(args):
+    offsets_plan = _load('offsets_plan')
+    for filename in args.filenames:
+        offset_data = _offset_data(args, filename)
+        with _open(_output(args, filename, '.' + args.format)) as opf:
+            offsets_plan.write_plan(opf, offset_data, args.format,
+                                    args.tolerance, args.scale, args.units)
+    return 0
+
+
+def panels(args):
+    reader = _load('offsets_reader')
+    offsets_panels = _load('offsets_panels')
+    for filename in args.filenames:
+        lines, line_order, angles = reader.parse_csv_offsets(filename)
+        offset_data = reader.rake_ends(
+            reader.offsets_from_lines(lines, line_order, angles),
+            args.bow_angle, args.transom_angle)
+        names = args.lines.split(',') if args.lines else \
+            [name for name in line_order if name in lines]
+        developed = offsets_panels.develop(offset_data, names,
+                                           args.centerline)
+        sys.stdout.write('{0}\n'.format(filename))
+        offsets_panels.report(developed)
+        with _open(_output(args, filename, '.panels.' + args.format)) as opf:
+            offsets_panels.write_patterns(opf, developed, args.format,
+                                          args.tolerance, args.scale,
+                                          args.units)
+    return 0
+
+
+def frames(args):
+    reader = _load('offsets_reader')
+    offsets_frames = _load('offsets_frames')
+    for filename in args.filenames:
+        rows = reader.read_rows(filename)
+        offset_data = _offset_data(args, filename, rows=rows)
+        frame_list = offsets_frames.frames(offset_data, args.plank, args.kerf,
+                                           args.tab, args.tab_width,
+                                           reader.station_labels(rows),
+                                           args.base)
+        with _open(_output(args, filename, '.frames.' + args.format)) as opf:
+            if args.format == 'nc':
+                offsets_frames.write_gcode(opf, frame_list, args.depth,
+                                           args.pass_depth, args.feed)
+            else:
+                offsets_frames.write_drawing(opf, frame_list, args.format,
+                                             args.scale, args.units)
+    return 0
+
+
+def bevels(args):
+    reader = _load('offsets_reader')
+    offsets_bevel = _load('offsets_bevel')
+    for filename in args.filenames:
+        rows = reader.read_rows(filename)
+        offset_data = _offset_data(args, filename, rows=rows)
+        names = args.lines.split(',') if args.lines else None
+        table = offsets_bevel.bevels(offset_data, names, args.centerline,
+                                     reader.station_labels(rows))
+        write = offsets_bevel.write_json if args.format == 'json' else \
+            offsets_bevel.write_csv
+        with _open(_output(args, filename, '.bevels.' + args.format),
+                   newline='') as opf:
+            write(opf, table, args.digits)
+    return 0
+
+
+def profile(args):
+    offsets_profile = _load('offsets_profile')
+    for filename in args.filenames:
+        offset_data = _offset_data(args, filename)
+        outline = offsets_profile.profile(offset_data, args.refine,
+                                          args.method)
+        write = offsets_profile.write_json if args.format == 'json' else \
+            offsets_profile.write_csv
+        with _open(_output(args, filename, '.profile.' + args.format),
+                   newline='') as opf:
+            write(opf, outline, args.digits)
+    return 0
+
+
+def nest(args):
+    reader = _load('offsets_reader')
+    offsets_nest = _load('offsets_nest')
+    sheet = offsets_nest.parse_sheet(args.sheet)
+    rotations = [float(a) for a in args.rotations.split(',')]
+    for filename in args.filenames:
+        rows = reader.read_rows(filename)
+        offset_data = _offset_data(args, filename, rows=rows)
+        parts = offsets_nest.hull_parts(offset_data, args.plank, args.kerf,
+                                        gap=args.gap,
+                                        labels=reader.station_labels(rows))
+        placed, unplaced = offsets_nest.nest(parts, sheet, rotations)
+        sys.stdout.write('{0}\n'.format(filename))
+        offsets_nest.report(placed, unplaced, sheet)
+        with _open(_output(args, filename, '.nest.' + args.format)) as opf:
+            offsets_nest.write_layout(opf, placed, sheet, args.format,
+                                      args.scale, args.units)
+    return 0
+
+
+def hydro(args):
+    offsets_hydro = _load('offsets_hydro')
+    for filename in args.filenames:
+        result = offsets_hydro.area_curve(
+            _offset_data(args, filename, rake=False)['sections'],
+            args.waterline, args.rule or 'trapezoid')
+        if args.json:
+            import json
+            json.dump(result, sys.stdout)
+            sys.stdout.write('\n')
+            continue
+
+        sys.stdout.write('{0}\n'.format(filename))
+        sys.stdout.write('{0:>12}{1:>12}{2:>12}{3:>12}{4:>12}\n'.format(
+            'station', 'area', 'centroid x', 'centroid y', 'volume to'))
+        for z, a, (cx, cy), v in zip(result['stations'], result['areas'],
+                                     result['centroids'],
+                                     result['cumulative_volume']):
+            sys.stdout.write('{0:>12.3f}{1:>12.3f}{2:>12.3f}{3:>12.3f}'
+                             '{4:>12.3f}\n'.format(z, a, cx, cy, v))
+        sys.stdout.write('volume (half hull) {0:.3f}\n'.format(
+            result['volume']))
+        if result['volume']:
+            sys.stdout.write('center of volume {0:.3f}, half the volume '
+                             'forward of {1:.3f}\n'.format(
+                                 result['lcb'],
+                                 result['half_volume_station']))
+    return 0
+
+
+def resample(args):
+    offsets_resample = _load('offsets_resample')
+    offsets_resample.resample_file(args.filename, args.output, args.count,
+                                   args.spacing, args.method, args.units)
+    return 0
+
+
+def table(args):
+    reader = _load('offsets_reader')
+    writer = _load('offsets_writer')
+    for filename in args.filenames:
+        raw = reader.read_rows(filename)
+        lines, line_order, angles = reader.combine_offsets(
+            reader.munge_table(raw))
+        rows = writer.lines_rows(lines, line_order, angles, units=args.units,
+                                 digits=args.digits,
+                                 labels=reader.station_labels(raw))
+        with _open(_output(args, filename, '.' + args.units + '.csv'),
+                   newline='') as opf:
+            writer.write_rows(opf, rows)
+    return 0
+
+
+def _floats(text):
+    return [float(v) for v in text.split(',')] if text else []
+
+
+def _write_offsets(args, stations, heights, widths):
+    writer = _load('offsets_writer')
+    rows = writer.offsets_rows(stations, heights, widths, units=args.units,
+                               digits=args.digits)
+    with _open(args.output, newline='') as opf:
+        writer.write_rows(opf, rows)
+
+
+def _count(command, args):
+    if args.count < 2:
+        sys.stderr.write('linestable {0}: --count must be at least '
+                         '2\n'.format(command))
+        return False
+    return True
+
+
+def scan(args):
+    if not _count('scan', args):
+        return 2
+    offsets_scan = _load('offsets_scan')
+    stations, heights, widths = offsets_scan.scan_table(
+        args.filename, _floats(args.stations) or None, args.count,
+        _floats(args.waterlines), _floats(args.buttocks), args.slab,
+        args.resolution, args.axes)
+    _write_offsets(args, stations, heights, widths)
+    return 0
+
+
+def slice_stl(args):
+    if not _count('slice', args):
+        return 2
+    offsets_slice = _load('offsets_slice')
+    stations, heights, widths = offsets_slice.slice_table(
+        args.filename, _floats(args.stations) or None, args.count,
+        _floats(args.waterlines), _floats(args.buttocks), args.axes)
+    _write_offsets(args, stations, heights, widths)
+    return 0
+
+
+def library(args):
+    offsets_library = _load('offsets_library')
+    hulls, read = offsets_library.update(args.folder)
+    if args.action == 'update':
+        sys.stdout.write('{0} tables, {1} read\n'.format(len(hulls), read))
+        return 0
+
+    if not args.table:
+        sys.stderr.write('linestable library similar: give a table to '
+                         'compare\n')
+        return 2
+    reader = _load('offsets_reader')
+    vector = offsets_library.features(reader.offset_reader(args.table))
+    name = os.path.relpath(args.table, args.folder).replace(os.sep, '/')
+    offsets_library.report(offsets_library.similar(hulls, vector, args.count,
+                                                   exclude=[name]))
+    return 0
+
+
+def validate(args):
+    return _load('offsets_validate').main(args.filenames)
+
+
+def bench(argv):
+    offsets_bench = _load('offsets_bench')
+    return offsets_bench.main(
+        offsets_bench.build_parser('linestable bench').parse_args(argv))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='linestable',
+        description='Boat hull lines, sections and models from a table of '
+                    'offsets')
+    parser.add_argument(
+        "--version",
+        action="version",
+        version="%(prog)s (version {version})".format(version=__version__))
+
+    # Options shared by the subcommands that read tables
+    tables = argparse.ArgumentParser(add_help=False)
+    tables.add_argument("filenames", nargs='+',
+                        help="input .csv files (offset tables)")
+    tables.add_argument("-v", "--verbose", action="store_true",
+                        default=False, help="log the reader's debug output")
+    tables.add_argument("--timing", action="store", dest="timing",
+                        help="write a JSON timing report to this file "
+                             "('-' for stdout)")
+
+    angles = argparse.ArgumentParser(add_help=False)
+    angles.add_argument("-b", "--bow", action="store", type=float,
+                        dest="bow_angle", default=90,
+                        help="Angle of the bow measured from the baseline ")
+    angles.add_argument("-t", "--transom", action="store", type=float,
+                        dest="transom_angle", default=90,
+                        help="Angle of the transom measured from the "
+                             "baseline")
+
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument("-o", "--output", action="store", dest="output",
+                        help="output file for a single table ('-' for "
+                             "stdout), default next to the table")
+
+    chunked = argparse.ArgumentParser(add_help=False)
+    chunked.add_argument("--chunked", action="store_true", default=False,
+                         help="work through the stations in blocks to keep "
+                              "memory use low on very large tables")
+    chunked.add_argument("--block", action="store", type=int, default=1024,
+                         help="stations per block with --chunked")
+
+    waterline = argparse.ArgumentParser(add_help=False)
+    waterline.add_argument("-w", "--waterline", action="store", type=float,
+                           default=None,
+                           help="take the areas below this height (default "
+                                "up to the sheer)")
+    waterline.add_argument("--rule", choices=['simpson', 'trapezoid'],
+                           help="integration rule for the volumes (default "
+                                "simpson for convert, trapezoid for hydro)")
+
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    commands.required = True
+
+    p = commands.add_parser('convert', parents=[tables, angles, output,
+                                                chunked, waterline],
+                            help="write the lines and sections as JSON")
+    p.add_argument("-p", "--precision", action="store", default=None,
+                   help="round the coordinates to this resolution "
+                        "(eg. 1/64 or 0.01)")
+    p.add_argument("--backend", action="store", default='json',
+                   choices=['json', 'orjson', 'auto'],
+                   help="JSON encoder, orjson is faster when installed")
+    p.add_argument("--area-curve", action="store_true", dest="area_curve",
+                   default=False,
+                   help="add the sectional area curve and running volumes "
+                        "to the JSON")
+    p.set_defaults(func=convert)
+
+    p = commands.add_parser('scad', parents=[tables, angles, output],
+                            help="write an OpenSCAD model")
+    p.add_argument("--full", action="store_true", default=False,
+                   help="model both sides of the hull")
+    p.add_argument("-s", "--scale", action="store", type=float, default=1.0,
+                   help="scale the model (default 1)")
+    p.set_defaults(func=scad)
+
+    p = commands.add_parser('mesh', parents=[tables, angles, output,
+                                             chunked],
+                            help="write a closed STL mesh")
+    p.add_argument("--full", action="store_true", default=False,
+                   help="mesh both sides of the hull")
+    p.add_argument("--ascii", action="store_true", default=False,
+                   help="write an ASCII STL instead of binary")
+    p.set_defaults(func=mesh)
+
+    p = commands.add_parser('plan', parents=[tables, angles, output],
+                            help="draw the profile, half-breadth and body "
+                                 "plan")
+    p.add_argument("-f", "--format", choices=['svg', 'dxf'], default='svg',
+                   help="drawing format (default svg)")
+    p.add_argument("--tolerance", action="store", type=float, default=0.01,
+                   help="simplify the curves to within this distance in "
+                        "table units (default 0.01)")
+    p.add_argument("-s", "--scale", action="store", type=float, default=1.0,
+                   help="sheet units per table unit (default 1)")
+    p.add_argument("-u", "--units", action="store", default='in',
+                   help="SVG sheet units (default in)")
+    p.set_defaults(func=plan)
+
+    p = commands.add_parser('panels', parents=[tables, angles, output],
+                            help="develop the panels between the lines and "
+                                 "draw the flat patterns")
+    p.add_argument("-l", "--lines", action="store", dest="lines",
+                   help="comma separated lines to develop between (default "
+                        "every line in table order)")
+    p.add_argument("-c", "--centerline", action="store_true", default=False,
+                   help="add the panel from the lowest line to the center "
+                        "line")
+    p.add_argument("-f", "--format", choices=['svg', 'dxf'], default='svg',
+                   help="pattern format (default svg)")
+    p.add_argument("--tolerance", action="store", type=float, default=0.01,
+                   help="simplify the outlines to within this distance in "
+                        "table units (default 0.01)")
+    p.add_argument("-s", "--scale", action="store", type=float, default=1.0,
+                   help="sheet units per table unit (default 1)")
+    p.add_argument("-u", "--units", action="store", default='in',
+                   help="SVG sheet units (default in)")
+    p.set_defaults(func=panels)
+
+    p = commands.add_parser('frames', parents=[tables, angles, output],
+                            help="cut files for the station molds")
+    p.add_argument("-p", "--plank", action="store", type=float, default=0.0,
+                   help="plank thickness taken off the hull side")
+    p.add_argument("-k", "--kerf", action="store", type=float, default=0.0,
+                   help="width of the cut")
+    p.add_argument("--tab", action="store", type=float, default=0.0,
+                   help="height of the reference tabs above the sheer")
+    p.add_argument("--base", action="store", type=float, default=0.0,
+                   help="depth of the baseline below the lowest keel, each "
+                        "mold gets a tab down to it")
+    p.add_argument("--tab-width", action="store", type=float,
+                   dest="tab_width", default=None,
+                   help="width of the tabs (default a fifth of the half "
+                        "breadth)")
+    p.add_argument("-f", "--format", choices=['nc', 'dxf', 'svg'],
+                   default='nc', help="G-code or drawing (default nc)")
+    p.add_argument("--depth", action="store", type=float, default=0.75,
+                   help="depth of the cut, the sheet thickness (default "
+                        "0.75)")
+    p.add_argument("--pass-depth", action="store", type=float,
+                   dest="pass_depth", default=0.25,
+                   help="depth of each pass (default 0.25)")
+    p.add_argument("--feed", action="store", type=float, default=60.0,
+                   help="cutting feed rate (default 60)")
+    p.add_argument("-s", "--scale", action="store", type=float, default=1.0,
+                   help="sheet units per table unit (default 1)")
+    p.add_argument("-u", "--units", action="store", default='in',
+                   help="SVG sheet units (default in)")
+    p.set_defaults(func=frames)
+
+    p = commands.add_parser('bevels', parents=[tables, angles, output],
+                            help="gunwale, chine and mold bevels at each "
+                                 "station")
+    p.add_argument("-l", "--lines", action="store", dest="lines",
+                   help="comma separated lines down the section (default "
+                        "every line in table order)")
+    p.add_argument("-c", "--centerline", action="store_true", default=False,
+                   help="add the flat bottom out to the center line as a "
+                        "panel")
+    p.add_argument("-f", "--format", choices=['csv', 'json'], default='csv',
+                   help="table format (default csv)")
+    p.add_argument("-d", "--digits", action="store", type=int, default=1,
+                   help="decimal places (default 1)")
+    p.set_defaults(func=bevels)
+
+    p = commands.add_parser('profile', parents=[tables, angles, output],
+                            help="keel, stem, sternpost and sheer on the "
+                                 "center line")
+    p.add_argument("-r", "--refine", action="store", type=int, default=0,
+                   help="points added between stations from the lines")
+    p.add_argument("-m", "--method", choices=['linear', 'cubic', 'spline'],
+                   default='spline',
+                   help="interpolation along the lines (default spline)")
+    p.add_argument("-f", "--format", choices=['csv', 'json'], default='csv',
+                   help="profile format (default csv)")
+    p.add_argument("-d", "--digits", action="store", type=int, default=4,
+                   help="decimal places (default 4)")
+    p.set_defaults(func=profile)
+
+    p = commands.add_parser('nest', parents=[tables, angles, output],
+                            help="nest the molds and panels on sheets")
+    p.add_argument("--sheet", action="store", default="48x96",
+                   help="sheet size, width x height (default 48x96)")
+    p.add_argument("-g", "--gap", action="store", type=float, default=0.25,
+                   help="space left between parts (default 0.25)")
+    p.add_argument("-p", "--plank", action="store", type=float, default=0.0,
+                   help="plank thickness taken off the molds")
+    p.add_argument("-k", "--kerf", action="store", type=float, default=0.0,
+                   help="width of the cut")
+    p.add_argument("-r", "--rotations", action="store",
+                   default="0,90,180,270",
+                   help="comma separated angles parts may be turned "
+                        "(default 0,90,180,270)")
+    p.add_argument("-f", "--format", choices=['svg', 'dxf'], default='svg',
+                   help="layout format (default svg)")
+    p.add_argument("-s", "--scale", action="store", type=float, default=1.0,
+                   help="sheet units per table unit (default 1)")
+    p.add_argument("-u", "--units", action="store", default='in',
+                   help="SVG sheet units (default in)")
+    p.set_defaults(func=nest)
+
+    p = commands.add_parser('hydro', parents=[tables, waterline],
+                            help="print section areas, centroids and the "
+                                 "volume")
+    p.add_argument("--json", action="store_true", default=False,
+                   help="print the results as JSON")
+    p.set_defaults(func=hydro)
+
+    p = commands.add_parser('resample', help="write the table resampled at "
+                                             "new stations")
+    p.add_argument("filename", help="input .csv file (offset table)")
+    p.add_argument("output", help="output .csv file")
+    p.add_argument("-n", "--stations", type=int, dest="count",
+                   help="number of stations (default the same)")
+    p.add_argument("-s", "--spacing", type=float, dest="spacing",
+                   help="distance between stations instead of a count")
+    p.add_argument("-m", "--method", choices=['linear', 'cubic'],
+                   default='linear', help="interpolation along the lines")
+    p.add_argument("-u", "--units", choices=['decimal', 'fie'],
+                   default='decimal',
+                   help="write decimal inches or feet-inches-eighths")
+    p.set_defaults(func=resample)
+
+    p = commands.add_parser('table', parents=[tables, output],
+                            help="write the table again in decimal inches "
+                                 "or feet-inches-eighths")
+    p.add_argument("-u", "--units", choices=['decimal', 'fie'],
+                   default='decimal',
+                   help="decimal inches or feet-inches-eighths")
+    p.add_argument("-d", "--digits", type=int, default=None,
+                   help="decimal places (default as many as it takes to "
+                        "read back the same offsets)")
+    p.set_defaults(func=table)
+
+    p = commands.add_parser('scan', help="build a table from an XYZ or PLY "
+                                         "point cloud")
+    p.add_argument("filename", help="input .xyz or .ply point cloud")
+    p.add_argument("output", help="output .csv file (offset table)")
+    p.add_argument("-s", "--stations", action="store",
+                   help="comma separated station positions")
+    p.add_argument("-n", "--count", action="store", type=int, default=11,
+                   help="number of evenly spaced stations when --stations "
+                        "is not given (default 11)")
+    p.add_argument("-w", "--waterlines", action="store",
+                   help="comma separated waterline heights")
+    p.add_argument("-k", "--buttocks", action="store",
+                   help="comma separated buttock half breadths")
+    p.add_argument("-r", "--resolution", action="store", type=float,
+                   default=0.25, help="height and width of the bands the "
+                                      "sections are binned in (default "
+                                      "0.25)")
+    p.add_argument("--slab", action="store", type=float,
+                   help="take points this far either side of each station "
+                        "(default the resolution)")
+    p.add_argument("--axes", action="store", default="xyz",
+                   help="scan axes along the length, width and height "
+                        "(default xyz)")
+    p.add_argument("-u", "--units", choices=['decimal', 'fie'],
+                   default='decimal',
+                   help="decimal inches or feet-inches-eighths")
+    p.add_argument("-d", "--digits", type=int, default=4,
+                   help="decimal places (default 4)")
+    p.set_defaults(func=scan)
+
+    p = commands.add_parser('slice', help="build a table by slicing an STL "
+                                          "mesh")
+    p.add_argument("filename", help="input .stl mesh")
+    p.add_argument("output", help="output .csv file (offset table)")
+    p.add_argument("-s", "--stations", action="store",
+                   help="comma separated station positions")
+    p.add_argument("-n", "--count", action="store", type=int, default=11,
+                   help="number of evenly spaced stations when --stations "
+                        "is not given (default 11)")
+    p.add_argument("-w", "--waterlines", action="store",
+                   help="comma separated waterline heights")
+    p.add_argument("-k", "--buttocks", action="store",
+                   help="comma separated buttock half breadths")
+    p.add_argument("--axes", action="store", default="zxy",
+                   help="mesh axes along the length, width and height "
+                        "(default zxy, as the mesh command writes)")
+    p.add_argument("-u", "--units", choices=['decimal', 'fie'],
+                   default='decimal',
+                   help="decimal inches or feet-inches-eighths")
+    p.add_argument("-d", "--digits", type=int, default=4,
+                   help="decimal places (default 4)")
+    p.set_defaults(func=slice_stl)
+
+    p = commands.add_parser('library', help="index a folder of tables and "
+                                            "find the most similar hulls")
+    p.add_argument("action", choices=['update', 'similar'],
+                   help="update the index, or list the hulls most like "
+                        "table")
+    p.add_argument("folder", help="folder of offset tables")
+    p.add_argument("table", nargs='?', help="the table to compare")
+    p.add_argument("-n", "--count", action="store", type=int, default=5,
+                   help="number of hulls to list (default 5)")
+    p.set_defaults(func=library)
+
+    p = commands.add_parser('validate', help="check tables for mistakes")
+    p.add_argument("filenames", nargs='+',
+                   help="input .csv files (offset tables)")
+    p.set_defaults(func=validate)
+
+    # the arguments are passed through to offsets_bench
+    commands.add_parser('bench', add_help=False,
+                        help="time each stage of the pipeline, see "
+                             "'linestable bench -h'")
+
+    return parser
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] == 'bench':
+        return bench(argv[1:])
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if getattr(args, 'filenames', None) and len(args.filenames) > 1 and \
+            getattr(args, 'output', None):
+        parser.error('--output needs a single table')
+    if getattr(args, 'precision', None) is not None:
+        try:
+            args.precision = _load('offsets_writer').parse_precision(
+                args.precision)
+        except ValueError as e:
+            parser.error(str(e))
+
+    if getattr(args, 'verbose', False):
+        _load('offsets_reader').setup_logging(None)
+
+    timing = None
+    if getattr(args, 'timing', None):
+        timing = _load('offsets_timing')
+        timing.enable()
+
+    status = args.func(args)
+
+    if timing:
+        timing.write_report(args.timing)
+
+    return status
+
+
+if __name__ == "__main__":
+    ''' This is executed when run from the command line '''
+    sys.exit(main())
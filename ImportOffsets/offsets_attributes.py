@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+
+"""
+Keeps an imported hull in the attributes of the Fusion 360 design, so
+the add-in can redraw it when the design is opened again without the
+offsets table, which is often left behind on another workstation.
+
+The lines (before the ends are raked), their order and the section
+angles are written as compact JSON, compressed and base64 encoded into
+one attribute with a format version. The bow and transom angles, scale
+factor, half or full hull, loft body and spline tolerance the hull was
+drawn with go in attributes of their own, which the command dialog
+starts from. The sections are worked out again from the lines when the
+hull is read back. A batch of hulls drawn side by side is kept as
+numbered geometry and filename attributes with a count.
+
+    python offsets_attributes.py Cartopper.csv
+
+prints the size of the attribute value for a table.
+
+Nothing here needs Fusion, the functions take the design's attributes
+collection, or anything with the same add() and itemByName() methods.
+"""
+
+__author__ = "Robert Marchese"
+__version__ = "0.1.0"
+__license__ = "MIT"
+
+import argparse
+import base64
+import json
+import math
+import sys
+import zlib
+
+try:
+    from . import offsets_reader
+except ImportError:
+    import offsets_reader
+
+
+GROUP = 'ImportOffset'
+FORMAT_VERSION = 1
+
+# the settings the command dialog reads, with their defaults
+SETTINGS = (('bowAngle', math.radians(90.0)),
+            ('transomAngle', math.radians(90.0)),
+            ('scaleFactor', 0.1),
+            ('halfHull', True),
+            ('loftBody', 'wireframe'),
+            ('splineTolerance', 0.0),
+            ('sideBySide', False),
+            ('layoutGap', 0.0))
+
+
+def pack_geometry(offset_data):
+    '''The lines and section angles of offset_data as a compressed,
+    base64 encoded JSON string'''
+    lines = offset_data['lines']
+    # combine_offsets() keeps the lines in the order they run down the
+    # sections, which unpack_geometry() needs to make the same sections
+    line_order = [name for name in lines if not name.startswith('_')]
+    document = {'version': FORMAT_VERSION,
+                'line_order': line_order,
+                'lines': dict((name, [list(p) if p else [] for p in
+                                      lines[name]]) for name in line_order)}
+    if 'angle' in offset_data:
+        document['angle'] = list(offset_data['angle'])
+    text = json.dumps(document, separators=(',', ':'))
+    return base64.b64encode(zlib.compress(text.encode('utf-8'), 9)).decode(
+        'ascii')
+
+
+def unpack_geometry(value):
+    '''The offset_data packed by pack_geometry(), with the sections made
+    again from the lines. Raises ValueError if the value cannot be read
+    or was written by a newer version'''
+    try:
+        document = json.loads(zlib.decompress(base64.b64decode(value)))
+    except (ValueError, TypeError, zlib.error) as e:
+        raise ValueError('hull attribute cannot be read: {0}'.format(e))
+    version = document.get('version')
+    if version != FORMAT_VERSION:
+        raise ValueError('hull attribute format {0} is not supported'
+                         .format(version))
+    lines = dict((name, [tuple(p) if p else [] for p in points])
+                 for name, points in document['lines'].items())
+    return offsets_reader.offsets_from_lines(lines, document['line_order'],
+                                             document.get('angle'))
+
+
+def _value(attributes, name):
+    attribute = attributes.itemByName(GROUP, name)
+    return attribute.value if attribute else None
+
+
+def _numbered(name, k):
+    return name if k == 0 else '{0}.{1}'.format(name, k)
+
+
+def save_hulls(attributes, hulls, **settings):
+    '''Write the (filename, offset_data) hulls and the settings they
+    were drawn with into the design attributes. settings are any of the
+    names in SETTINGS'''
+    attributes.add(GROUP, 'version', str(FORMAT_VERSION))
+    attributes.add(GROUP, 'count', str(len(hulls)))
+    for k, (filename, offset_data) in enumerate(hulls):
+        attributes.add(GROUP, _numbered('filename', k), str(filename))
+        attributes.add(GROUP, _numbered('geometry', k),
+                       pack_geometry(offset_data))
+    for name, default in SETTINGS:
+        if name in settings:
+            attributes.add(GROUP, name, json.dumps(settings[name]))
+
+
+def save(attributes, offset_data, filename='', **settings):
+    '''Write one hull and the settings it was drawn with into the
+    design attributes'''
+    save_hulls(attributes, [(filename, offset_data)], **settings)
+
+
+def load_settings(attributes):
+    '''The settings saved in the design, the defaults for those that
+    are not there or cannot be read'''
+    settings = {}
+    for name, default in SETTINGS:
+        value = _value(attributes, name)
+        try:
+            value = default if value is None else json.loads(value)
+        except ValueError:
+            value = default
+        if not isinstance(value, type(default)) and not (
+                isinstance(default, float) and isinstance(value, int)):
+            value = default
+        settings[name] = value
+    return settings
+
+
+def load_hulls(attributes):
+    '''The (filename, offset_data) hulls saved in the design, in the
+    order they were drawn'''
+    try:
+        count = int(_value(attributes, 'count') or 1)
+    except ValueError:
+        count = 1
+    hulls = []
+    for k in range(count):
+        value = _value(attributes, _numbered('geometry', k))
+        if value:
+            hulls.append((_value(attributes, _numbered('filename', k)) or '',
+                          unpack_geometry(value)))
+    return hulls
+
+
+def load(attributes):
+    '''The first hull saved in the design and the name of the table it
+    came from, or None and '' when there is none'''
+    hulls = load_hulls(attributes)
+    if not hulls:
+        return None, ''
+    return hulls[0][1], hulls[0][0]
+
+
+if __name__ == "__main__":
+    ''' This is executed when run from the command line '''
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("filename", help="input .csv file (offset table)")
+
+    parser.add_argument(
+        "--version",
+        action="version",
+        version="%(prog)s (version {version})".format(version=__version__))
+
+    args = parser.parse_args()
+    packed = pack_geometry(offsets_reader.offset_reader(args.filename))
+    sys.stdout.write('{0}: {1} characters\n'.format(args.filename,
+                                                   len(packed)))
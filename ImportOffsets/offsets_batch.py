@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+"""
+Reads a batch of offset tables for drawing side by side, to compare
+design variants in one Fusion 360 design.
+
+The tables, csv or the JSON offsets_reader.py writes, are read on a
+pool of worker threads while the caller waits, and a table that cannot
+be read is reported rather than stopping the rest. layout() works out
+where each hull goes so they sit side by side across the width with a
+gap between them, or all on the origin to lay one over the other.
+
+    python offsets_batch.py SportDory.csv Cartopper.csv --gap 12
+
+prints the layout.
+"""
+
+__author__ = "Robert Marchese"
+__version__ = "0.1.0"
+__license__ = "MIT"
+
+import argparse
+import collections
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import sys
+
+try:
+    from . import offsets_reader
+except ImportError:
+    import offsets_reader
+
+
+Hull = collections.namedtuple('Hull', 'filename offset_data error')
+
+WORKERS = 4
+
+
+def read_table(filename):
+    '''The offset_data in a csv table or a JSON file'''
+    if filename.lower().endswith('.json'):
+        with open(filename) as f:
+            return json.load(f)
+    return offsets_reader.offset_reader(filename)
+
+
+def _read(filename):
+    try:
+        return Hull(filename, read_table(filename), None)
+    except Exception as e:
+        return Hull(filename, None, '{0}: {1}'.format(
+            os.path.basename(filename), e))
+
+
+def read_tables(filenames, workers=WORKERS):
+    '''Read the tables on a pool of worker threads. Returns a Hull for
+    each, in the order of filenames, with the error in place of the
+    offset_data when a table could not be read'''
+    if len(filenames) < 2 or workers < 2:
+        return [_read(filename) for filename in filenames]
+    with ThreadPoolExecutor(min(workers, len(filenames))) as pool:
+        return list(pool.map(_read, filenames))
+
+
+def half_breadth(offset_data):
+    '''The widest half breadth of a hull'''
+    return max([abs(p[0]) for points in offset_data['lines'].values()
+                for p in points if p] or [0.0])
+
+
+def layout(hulls, gap=None):
+    '''The (x, y, z) offset of each offset_data, in table units. The
+    hulls sit side by side across the width with gap between the widest
+    points of neighbours, or all on the origin when gap is None'''
+    if gap is None:
+        return [(0.0, 0.0, 0.0) for _ in hulls]
+
+    offsets = []
+    x = 0.0
+    last = None
+    for offset_data in hulls:
+        width = half_breadth(offset_data)
+        if last is not None:
+            x += last + gap + width
+        offsets.append((x, 0.0, 0.0))
+        last = width
+    return offsets
+
+
+if __name__ == "__main__":
+    ''' This is executed when run from the command line '''
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("filenames", nargs='+',
+                        help="input .csv or .json files (offset tables)")
+
+    parser.add_argument("-g", "--gap", action="store", type=float,
+                        help="space between the hulls in table units "
+                             "(default all on the origin)")
+
+    parser.add_argument("-j", "--workers", action="store", type=int,
+                        default=WORKERS, help="threads reading the tables")
+
+    parser.add_argument(
+        "--version",
+        action="version",
+        version="%(prog)s (version {version})".format(version=__version__))
+
+    args = parser.parse_args()
+    hulls = read_tables(args.filenames, args.workers)
+    good = [hull for hull in hulls if hull.offset_data]
+    for hull in hulls:
+        if hull.error:
+            sys.stderr.write(hull.error + '\n')
+    for hull, offset in zip(good, layout([h.offset_data for h in good],
+                                         args.gap)):
+        sys.stdout.write('{0:10.3f} {1:10.3f}  {2}\n'.format(
+            offset[0], half_breadth(hull.offset_data), hull.filename))
+    sys.exit(1 if len(good) < len(hulls) else 0)
@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmarks each stage of the offsets pipeline (parse, sections, rake,
+serialization and the exporters) over the test tables and synthetic
+hulls. Results are saved as JSON so runs can be compared against a
+baseline, and the script exits non-zero when a stage slows down.
+"""
+
+__author__ = "Robert Marchese"
+__version__ = "0.1.0"
+__license__ = "MIT"
+
+import argparse
+import copy
+import glob
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+
+try:
+    from . import offsets_mesh
+    from . import offsets_plan
+    from . import offsets_reader
+    from . import offsets_scad
+    from . import offsets_synth
+    from . import offsets_writer
+except ImportError:
+    import offsets_mesh
+    import offsets_plan
+    import offsets_reader
+    import offsets_scad
+    import offsets_synth
+    import offsets_writer
+
+
+TESTDATA = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        os.pardir, 'testdata')
+
+# Regressions smaller than this are treated as timer noise (seconds)
+NOISE_FLOOR = 0.002
+
+
+def export_json_64(offset_data, filename):
+    offsets_writer.export_json(offset_data, filename, precision=1 / 64.0)
+
+
+# name -> function(offset_data, filename), extended by each exporter
+EXPORTERS = {
+    'json': offsets_writer.export_json,
+    'json_64': export_json_64,
+    'svg': offsets_plan.export_svg,
+    'dxf': offsets_plan.export_dxf,
+    'scad': offsets_scad.export_scad,
+    'stl': offsets_mesh.export_stl,
+}
+
+
+def best_of(func, repeat, inputs=None):
+    '''Return the fastest of repeat calls to func. If inputs is given
+    each call gets its own (pre-built) argument tuple'''
+    best = None
+    result = None
+    for i in range(repeat):
+        args = inputs[i] if inputs else ()
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+def bench_table(filename, repeat=3, workdir=None):
+    '''Time every stage on one table, returns {stage: seconds}'''
+    results = {}
+
+    t, parsed = best_of(
+        lambda: offsets_reader.parse_csv_offsets(filename), repeat)
+    results['parse'] = t
+    lines, line_order, angles = parsed
+
+    t, generated = best_of(
+        lambda: offsets_reader.generate_sections(lines, line_order), repeat)
+    results['sections'] = t
+    sections, upper, lower = generated
+
+    offset_data = {'lines': dict(lines), 'sections': sections}
+    offset_data['lines']['_upper_cl'] = upper
+    offset_data['lines']['_lower_cl'] = lower
+    if angles:
+        offset_data['angle'] = angles
+
+    def rake(od):
+        tindex = len(od['sections']) - 1
+        od = offsets_reader.rake_angle(od, 0, 10.0)
+        return offsets_reader.rake_angle(od, tindex, 10.0)
+
+    copies = [(copy.deepcopy(offset_data),) for i in range(repeat)]
+    results['rake'], _ = best_of(rake, repeat, copies)
+
+    results['serialize'], _ = best_of(
+        lambda: json.dumps(offset_data), repeat)
+
+    if workdir is None:
+        workdir = tempfile.mkdtemp(prefix='offsets_bench')
+    base = os.path.splitext(os.path.basename(filename))[0]
+    for name, exporter in sorted(EXPORTERS.items()):
+        out = os.path.join(workdir, '{0}.{1}'.format(base, name))
+        results['export_' + name], _ = best_of(
+            lambda: exporter(offset_data, out), repeat)
+
+    return results
+
+
+def parse_sizes(text):
+    '''Parse '1000x20,4000x100' into [(1000, 20), (4000, 100)]'''
+    sizes = []
+    for item in text.split(','):
+        if item:
+            stations, lines = item.lower().split('x')
+            sizes.append((int(stations), int(lines)))
+    return sizes
+
+
+def run(files, sizes, repeat=3):
+    '''Benchmark the given tables and synthetic sizes'''
+    workdir = tempfile.mkdtemp(prefix='offsets_bench')
+    tables = {}
+    for filename in files:
+        name = os.path.basename(filename)
+        tables[name] = bench_table(filename, repeat, workdir)
+
+    for stations, lines in sizes:
+        name = 'synthetic-{0}x{1}'.format(stations, lines)
+        filename = os.path.join(workdir, name + '.csv')
+        offsets_synth.generate(filename, stations=stations, lines=lines,
+                               length=12.0 * stations, chines=0, gaps=2)
+        tables[name] = bench_table(filename, repeat, workdir)
+
+    return {
+        'version': __version__,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'repeat': repeat,
+        'tables': tables,
+    }
+
+
+def compare(results, baseline, threshold=0.25, noise=NOISE_FLOOR):
+    '''List the stages that are more than threshold (a fraction)
+    slower than in the baseline. Tables or stages missing from
+    either run are ignored'''
+    regressions = []
+    for table, stages in sorted(results['tables'].items()):
+        old_stages = baseline['tables'].get(table, {})
+        for stage, new in sorted(stages.items()):
+            old = old_stages.get(stage)
+            if old is None:
+                continue
+            if new > old * (1.0 + threshold) and new - old > noise:
+                regressions.append({'table': table, 'stage': stage,
+                                    'baseline': old, 'current': new,
+                                    'ratio': new / old if old else None})
+    return regressions
+
+
+def print_results(results, stream=sys.stdout):
+    stages = sorted({s for t in results['tables'].values() for s in t})
+    width = max([14] + [len(s) + 2 for s in stages])
+    stream.write('{0:<34}'.format('table'))
+    stream.write(''.join('{0:>{1}}'.format(s, width) for s in stages) + '\n')
+    for table, times in sorted(results['tables'].items()):
+        stream.write('{0:<34}'.format(table))
+        stream.write(''.join('{0:>{1}.6f}'.format(times[s], width)
+                             if s in times else '{0:>{1}}'.format('-', width)
+                             for s in stages))
+        stream.write('\n')
+
+
+def main(args):
+    # Time the pipeline, not the console. The debug output is measured
+    # separately by the --timing report of offsets_reader.
+    if args.debug_log:
+        offsets_reader.setup_logging(None)
+    else:
+        logging.getLogger('offsets reader').setLevel(logging.WARNING)
+
+    files = args.files or sorted(glob.glob(os.path.join(TESTDATA, '*.csv')))
+    results = run(files, parse_sizes(args.sizes), args.repeat)
+
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as opf:
+            json.dump(results, opf, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for r in regressions:
+            sys.stdout.write(
+                'REGRESSION {table} {stage}: {baseline:.6f}s -> '
+                '{current:.6f}s\n'.format(**r))
+        if regressions:
+            return 1
+
+    return 0
+
+
+def build_parser(prog=None):
+    parser = argparse.ArgumentParser(prog=prog)
+
+    parser.add_argument("files", nargs='*',
+                        help="offset tables to time (default testdata/*.csv)")
+
+    parser.add_argument("-s", "--sizes", action="store", dest="sizes",
+                        default="1000x20,4000x100",
+                        help="synthetic tables as STATIONSxLINES, comma "
+                             "separated ('' for none)")
+
+    parser.add_argument("-r", "--repeat", action="store", dest="repeat",
+                        type=int, default=3,
+                        help="number of runs, the fastest is kept")
+
+    parser.add_argument("-o", "--output", action="store", dest="output",
+                        help="save the results as JSON")
+
+    parser.add_argument("--baseline", action="store", dest="baseline",
+                        help="earlier results to compare against")
+
+    parser.add_argument("--threshold", action="store", dest="threshold",
+                        type=float, default=0.25,
+                        help="allowed slowdown as a fraction (default 0.25)")
+
+    parser.add_argument("--debug-log", action="store_true",
+                        dest="debug_log", default=False,
+                        help="leave the reader's debug logging on")
+
+    parser.add_argument(
+        "--version",
+        action="version",
+        version="%(prog)s (version {version})".format(version=__version__))
+
+    return parser
+
+
+if __name__ == "__main__":
+    ''' This is executed when run from the command line '''
+    sys.exit(main(build_parser().parse_args()))
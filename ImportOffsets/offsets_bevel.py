@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+
+"""
+Bevel tables for building a sheet or plank hull over molds. At every
+station the surface normal of each panel, the strip between two
+neighbouring lines, is taken from the run of its edges along the hull
+and across between them, and the bevels are the angles between the
+normals:
+
+    gunwale  how far the top panel leans out from vertical, the bevel
+             that brings the top edge of the side level (negative for
+             tumblehome)
+    chine    the angle one panel turns from the next at each line, 0
+             where they are flush; a chine log is planed to it, each
+             edge of a mitred joint to half of it
+    frame    the bevel on the edge of the mold under each panel,
+             positive where the hull gets fuller toward the next station
+
+    python offsets_bevel.py Cartopper.csv --centerline -o bevels.csv
+
+The angles are in degrees in the order of the stations of the table.
+Raked end sections are bevelled to their own plane. With --centerline
+the flat bottom out to the center line is a panel too, and the angle it
+makes with its mirror image is given as the centerline chine.
+"""
+
+__author__ = "Robert Marchese"
+__version__ = "0.1.0"
+__license__ = "MIT"
+
+import argparse
+import csv
+import json
+import math
+import sys
+
+try:
+    from . import offsets_panels
+    from . import offsets_reader
+except ImportError:
+    import offsets_panels
+    import offsets_reader
+
+
+CENTERLINE = '_lower_cl'
+
+KINDS = ('gunwale', 'chine', 'frame')
+
+
+def _asin(value):
+    return math.degrees(math.asin(max(-1.0, min(1.0, value))))
+
+
+def _unit(v):
+    size = math.sqrt(offsets_panels.dot(v, v))
+    if size < 1e-12:
+        return None
+    return (v[0] / size, v[1] / size, v[2] / size)
+
+
+def _angle(u, v):
+    '''The angle between two unit vectors in degrees'''
+    cos = offsets_panels.dot(u, v)
+    return math.degrees(math.acos(max(-1.0, min(1.0, cos))))
+
+
+def _neighbours(points, i):
+    '''The nearest points of a line before and after station i, or i
+    itself at an end'''
+    before = next((k for k in range(i - 1, -1, -1) if points[k]), i)
+    after = next((k for k in range(i + 1, len(points)) if points[k]), i)
+    return points[before], points[after]
+
+
+def panel_normal(upper, lower, i, inside):
+    '''The outward unit normal at station i of the panel between the
+    lines upper and lower, None where either line is missing. inside is
+    a point inside the hull at the station'''
+    if i >= len(upper) or i >= len(lower) or not upper[i] or not lower[i]:
+        return None
+    a0, a1 = _neighbours(upper, i)
+    b0, b1 = _neighbours(lower, i)
+    along = offsets_panels.sub(
+        (a1[0] + b1[0], a1[1] + b1[1], a1[2] + b1[2]),
+        (a0[0] + b0[0], a0[1] + b0[1], a0[2] + b0[2]))
+    across = offsets_panels.sub(lower[i], upper[i])
+    normal = _unit(offsets_panels.cross(along, across))
+    if normal is None:
+        return None
+    middle = [(p + q) / 2 for p, q in zip(upper[i], lower[i])]
+    if offsets_panels.dot(normal, offsets_panels.sub(middle, inside)) < 0:
+        normal = (-normal[0], -normal[1], -normal[2])
+    return normal
+
+
+def frame_normal(top, bottom):
+    '''The unit normal, toward higher stations, of the plane of a section
+    through its top and bottom points. Square sections give (0, 0, 1),
+    raked ones lean with the rake'''
+    dy = top[1] - bottom[1]
+    dz = top[2] - bottom[2]
+    normal = _unit((0.0, -dz, dy))
+    if normal is None:
+        return (0.0, 0.0, 1.0)
+    if normal[2] < 0:
+        normal = (0.0, -normal[1], -normal[2])
+    return normal
+
+
+def _panel(upper, lower):
+    return '{0}-{1}'.format(upper, 'centerline' if lower == CENTERLINE
+                            else lower)
+
+
+def bevels(offset_data, names=None, centerline=False, labels=None):
+    '''The bevel table of a hull. names are the lines down the section,
+    as for offsets_panels.develop(), labels the station names from the
+    header of the table (default 0, 1, 2...). Returns a dict of the
+    labels, the stations and the gunwale, chine and frame angles, each a
+    dict of name to a list with an angle or None at each station'''
+    names = offsets_panels.panel_names(offset_data, names, centerline)
+    lines = offset_data['lines']
+    pairs = list(zip(names, names[1:]))
+    count = max(len(lines[name]) for name in names)
+
+    stations = []
+    gunwale = {names[0]: []} if pairs else {}
+    chine = dict((name, []) for name in names[1:len(names) - 1])
+    if names[-1] == CENTERLINE and len(names) > 1:
+        chine['centerline'] = []
+    frame = dict((_panel(a, b), []) for a, b in pairs)
+
+    # the points down the section at each station, the heights may be
+    # measured down from a datum
+    section_points = [[lines[name][i] for name in names
+                       if i < len(lines[name]) and lines[name][i]]
+                      for i in range(count)]
+    up = 1.0 if offsets_reader.heights_up(section_points) else -1.0
+
+    for i, points in enumerate(section_points):
+        if not points:
+            stations.append(None)
+            for table in (gunwale, chine, frame):
+                for values in table.values():
+                    values.append(None)
+            continue
+        top, bottom = points[0], points[-1]
+        stations.append(top[2])
+        inside = (0.0, (top[1] + bottom[1]) / 2, (top[2] + bottom[2]) / 2)
+        normals = [panel_normal(lines[a], lines[b], i, inside)
+                   for a, b in pairs]
+
+        for values in gunwale.values():
+            n = normals[0]
+            values.append(None if n is None else _asin(-up * n[1]))
+        for k, name in enumerate(names[1:len(names) - 1]):
+            above, below = normals[k], normals[k + 1]
+            chine[name].append(None if above is None or below is None
+                               else _angle(above, below))
+        if 'centerline' in chine:
+            n = normals[-1]
+            chine['centerline'].append(None if n is None else
+                                       _angle(n, (-n[0], n[1], n[2])))
+
+        across = frame_normal(top, bottom)
+        for (a, b), n in zip(pairs, normals):
+            frame[_panel(a, b)].append(
+                None if n is None else _asin(-offsets_panels.dot(n, across)))
+
+    labels = [labels[k] if labels and k < len(labels) and labels[k]
+              else str(k) for k in range(count)]
+    return {'labels': labels, 'stations': stations, 'gunwale': gunwale,
+            'chine': chine, 'frame': frame}
+
+
+def _round(value, digits):
+    # adding 0.0 turns -0.0 into 0.0
+    return None if value is None else round(value, digits) + 0.0
+
+
+def _cell(value, digits):
+    return 'x' if value is None else _round(value, digits)
+
+
+def bevel_rows(table, digits=1):
+    '''The bevel table as rows laid out like an offsets table, a length
+    row of the stations and a row for each angle'''
+    rows = [['axis', 'name'] + list(table['labels']),
+            ['length', 'station'] + [_cell(z, 4) for z in table['stations']]]
+    for kind in KINDS:
+        for name, values in table[kind].items():
+            rows.append([kind, name] + [_cell(v, digits) for v in values])
+    return rows
+
+
+def write_csv(opf, table, digits=1):
+    csv.writer(opf).writerows(bevel_rows(table, digits))
+
+
+def write_json(opf, table, digits=1):
+    def cells(values):
+        return [_round(v, digits) for v in values]
+
+    out = {'labels': table['labels'], 'stations': table['stations']}
+    for kind in KINDS:
+        out[kind] = dict((name, cells(values))
+                         for name, values in table[kind].items())
+    json.dump(out, opf)
+    opf.write("\n")
+
+
+if __name__ == "__main__":
+    ''' This is executed when run from the command line '''
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("filename", help="input .csv file (offset table)")
+
+    parser.add_argument("-o", "--output", action="store", default='-',
+                        help="output file (default stdout)")
+
+    parser.add_argument("-f", "--format", choices=['csv', 'json'],
+                        default='csv', help="table format (default csv)")
+
+    parser.add_argument("-l", "--lines", action="store",
+                        help="comma separated lines down the section "
+                             "(default every line in table order)")
+
+    parser.add_argument("-c", "--centerline", action="store_true",
+                        default=False, help="add the flat bottom out to the "
+                                            "center line as a panel")
+
+    parser.add_argument("-d", "--digits", action="store", type=int,
+                        default=1, help="decimal places (default 1)")
+
+    parser.add_argument(
+        "--version",
+        action="version",
+        version="%(prog)s (version {version})".format(version=__version__))
+
+    args = parser.parse_args()
+    rows = offsets_reader.read_rows(args.filename)
+    offset_data = offsets_reader.rake_ends(
+        offsets_reader.offsets_from_rows(rows))
+    table = bevels(offset_data, args.lines.split(',') if args.lines else None,
+                   args.centerline, offsets_reader.station_labels(rows))
+    write = write_json if args.format == 'json' else write_csv
+    if args.output == '-':
+        write(sys.stdout, table, args.digits)
+    else:
+        with open(args.output, 'w', newline='') as opf:
+            write(opf, table, args.digits)
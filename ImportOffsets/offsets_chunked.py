@@ -0,0 +1,423 @@
+# -*- coding: utf-8 -*-
+
+"""
+Converts very large offset tables (scanned hulls with tens of thousands
+of stations) a block of stations at a time. The cleaned up rows are
+spooled to a temporary file on the first pass and read back one block
+at a time, so only one block of points and sections is held in memory.
+The JSON and STL files are written as each block is produced and are
+the same as the in-memory path writes.
+"""
+
+__author__ = "Robert Marchese"
+__version__ = "0.1.0"
+__license__ = "MIT"
+
+import argparse
+import csv
+import json
+import logging
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+
+try:
+    from . import offsets_mesh
+    from . import offsets_reader
+    from . import offsets_timing as timing
+    from . import offsets_writer
+except ImportError:
+    import offsets_mesh
+    import offsets_reader
+    import offsets_timing as timing
+    import offsets_writer
+
+
+logger = logging.getLogger('offsets chunked')
+
+# stations per block
+BLOCK = 1024
+
+OUTPUTS = ('json', 'stl')
+
+
+def munge_row(row, axis):
+    '''Clean up one csv row the same way munge_table() does. axis is
+    the axis of the previous row, used to fill in the dittos'''
+    row = [offsets_reader.try_float(str.lower(x)) for x in row]
+    if not row[0] or axis == row[0]:
+        row[0] = axis
+    return [offsets_reader.fie_to_di(x) for x in row]
+
+
+class SpooledTable(object):
+    '''The rows of an offsets table, spooled to a temporary file in
+    blocks of stations. Only the names and the size of each row are
+    kept in memory'''
+
+    def __init__(self, filename, block=BLOCK):
+        self.block = block
+        self.spool = tempfile.TemporaryFile()
+        self.widths = {}
+        self.heights = {}
+        self.lengths = {}
+        self.angles = {}
+        self.names = []
+
+        with timing.stage('read_csv'):
+            self._read(filename)
+
+    def _read(self, filename):
+        axes = [('width', self.widths), ('height', self.heights),
+                ('length', self.lengths), ('angle', self.angles)]
+        seen = set()
+        axis = ''
+        with open(filename, 'r') as csvfile:
+            for row in csv.reader(csvfile, delimiter=',', quotechar='"'):
+                if row[0].startswith('#'):
+                    continue
+                row = munge_row(row, axis)
+                axis, name = row[0], row[1]
+                if name not in seen:
+                    seen.add(name)
+                    self.names.append(name)
+
+                # the same rows get_all_axis() picks, later rows win
+                cells = None
+                for key, rows in axes:
+                    if key in axis:
+                        cells = cells or self._spool_cells(row[2:])
+                        rows[name] = cells
+
+    def _spool_cells(self, cells):
+        '''Write the cells of a row a block at a time, returns where the
+        row starts and how many cells it has'''
+        start = self.spool.tell()
+        for k in range(0, len(cells), self.block):
+            pickle.dump(cells[k:k + self.block], self.spool,
+                        pickle.HIGHEST_PROTOCOL)
+        return start, len(cells)
+
+    def line_order(self):
+        return self.names[2:]
+
+    def cursor(self, row):
+        '''Read a spooled row back one block at a time'''
+        position, size = row
+        for k in range(0, size, self.block):
+            self.spool.seek(position)
+            cells = pickle.load(self.spool)
+            position = self.spool.tell()
+            yield cells
+
+    def close(self):
+        self.spool.close()
+
+
+def rake_station(section, points, angle):
+    '''Rake one station, points are {line name: point} at that station.
+    The same rotation rake_angle() applies to a whole offset_data'''
+    lines = {name: [p] for name, p in points.items()}
+    raked = offsets_reader.rake_angle(
+        {'sections': [section], 'lines': lines}, 0, angle)
+    return (raked['sections'][0],
+            {name: p[0] for name, p in raked['lines'].items()})
+
+
+def convert_blocks(table, bow_angle=90, transom_angle=90):
+    '''Generate the (lines, sections) of each block of stations after
+    the ends are raked. lines is {line name: [points]} including the
+    _upper_cl and _lower_cl profile lines'''
+    names = [name for name in table.line_order() if name in table.widths]
+    names += [name for name in table.widths if name not in names]
+    lengths = dict((name, min(table.widths[name][1],
+                              table.heights[name][1],
+                              table.lengths['station'][1]))
+                   for name in names)
+    order = [name for name in table.line_order() if name in table.widths]
+    n = min(lengths[name] for name in order) if order else 0
+    size = max(lengths.values()) if lengths else 0
+
+    angles = table.angles.get('')
+    if angles and angles[1]:
+        angle_cells = table.cursor(angles)
+        bow_angle = transom_angle = None
+    else:
+        angle_cells = None
+        bow_angle = float(bow_angle)
+        transom_angle = float(transom_angle)
+
+    cursors = [(name, table.cursor(table.widths[name]),
+                table.cursor(table.heights[name])) for name in names]
+    stations = table.cursor(table.lengths['station'])
+    is_valid = offsets_reader.is_valid
+
+    for start in range(0, size, table.block):
+        with timing.stage('chunk_read'):
+            z = [float(zs) for zs in next(stations)]
+            if angle_cells is not None:
+                angle_block = next(angle_cells, [])
+                if start == 0:
+                    bow_angle = angle_block[0]
+                if start <= n - 1 < start + len(angle_block):
+                    transom_angle = angle_block[n - 1 - start]
+
+            lines = {}
+            for name, widths, heights in cursors:
+                count = max(0, min(lengths[name] - start, table.block))
+                points = list(zip(next(widths, []), next(heights, []), z))
+                lines[name] = [p if is_valid(p) else []
+                               for p in points[:count]]
+                if timing.enabled():
+                    timing.count('points', sum(1 for p in lines[name] if p))
+
+        with timing.stage('chunk_sections'):
+            sections = []
+            upper = []
+            lower = []
+            for i in range(start, min(n, start + table.block)):
+                k = i - start
+                cs, top, bottom = offsets_reader.clean_section(
+                    [lines[name][k] for name in order])
+                timing.count('section_points', len(cs))
+                sections.append(cs)
+                upper.append(top)
+                lower.append(bottom)
+            lines['_upper_cl'] = upper
+            lines['_lower_cl'] = lower
+
+            for i, angle in ((0, bow_angle), (n - 1, transom_angle)):
+                k = i - start
+                if 0 <= k < len(sections):
+                    points = dict((name, p[k]) for name, p in lines.items())
+                    sections[k], points = rake_station(
+                        sections[k], points, 90 - angle)
+                    for name, p in points.items():
+                        lines[name][k] = p
+
+        yield lines, sections
+
+
+def angle_chunks(table):
+    '''The JSON text of the section angles, if the table had them'''
+    angles = table.angles.get('')
+    if not angles or not angles[1]:
+        return
+    yield ', "angle": ['
+    for k, cells in enumerate(table.cursor(angles)):
+        text = json.dumps(cells)[1:-1]
+        yield ', ' + text if k else text
+    yield ']'
+
+
+class JsonSpool(object):
+    '''Collects the JSON of each line and of the sections a block at a
+    time and joins them in the layout offsets_writer.write_json() uses'''
+
+    def __init__(self, precision=None):
+        self.quantize = offsets_writer.quantizer(precision)
+        self.lines = {}
+        self.sections = tempfile.TemporaryFile('w+')
+
+    @staticmethod
+    def _append(spool, items):
+        if items:
+            if spool.tell():
+                spool.write(', ')
+            spool.write(json.dumps(items)[1:-1])
+
+    def add(self, lines, sections):
+        for name, points in lines.items():
+            if name not in self.lines:
+                self.lines[name] = tempfile.TemporaryFile('w+')
+            self._append(self.lines[name], self.quantize(points))
+        self._append(self.sections, [self.quantize(s) for s in sections])
+
+    def write(self, opf, angles=()):
+        opf.write('{"lines": {')
+        for k, (name, spool) in enumerate(self.lines.items()):
+            opf.write('{0}{1}: ['.format(', ' if k else '', json.dumps(name)))
+            spool.seek(0)
+            shutil.copyfileobj(spool, opf)
+            opf.write(']')
+        opf.write('}, "sections": [')
+        self.sections.seek(0)
+        shutil.copyfileobj(self.sections, opf)
+        opf.write(']')
+        for text in angles:
+            opf.write(text)
+        opf.write('}')
+
+    def close(self):
+        for spool in self.lines.values():
+            spool.close()
+        self.sections.close()
+
+
+class StlSpool(object):
+    '''Writes the STL mesh a block of sections at a time. The first cap
+    is written last, once the direction of the hull is known, into the
+    space left for it'''
+
+    def __init__(self, opf, half_hull=True):
+        self.opf = opf
+        self.half_hull = half_hull
+        self.mirrored = None if half_hull else tempfile.TemporaryFile()
+        self.first = None
+        self.last = None
+        self.count = 0
+
+        opf.write(offsets_mesh.stl_header(0))
+
+    def _write(self, triangles):
+        self.opf.write(offsets_mesh.pack_triangles(triangles))
+        self.count += len(triangles)
+        if self.mirrored is not None:
+            self.mirrored.write(offsets_mesh.pack_triangles(
+                offsets_mesh.mirror_triangles(triangles)))
+
+    def add(self, sections):
+        for section in sections:
+            ring = offsets_mesh.closed_section(section)
+            if self.first is None:
+                self.first = ring
+                self.cap_offset = self.opf.tell()
+                self.opf.write(b'\0' * 50 * max(0, len(ring) - 2))
+            else:
+                self._write(offsets_mesh.strip_triangles(self.last, ring))
+            self.last = ring
+
+    def close(self):
+        if self.first is None:
+            return
+        ascending = (offsets_mesh.mean_z(self.first) <=
+                     offsets_mesh.mean_z(self.last))
+        last_cap = offsets_mesh.cap_triangles(self.last, not ascending)
+        self._write(last_cap)
+
+        first_cap = offsets_mesh.cap_triangles(self.first, ascending)
+        self.count += len(first_cap)
+        if self.mirrored is not None:
+            mirrored = offsets_mesh.mirror_triangles(first_cap)
+            self.opf.write(offsets_mesh.pack_triangles(mirrored))
+            self.mirrored.seek(0)
+            shutil.copyfileobj(self.mirrored, self.opf)
+            self.mirrored.close()
+            self.count *= 2
+
+        self.opf.seek(self.cap_offset)
+        self.opf.write(offsets_mesh.pack_triangles(first_cap))
+        self.opf.seek(0)
+        self.opf.write(offsets_mesh.stl_header(self.count))
+
+
+def convert(filename, outputs=OUTPUTS, bow_angle=90, transom_angle=90,
+            block=BLOCK, precision=None, half_hull=True, output=None):
+    '''Convert a table to .json and .stl files next to it, a block of
+    stations at a time. output is the file to write instead when there
+    is a single output, '-' writes the JSON to stdout. Returns the names
+    of the files written'''
+    base, _ = os.path.splitext(filename)
+    names = dict((ext, base + '.' + ext) for ext in OUTPUTS)
+    if output:
+        if len(outputs) != 1:
+            raise ValueError('output needs a single output type')
+        if output == '-' and 'stl' in outputs:
+            raise ValueError('the STL mesh cannot be written to stdout')
+        names[outputs[0]] = output
+    written = []
+    table = SpooledTable(filename, block)
+    json_spool = JsonSpool(precision) if 'json' in outputs else None
+    stl_file = open(names['stl'], 'wb') if 'stl' in outputs else None
+    try:
+        stl_spool = StlSpool(stl_file, half_hull) if stl_file else None
+        blocks = 0
+        for lines, sections in convert_blocks(table, bow_angle,
+                                              transom_angle):
+            with timing.stage('chunk_write'):
+                if json_spool:
+                    json_spool.add(lines, sections)
+                if stl_spool:
+                    stl_spool.add(sections)
+            blocks += 1
+        logger.debug('{0}: {1} blocks of {2} stations'.format(
+            filename, blocks, block))
+
+        with timing.stage('chunk_write'):
+            if stl_spool:
+                stl_spool.close()
+                written.append(names['stl'])
+            if json_spool and names['json'] == '-':
+                json_spool.write(sys.stdout, angle_chunks(table))
+            elif json_spool:
+                with open(names['json'], 'w') as opf:
+                    json_spool.write(opf, angle_chunks(table))
+                written.append(names['json'])
+    finally:
+        if stl_file:
+            stl_file.close()
+        if json_spool:
+            json_spool.close()
+        table.close()
+
+    return written
+
+
+if __name__ == "__main__":
+    ''' This is executed when run from the command line '''
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("filenames", nargs='+',
+                        help="input .csv files (offset tables)")
+
+    parser.add_argument("-b", "--bow", action="store",
+                        dest="bow_angle", default=90,
+                        help="Angle of the bow measured from the baseline ")
+
+    parser.add_argument("-t", "--transom", action="store",
+                        dest="transom_angle", default=90,
+                        help="Angle of the transom measured from the baseline")
+
+    parser.add_argument("-n", "--block", action="store", type=int,
+                        dest="block", default=BLOCK,
+                        help="stations processed at a time")
+
+    parser.add_argument("-o", "--outputs", action="store", dest="outputs",
+                        default=','.join(OUTPUTS),
+                        help="comma separated list of outputs to write "
+                             "(json, stl)")
+
+    parser.add_argument("-p", "--precision", action="store",
+                        dest="precision", default=None,
+                        type=offsets_writer.parse_precision,
+                        help="round the JSON coordinates to this resolution "
+                             "(eg. 1/64 or 0.01)")
+
+    parser.add_argument("--full", action="store_true", default=False,
+                        help="mirror the mesh into a full hull")
+
+    parser.add_argument("--timing", action="store", dest="timing",
+                        help="write a JSON timing report to this file "
+                             "('-' for stdout)")
+
+    parser.add_argument(
+        "--version",
+        action="version",
+        version="%(prog)s (version {version})".format(version=__version__))
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO,
+                        format='%(levelname)s - %(message)s')
+    logging.getLogger('offsets reader').setLevel(logging.WARNING)
+    timing.enable(bool(args.timing))
+
+    for filename in args.filenames:
+        for out in convert(filename, args.outputs.split(','),
+                           args.bow_angle, args.transom_angle, args.block,
+                           args.precision, not args.full):
+            logger.info('wrote {0}'.format(out))
+
+    if args.timing:
+        timing.write_report(args.timing)
@@ -1,6 +1,22 @@
 #!/usr/bin/env python3
 '''
 Functions used to create objects using the Fusion 360 adsk.core API
+
+draw() makes the wireframe, a fitted spline for each line and a polygon
+for each section. With loft='solid' or 'surface' it also lofts the hull:
+each section is drawn as a closed profile on its own construction
+plane, offset from the xy plane and turned about its top for a raked
+end, and the splines of the lines that reach every station guide the
+loft as rails. The sketches are drawn with their compute deferred and
+the loft is added once with all its sections and rails, so Fusion
+computes the hull once however many stations it has. The planes,
+profile sketches and loft are gathered into one timeline group.
+
+With a tolerance each line is drawn through the fewest of its points
+that keep the spline within the tolerance of all of them (see
+offsets_resample.fit_points()), which keeps the sketch quick to solve
+for resampled and scanned hulls. Rails keep every point so they still
+meet the profiles.
 '''
 
 __author__ = "Robert Marchese"
@@ -9,9 +25,14 @@ __license__ = "MIT"
 
 
 import adsk.core
+import adsk.fusion
 import logging
+import math
 import  traceback
 
+from . import offsets_resample
+from . import offsets_timing as timing
+
 
 # Setup Logging
 logger = logging.getLogger('offsets draw')
@@ -29,10 +50,14 @@ logger.addHandler(ch)
 # Setup Logging
 
 
-def add_spline(sketch, point_list, mirror = 1):
-    '''Adds a spline to the current drawing given an set of points in 3-space'''
+def add_spline(sketch, point_list, mirror = 1, tolerance = 0):
+    '''Adds a spline to the current drawing given an set of points in 3-space.
+    With a tolerance only the fit points needed to keep the spline within
+    it of every point are used'''
 
     points3d = {}
+    if tolerance > 0:
+        point_list = offsets_resample.fit_points(point_list, tolerance)
 
     # Create an object to store the points in
     points = adsk.core.ObjectCollection.create()
@@ -44,9 +69,13 @@ def add_spline(sketch, point_list, mirror = 1):
             points3d[pt] = pt3d
 
     # Create the spline.
-    sketch.sketchCurves.sketchFittedSplines.add(points)
+    spline = sketch.sketchCurves.sketchFittedSplines.add(points)
 
-    return points3d
+    # one create and one add per point, the collection and the spline
+    timing.count('api_calls', 2 * len(points3d) + 2)
+    timing.count('points', len(points3d))
+
+    return points3d, spline
 
 
 def add_cross_section(sketch, points3d, point_list, mirror = 1):
@@ -69,6 +98,109 @@ def add_cross_section(sketch, points3d, point_list, mirror = 1):
     # Close it by connecting p_end back to P_start
     new_line = lines.addByTwoPoints(p_end, p_start)
 
+    # a create and an addByTwoPoints per vertex plus the closing lines
+    timing.count('api_calls', 2 * len(point_list) + 4)
+
+
+def add_offset_plane(comp, z):
+    '''A construction plane parallel to the xy plane at z'''
+    planes = comp.constructionPlanes
+    plane_input = planes.createInput()
+    plane_input.setByOffset(comp.xYConstructionPlane,
+                            adsk.core.ValueInput.createByReal(z))
+
+    timing.count('api_calls', 4)
+    return planes.add(plane_input)
+
+
+def add_section_plane(comp, section):
+    '''The plane of a section. Square sections are offset from the xy
+    plane, raked ones are turned from there about a line across the
+    top of the section, where the rake angle is applied'''
+    top = section[0]
+    bottom = section[-1]
+    plane = add_offset_plane(comp, top[2])
+    rise = top[1] - bottom[1]
+    run = bottom[2] - top[2]
+    if abs(run) < 1e-9 or not rise:
+        return plane
+
+    sketch = comp.sketches.add(plane)
+    axis = sketch.sketchCurves.sketchLines.addByTwoPoints(
+        sketch.modelToSketchSpace(adsk.core.Point3D.create(0, *top[1:])),
+        sketch.modelToSketchSpace(adsk.core.Point3D.create(1, *top[1:])))
+    planes = comp.constructionPlanes
+    plane_input = planes.createInput()
+    plane_input.setByAngle(axis, adsk.core.ValueInput.createByReal(
+        math.atan2(run, rise)), plane)
+
+    timing.count('api_calls', 10)
+    return planes.add(plane_input)
+
+
+def add_profile(comp, plane, section, half_hull=True):
+    '''Draw a section as a closed outline on its plane and return the
+    profile inside it. A half hull is closed along the center line, a
+    full hull by the mirror image of the section'''
+    if half_hull:
+        outline = [(0, section[0][1], section[0][2])] + \
+            [tuple(p) for p in section] + \
+            [(0, section[-1][1], section[-1][2])]
+    else:
+        outline = [tuple(p) for p in section] + \
+            [(-p[0], p[1], p[2]) for p in reversed(section)]
+    outline = [p for k, p in enumerate(outline) if p != outline[k - 1]]
+
+    sketch = comp.sketches.add(plane)
+    sketch.isComputeDeferred = True
+    lines = sketch.sketchCurves.sketchLines
+    p0 = sketch.modelToSketchSpace(adsk.core.Point3D.create(*outline[0]))
+    first = None
+    for p in outline[1:]:
+        new_line = lines.addByTwoPoints(p0, sketch.modelToSketchSpace(
+            adsk.core.Point3D.create(*p)))
+        if first is None:
+            first = new_line.startSketchPoint
+        p0 = new_line.endSketchPoint
+    lines.addByTwoPoints(p0, first)
+    sketch.isComputeDeferred = False
+
+    timing.count('api_calls', 3 * len(outline) + 4)
+    profiles = [sketch.profiles.item(k) for k in range(sketch.profiles.count)]
+    return max(profiles, key=lambda p: p.areaProperties().area)
+
+
+def loft_hull(comp, sections, rails, half_hull=True, solid=True):
+    '''Loft a new body through a profile at each section, guided by the
+    rails. All the planes, profiles and the loft input are made first
+    and the loft is added in one operation, then the new timeline items
+    are gathered into a group'''
+    design = comp.parentDesign
+    timeline = design.timeline
+    parametric = design.designType == \
+        adsk.fusion.DesignTypes.ParametricDesignType
+    start = timeline.markerPosition if parametric else None
+
+    lofts = comp.features.loftFeatures
+    loft_input = lofts.createInput(
+        adsk.fusion.FeatureOperations.NewBodyFeatureOperation)
+    for section in sections:
+        plane = add_section_plane(comp, section)
+        loft_input.loftSections.add(add_profile(comp, plane, section,
+                                                half_hull))
+    for rail in rails:
+        loft_input.centerLineOrRails.addRail(rail)
+    loft_input.isSolid = solid
+    feature = lofts.add(loft_input)
+
+    timing.count('api_calls', len(sections) + len(rails) + 4)
+    if parametric and timeline.markerPosition - start > 1:
+        group = timeline.timelineGroups.add(start,
+                                            timeline.markerPosition - 1)
+        group.name = 'Hull loft'
+
+    return feature
+
 
 def scale_coordinates(in_list, scale):
     ''' Apply a scale factor to all the values in a list '''
@@ -136,31 +268,77 @@ def rake_angle(offsets, st_index, angle):
     return offsets
 
 
-def draw(design, offset_data, scale_factor=.1, half_hull = True):
+def draw(design, offset_data, scale_factor=.1, half_hull = True, loft=None,
+         tolerance=0, offset=None):
     ''' Draw the lines and sections represented by the offset table
-    on a new component '''
+    on a new component. loft is 'solid' or 'surface' to loft a body
+    through the sections as well. tolerance, in table units, lets the
+    splines use fewer fit points. offset, (x, y, z) in table units,
+    moves the component from the origin '''
     # Create a new component.
     rootComp = design.rootComponent
     trans = adsk.core.Matrix3D.create()
+    if offset:
+        trans.translation = adsk.core.Vector3D.create(
+            *[scale_factor * v for v in offset])
     occ = rootComp.occurrences.addNewComponent(trans)
     newComp = occ.component
 
     # Create a new sketch on the xy plane.
     sketch = newComp.sketches.add(rootComp.xYConstructionPlane)
 
+    timing.count('api_calls', 4)
+
     # Create a spline (two of them actually) for each line
     point_dict = {}
-    for name,coords in offset_data['lines'].items():
-        coords = scale_coordinates(coords, scale_factor) # mm to cm
-        point_dict.update(add_spline(sketch, coords, 1))
-        if not half_hull:
-            point_dict.update(add_spline(sketch, coords, -1))
+    rails = []
+    sketch.isComputeDeferred = True
+    with timing.stage('draw_lines'):
+        for name,coords in offset_data['lines'].items():
+            # only lines that reach every section can guide the loft
+            rail = not name.startswith('_') and \
+                all(p for p, s in zip(coords, offset_data['sections']) if s)
+            coords = scale_coordinates(coords, scale_factor) # mm to cm
+            fit = 0 if loft and rail else tolerance * scale_factor
+            points3d, spline = add_spline(sketch, coords, 1, fit)
+            point_dict.update(points3d)
+            if rail:
+                rails.append(spline)
+            if not half_hull:
+                points3d, spline = add_spline(sketch, coords, -1, fit)
+                point_dict.update(points3d)
+                if rail:
+                    rails.append(spline)
 
     # Create the cross sections
-    for section in offset_data['sections']:
-        section = scale_coordinates(section, scale_factor) # mm to cm
-        add_cross_section(sketch, point_dict, section, 1)
-        if not half_hull:
-            add_cross_section(sketch, point_dict, section,-1)
-
-    return newComp
\ No newline at end of file
+    with timing.stage('draw_sections'):
+        for section in offset_data['sections']:
+            section = scale_coordinates(section, scale_factor) # mm to cm
+            add_cross_section(sketch, point_dict, section, 1)
+            if not half_hull:
+                add_cross_section(sketch, point_dict, section,-1)
+    sketch.isComputeDeferred = False
+
+    if loft:
+        with timing.stage('loft'):
+            sections = [scale_coordinates(section, scale_factor)
+                        for section in offset_data['sections'] if section]
+            loft_hull(newComp, sections, rails, half_hull,
+                      loft == 'solid')
+
+    return newComp
+
+
+def draw_all(design, hulls, scale_factor=.1, half_hull = True, loft=None,
+             tolerance=0, offsets=None):
+    ''' Draw each offset_data in hulls on a component of its own, moved
+    by the matching (x, y, z) of offsets. Returns the components '''
+    if offsets is None:
+        offsets = [None] * len(hulls)
+    components = []
+    with timing.stage('draw_all'):
+        for offset_data, offset in zip(hulls, offsets):
+            components.append(draw(design, offset_data, scale_factor,
+                                   half_hull, loft, tolerance, offset))
+
+    return components
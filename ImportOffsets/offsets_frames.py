@@ -0,0 +1,541 @@
+# -*- coding: utf-8 -*-
+
+"""
+Cut files for the station molds. Each cross section is mirrored into a
+full frame, the hull side of it is offset inward by the plank
+thickness, since the molds sit inside the planking, and reference tabs
+are added at the sheer so the molds can be set up on a strongback at a
+common height. A tab may also run down from the keel of every mold to a
+common baseline below the lowest keel, to stand the molds on. The
+cutter path is the part offset outward by half the kerf.
+
+The raked sections at the bow and transom are laid out in their own
+plane, so they come out true size rather than foreshortened.
+
+    python offsets_frames.py table.csv --plank 0.25 --kerf 0.125 --tab 4 \
+        --base 2
+
+writes table.frames.dxf with the parts and cutter paths on their own
+layers, and table.frames.nc with G-code for the cutter paths.
+"""
+
+__author__ = "Robert Marchese"
+__version__ = "0.1.0"
+__license__ = "MIT"
+
+import argparse
+import collections
+import math
+import os
+
+try:
+    from . import offsets_mesh
+    from . import offsets_plan
+    from . import offsets_reader
+except ImportError:
+    import offsets_mesh
+    import offsets_plan
+    import offsets_reader
+
+
+Frame = collections.namedtuple('Frame', 'name station part path')
+Frame.__doc__ = '''One station mold. part is the closed outline of the
+mold and path the cutter path around it, both counter clockwise lists
+of (x, y) points without the first point repeated'''
+
+LAYERS = (('parts', 7), ('paths', 1), ('labels', 3))
+
+# offset corners sharper than this are bevelled rather than mitred
+MITER_LIMIT = 4.0
+
+
+def polygon_area(points):
+    '''Signed area, positive when the points run counter clockwise'''
+    area = 0.0
+    n = len(points)
+    for i in range(n):
+        x0, y0 = points[i]
+        x1, y1 = points[(i + 1) % n]
+        area += x0 * y1 - x1 * y0
+
+    return 0.5 * area
+
+
+def _dedupe(points, closed=True):
+    out = []
+    for p in points:
+        if not out or math.dist(p, out[-1]) > 1e-9:
+            out.append(p)
+    if closed and len(out) > 1 and math.dist(out[0], out[-1]) <= 1e-9:
+        out.pop()
+    return out
+
+
+def offset_polyline(points, d, closed=True, limit=MITER_LIMIT):
+    '''Move each edge d to its right (outward for a counter clockwise
+    polygon) and join the moved edges with mitres, bevelled where a
+    mitre would be longer than limit * d. The result may loop back on
+    itself where the offset is larger than a concave feature, see
+    clean_polygon()'''
+    points = _dedupe(points, closed)
+    n = len(points)
+    if n < 2 or d == 0:
+        return list(points)
+
+    count = n if closed else n - 1
+    edges = []
+    for k in range(count):
+        (x0, y0), (x1, y1) = points[k], points[(k + 1) % n]
+        length = math.hypot(x1 - x0, y1 - y0)
+        nx, ny = (y1 - y0) / length, (x0 - x1) / length
+        edges.append(((x0 + d * nx, y0 + d * ny), (x1 + d * nx, y1 + d * ny),
+                      (nx, ny)))
+
+    out = []
+    if not closed:
+        out.append(edges[0][0])
+    joins = range(count) if closed else range(1, count)
+    for k in joins:
+        (a0, a1, na), (b0, b1, nb) = edges[k - 1], edges[k]
+        denom = na[0] * nb[1] - na[1] * nb[0]
+        cos = na[0] * nb[0] + na[1] * nb[1]
+        if abs(denom) < 1e-12 and cos > 0:
+            out.append(b0)
+            continue
+        # the mitre point is d / cos(half angle) from the corner
+        miter = abs(d) * math.sqrt(2.0 / max(1.0 + cos, 1e-12))
+        if miter > limit * abs(d) or abs(denom) < 1e-12:
+            out.append(a1)
+            out.append(b0)
+            continue
+        # where the two moved edges cross
+        ux, uy = a1[0] - a0[0], a1[1] - a0[1]
+        vx, vy = b1[0] - b0[0], b1[1] - b0[1]
+        cross = ux * vy - uy * vx
+        t = ((b0[0] - a0[0]) * vy - (b0[1] - a0[1]) * vx) / cross
+        out.append((a0[0] + t * ux, a0[1] + t * uy))
+    if not closed:
+        out.append(edges[-1][1])
+
+    return out
+
+
+def _crossing(p0, p1, q0, q1):
+    '''Where the segments p0-p1 and q0-q1 cross, as the fraction along
+    each, or None'''
+    rx, ry = p1[0] - p0[0], p1[1] - p0[1]
+    sx, sy = q1[0] - q0[0], q1[1] - q0[1]
+    denom = rx * sy - ry * sx
+    qx, qy = q0[0] - p0[0], q0[1] - p0[1]
+    if denom == 0:
+        return _overlap(p0, p1, q0, q1)
+    t = (qx * sy - qy * sx) / denom
+    u = (qx * ry - qy * rx) / denom
+    if 0 < t < 1 and 0 < u < 1:
+        return t, u
+    return None
+
+
+def _overlap(p0, p1, q0, q1, eps=1e-9):
+    '''Where two parallel segments first touch, if they lie on the same
+    line and overlap, as for _crossing()'''
+    rx, ry = p1[0] - p0[0], p1[1] - p0[1]
+    sx, sy = q1[0] - q0[0], q1[1] - q0[1]
+    rr = rx * rx + ry * ry
+    ss = sx * sx + sy * sy
+    if rr == 0 or ss == 0:
+        return None
+    qx, qy = q0[0] - p0[0], q0[1] - p0[1]
+    if abs(qx * ry - qy * rx) > eps * math.sqrt(rr):
+        return None
+
+    def along(a, b, o):
+        return ((b[0] - a[0]) * o[0] + (b[1] - a[1]) * o[1])
+
+    for t, u in ((along(p0, q0, (rx, ry)) / rr, 0.0),
+                 (along(p0, q1, (rx, ry)) / rr, 1.0)):
+        if eps < t < 1 - eps:
+            return t, u
+    u = along(q0, p0, (sx, sy)) / ss
+    if eps < u < 1 - eps:
+        return 0.0, u
+    return None
+
+
+def _first_crossing(points):
+    '''The first pair of edges (i, j) of a closed polygon that cross and
+    where, or None. The edges are sorted by their lowest x so only
+    edges whose x ranges overlap are compared'''
+    n = len(points)
+    edges = []
+    for i in range(n):
+        p, q = points[i], points[(i + 1) % n]
+        edges.append((min(p[0], q[0]), max(p[0], q[0]), i))
+    edges.sort()
+
+    found = None
+    for k, (lo, hi, i) in enumerate(edges):
+        for lo2, hi2, j in edges[k + 1:]:
+            if lo2 > hi:
+                break
+            if abs(i - j) in (1, n - 1):
+                continue
+            a, b = min(i, j), max(i, j)
+            hit = _crossing(points[a], points[(a + 1) % n],
+                            points[b], points[(b + 1) % n])
+            if hit and (found is None or (a, b) < found[:2]):
+                found = (a, b, hit[0])
+
+    return found
+
+
+def split_loops(points):
+    '''Split a closed polygon that crosses itself into simple loops'''
+    pending = [points]
+    loops = []
+    while pending:
+        poly = pending.pop()
+        hit = _first_crossing(poly) if len(poly) > 3 else None
+        if hit is None:
+            loops.append(poly)
+            continue
+        i, j, t = hit
+        p0, p1 = poly[i], poly[i + 1]
+        x = (p0[0] + t * (p1[0] - p0[0]), p0[1] + t * (p1[1] - p0[1]))
+        pending.append(_dedupe([x] + poly[i + 1:j + 1]))
+        pending.append(_dedupe(poly[:i + 1] + [x] + poly[j + 1:]))
+
+    return [loop for loop in loops if len(loop) > 2]
+
+
+def clean_polygon(points):
+    '''Remove the loops an offset leaves where it was larger than a
+    feature of the polygon. Loops running the other way round from the
+    polygon are inside out and are dropped, of the rest the largest is
+    kept'''
+    sign = polygon_area(points) > 0
+    loops = [loop for loop in split_loops(points)
+             if (polygon_area(loop) > 0) == sign]
+    if not loops:
+        return []
+
+    return max(loops, key=lambda loop: abs(polygon_area(loop)))
+
+
+def offset_polygon(points, d, limit=MITER_LIMIT):
+    '''Offset a closed counter clockwise polygon outward by d (inward
+    when d is negative)'''
+    return clean_polygon(offset_polyline(points, d, True, limit))
+
+
+def _at_x(p, q, x):
+    '''The point on the line through p and q at x, or q where the line
+    is upright'''
+    if abs(q[0] - p[0]) < 1e-12:
+        return q
+    t = (x - p[0]) / (q[0] - p[0])
+    return (x, p[1] + t * (q[1] - p[1]))
+
+
+def _at_height(p, q, y):
+    '''The point on the line through p and q at height y, or q where
+    the line is level'''
+    if abs(q[1] - p[1]) < 1e-12:
+        return q
+    t = (y - p[1]) / (q[1] - p[1])
+    return (p[0] + t * (q[0] - p[0]), y)
+
+
+def section_outline(section):
+    '''The section closed to the center line, as (x, v) points in the
+    plane of the section, v measured along the section from its top
+    point. For a square section v is the height'''
+    ring = offsets_mesh.closed_section(section)
+    y0, z0, uy, uz = _section_plane(ring)
+
+    return [(x, y0 + (y - y0) * uy + (z - z0) * uz) for x, y, z in ring]
+
+
+def _section_plane(ring):
+    '''The top (y, z) of a closed section and the unit (y, z) direction
+    down its plane, pointing up the heights'''
+    _, y0, z0 = ring[0]
+    _, y1, z1 = ring[-1]
+    dy, dz = y1 - y0, z1 - z0
+    size = math.hypot(dy, dz)
+    if size == 0 or abs(dz) < 1e-9:
+        return y0, z0, 1.0, 0.0
+    uy, uz = dy / size, dz / size
+    if uy < 0:
+        uy, uz = -uy, -uz
+    return y0, z0, uy, uz
+
+
+def _baseline_tab(curve, baseline, width):
+    '''The hull side curve with a tab width wide running down from the
+    keel to the baseline, unchanged where the keel already reaches it or
+    the bottom is too narrow for the tab'''
+    half = width / 2.0
+    k = min(range(len(curve)), key=lambda i: abs(curve[i][0]))
+    i = k
+    while i > 0 and curve[i][0] > -half:
+        i -= 1
+    j = k
+    while j < len(curve) - 1 and curve[j][0] < half:
+        j += 1
+    if curve[i][0] > -half or curve[j][0] < half:
+        return curve
+    a = _at_x(curve[i], curve[i + 1], -half)
+    b = _at_x(curve[j - 1], curve[j], half)
+    if min(a[1], b[1]) <= baseline:
+        return curve
+    return _dedupe(curve[:i + 1] + [a, (-half, baseline),
+                                    (half, baseline), b] + curve[j:],
+                   closed=False)
+
+
+def frame_outline(section, plank=0.0, tab=0.0, tab_width=None, up=None,
+                  baseline=None):
+    '''The full frame for a section, the hull side moved in by plank
+    and a tab tab high by tab_width wide above each sheer point. With a
+    baseline, the height of the table the molds stand on, a tab as wide
+    runs down from the keel to it. up is False for heights measured down
+    from a datum, worked out from the section when not given. Returns a
+    counter clockwise polygon'''
+    half = section_outline(section)
+    if up is None:
+        up = offsets_reader.heights_up([half])
+    if baseline is not None:
+        # the baseline where it crosses the plane of a raked section
+        y0, _, uy, _ = _section_plane(offsets_mesh.closed_section(section))
+        baseline = y0 + (baseline - y0) / uy
+    # heights may be measured down from a datum, stand the frame upright
+    if not up:
+        half = [(x, -y) for x, y in half]
+        if baseline is not None:
+            baseline = -baseline
+    # sheer, down the lines to the keel, leaving out the center points
+    side = half[1:-1] if len(half) > 2 else half
+    keel = half[-1]
+    top = half[0][1]
+
+    # the hull side from the left sheer round the keel to the right,
+    # which runs counter clockwise so the inside is to the left
+    left = [(-x, y) for x, y in side]
+    right = list(reversed(side))
+    curve = _dedupe(left + [(0.0, keel[1])] + right, closed=False)
+
+    if plank:
+        curve = offset_polyline(curve, -plank, closed=False)
+        # carry the moved ends back up or down to the sheer
+        curve[0] = _at_height(curve[1], curve[0], top)
+        curve[-1] = _at_height(curve[-2], curve[-1], top)
+
+    if tab_width is None:
+        tab_width = max(abs(curve[0][0]), abs(curve[-1][0])) * 0.2
+    if baseline is not None:
+        curve = _baseline_tab(curve, baseline, tab_width)
+
+    # close across the top at the sheer, with the tabs above it
+    x_right = curve[-1][0]
+    x_left = curve[0][0]
+    outline = list(curve)
+    outline.append((x_right, top))
+    if tab:
+        outline.append((x_right, top + tab))
+        outline.append((x_right - tab_width, top + tab))
+        outline.append((x_right - tab_width, top))
+        outline.append((x_left + tab_width, top))
+        outline.append((x_left + tab_width, top + tab))
+        outline.append((x_left, top + tab))
+    outline.append((x_left, top))
+    outline = _dedupe(outline)
+
+    if polygon_area(outline) < 0:
+        outline.reverse()
+
+    return clean_polygon(outline)
+
+
+def frames(offset_data, plank=0.0, kerf=0.0, tab=0.0, tab_width=None,
+           names=None, base=0.0):
+    '''The station molds for every section of offset_data. names are
+    the station names of the header row, offsets_reader.station_labels(),
+    the column index where there is none. With base, each mold has a tab
+    down to a baseline base below the lowest keel. Returns a list of
+    Frames'''
+    out = []
+    up = offsets_reader.heights_up(offset_data['sections'])
+    baseline = None
+    if base:
+        sign = 1.0 if up else -1.0
+        baseline = sign * (min(sign * p[1] for section in
+                               offset_data['sections'] for p in section) -
+                           base)
+    for k, section in enumerate(offset_data['sections']):
+        if len(section) < 2:
+            continue
+        part = frame_outline(section, plank, tab, tab_width, up, baseline)
+        if not part:
+            continue
+        path = offset_polygon(part, kerf / 2.0) if kerf else list(part)
+        name = 'station {0}'.format(
+            names[k] if names and k < len(names) and names[k] else k)
+        out.append(Frame(name, section[0][2], part, path))
+
+    return out
+
+
+def _bounds(points):
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def layout(items, gap):
+    '''Place the outlines in a row, left to right. Returns the (dx, dy)
+    for each and the extent of the row'''
+    shifts = []
+    x = 0.0
+    height = 0.0
+    for points in items:
+        x0, y0, x1, y1 = _bounds(points)
+        shifts.append((x - x0, -y0))
+        x += x1 - x0 + gap
+        height = max(height, y1 - y0)
+
+    return shifts, (0.0, 0.0, max(x - gap, 0.0), height)
+
+
+def _moved(points, shift):
+    return [(x + shift[0], y + shift[1]) for x, y in points]
+
+
+def write_drawing(opf, frame_list, fmt='dxf', scale=1.0, units='in',
+                  digits=4, gap=None):
+    '''Write the parts and cutter paths, side by side, as DXF or SVG'''
+    paths = [f.path for f in frame_list]
+    if gap is None:
+        gap = 0.1 * max([_bounds(p)[3] - _bounds(p)[1] for p in paths] or
+                        [1.0])
+    shifts, extent = layout(paths, gap)
+    label = 0.4 * gap
+    extent = (extent[0], extent[1] - 2 * label, extent[2], extent[3])
+
+    if fmt == 'svg':
+        writer = offsets_plan.SvgWriter(opf, extent, scale, units, digits)
+    elif fmt == 'dxf':
+        writer = offsets_plan.DxfWriter(opf, extent, scale, digits, LAYERS)
+    else:
+        raise ValueError('unknown drawing format: {0}'.format(fmt))
+
+    for frame, shift in zip(frame_list, shifts):
+        writer.polyline('parts', _moved(frame.part + frame.part[:1], shift))
+    for frame, shift in zip(frame_list, shifts):
+        writer.polyline('paths', _moved(frame.path + frame.path[:1], shift))
+    for frame, shift in zip(frame_list, shifts):
+        x0 = _bounds(frame.path)[0] + shift[0]
+        writer.text('labels', x0, -1.5 * label, label, frame.name)
+    writer.close()
+
+
+def write_gcode(opf, frame_list, depth=0.75, pass_depth=0.25, feed=60.0,
+                plunge=20.0, safe=0.5, metric=False, gap=None):
+    '''Write G-code cutting each path, side by side as in
+    write_drawing(), in passes of pass_depth down to depth'''
+    paths = [f.path for f in frame_list]
+    if gap is None:
+        gap = 0.1 * max([_bounds(p)[3] - _bounds(p)[1] for p in paths] or
+                        [1.0])
+    shifts, _ = layout(paths, gap)
+    passes = max(1, int(math.ceil(depth / pass_depth - 1e-9)))
+
+    opf.write('(mold frames, {0} parts)\n'.format(len(frame_list)))
+    opf.write('G21\n' if metric else 'G20\n')
+    opf.write('G90 G17\n')
+    opf.write('G0 Z{0:.4f}\n'.format(safe))
+    for frame, shift in zip(frame_list, shifts):
+        path = _moved(frame.path, shift)
+        opf.write('({0})\n'.format(frame.name))
+        opf.write('G0 X{0:.4f} Y{1:.4f}\n'.format(*path[0]))
+        for k in range(1, passes + 1):
+            z = -min(depth, k * pass_depth)
+            opf.write('G1 Z{0:.4f} F{1:.1f}\n'.format(z, plunge))
+            opf.write('G1 X{0:.4f} Y{1:.4f} F{2:.1f}\n'.format(
+                path[1][0], path[1][1], feed) if len(path) > 1 else '')
+            opf.write(''.join('G1 X{0:.4f} Y{1:.4f}\n'.format(x, y)
+                              for x, y in path[2:] + path[:1]))
+        opf.write('G0 Z{0:.4f}\n'.format(safe))
+    opf.write('M2\n')
+
+
+if __name__ == "__main__":
+    ''' This is executed when run from the command line '''
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("filenames", nargs='+',
+                        help="input .csv files (offset tables)")
+
+    parser.add_argument("-p", "--plank", action="store", type=float,
+                        default=0.0, help="plank thickness")
+
+    parser.add_argument("-k", "--kerf", action="store", type=float,
+                        default=0.0, help="width of the cut")
+
+    parser.add_argument("--tab", action="store", type=float, default=0.0,
+                        help="height of the reference tabs above the sheer")
+
+    parser.add_argument("--base", action="store", type=float, default=0.0,
+                        help="depth of the baseline below the lowest keel, "
+                             "each mold gets a tab down to it")
+
+    parser.add_argument("--tab-width", action="store", type=float,
+                        dest="tab_width", default=None,
+                        help="width of the tabs (default a fifth of the "
+                             "half breadth)")
+
+    parser.add_argument("-f", "--format", action="append", dest="formats",
+                        choices=['dxf', 'svg', 'nc'],
+                        help="output, may be repeated (default dxf and nc)")
+
+    parser.add_argument("--depth", action="store", type=float, default=0.75,
+                        help="depth of the cut (sheet thickness)")
+
+    parser.add_argument("--pass-depth", action="store", type=float,
+                        dest="pass_depth", default=0.25,
+                        help="depth of each pass")
+
+    parser.add_argument("--feed", action="store", type=float, default=60.0,
+                        help="cutting feed rate")
+
+    parser.add_argument("-b", "--bow", action="store", type=float,
+                        dest="bow_angle", default=90,
+                        help="Angle of the bow measured from the baseline ")
+
+    parser.add_argument("-t", "--transom", action="store", type=float,
+                        dest="transom_angle", default=90,
+                        help="Angle of the transom measured from the "
+                             "baseline")
+
+    parser.add_argument(
+        "--version",
+        action="version",
+        version="%(prog)s (version {version})".format(version=__version__))
+
+    args = parser.parse_args()
+    for filename in args.filenames:
+        rows = offsets_reader.read_rows(filename)
+        offset_data = offsets_reader.rake_ends(
+            offsets_reader.offsets_from_rows(rows), args.bow_angle,
+            args.transom_angle)
+        frame_list = frames(offset_data, args.plank, args.kerf, args.tab,
+                            args.tab_width,
+                            offsets_reader.station_labels(rows), args.base)
+        base = os.path.splitext(filename)[0] + '.frames.'
+        for fmt in args.formats or ['dxf', 'nc']:
+            with open(base + fmt, 'w') as opf:
+                if fmt == 'nc':
+                    write_gcode(opf, frame_list, args.depth, args.pass_depth,
+                                args.feed)
+                else:
+                    write_drawing(opf, frame_list, fmt)
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+
+"""
+Hydrostatic integrals of the hull: the area and centroid of each cross
+section and the volume between stations. Sections are closed to the
+center line the same way they are drawn, so areas and volumes are for
+the half hull.
+
+area_curve() gives the sectional area curve below a waterline with
+running totals of the volume from the first station, so the volume
+forward of any station, or the station that splits the volume, is a
+binary search rather than a new integration.
+"""
+
+__author__ = "Robert Marchese"
+__version__ = "0.1.0"
+__license__ = "MIT"
+
+import bisect
+import collections
+import math
+
+try:
+    from . import offsets_reader
+    from .offsets_mesh import closed_section
+except ImportError:
+    import offsets_reader
+    from offsets_mesh import closed_section
+
+
+VolumeTable = collections.namedtuple('VolumeTable', 'stations areas volumes')
+VolumeTable.__doc__ = '''The section areas at ascending stations and the
+volume from the first station to each'''
+
+
+def area_centroid(section):
+    '''Area of a cross section closed to the center line and the (x, y)
+    of its centroid'''
+    ring = closed_section(section)
+    n = len(ring)
+    a = cx = cy = 0.0
+    for i in range(n):
+        x0, y0 = ring[i][0], ring[i][1]
+        x1, y1 = ring[(i + 1) % n][0], ring[(i + 1) % n][1]
+        cross = x0 * y1 - x1 * y0
+        a += cross
+        cx += (x0 + x1) * cross
+        cy += (y0 + y1) * cross
+
+    if not a:
+        return 0.0, 0.0, 0.0
+
+    return abs(0.5 * a), cx / (3.0 * a), cy / (3.0 * a)
+
+
+def section_area(section):
+    return area_centroid(section)[0]
+
+
+def interval_volume(z0, a0, z1, a1):
+    '''Volume between two stations by the trapezoid rule'''
+    return 0.5 * (a0 + a1) * abs(z1 - z0)
+
+
+def volume(stations, areas):
+    '''Volume of the half hull from the station positions and section
+    areas'''
+    return sum(interval_volume(z0, a0, z1, a1) for z0, a0, z1, a1 in
+               zip(stations, areas, stations[1:], areas[1:]))
+
+
+def hydrostatics(sections):
+    '''Area and centroid of each section and the volume of the half
+    hull, from the (unraked) cross sections'''
+    stations = [s[0][2] for s in sections]
+    centroids = [area_centroid(s) for s in sections]
+    areas = [a for a, cx, cy in centroids]
+
+    return {'stations': stations,
+            'areas': areas,
+            'centroids': [[cx, cy] for a, cx, cy in centroids],
+            'volume': volume(stations, areas)}
+
+
+def clip_ring(ring, waterline, up=True):
+    '''The (x, y) polygon of the part of a ring below the waterline'''
+    sign = 1.0 if up else -1.0
+    n = len(ring)
+    out = []
+    for i in range(n):
+        x0, y0 = ring[i - 1][0], ring[i - 1][1]
+        x1, y1 = ring[i][0], ring[i][1]
+        d0 = sign * (y0 - waterline)
+        d1 = sign * (y1 - waterline)
+        if (d0 <= 0) != (d1 <= 0):
+            t = d0 / (d0 - d1)
+            out.append((x0 + t * (x1 - x0), waterline))
+        if d1 <= 0:
+            out.append((x1, y1))
+    return out
+
+
+def section_properties(sections, waterline=None, up=None):
+    '''Area and centroid of each section, below the waterline if there
+    is one, in one shoelace pass. Returns a list of (area, cx, cy)'''
+    if up is None and waterline is not None:
+        up = offsets_reader.heights_up(sections)
+    out = []
+    for section in sections:
+        ring = closed_section(section)
+        if waterline is not None:
+            ring = clip_ring(ring, waterline, up)
+        a = cx = cy = 0.0
+        if ring:
+            x0, y0 = ring[-1][0], ring[-1][1]
+            for p in ring:
+                x1, y1 = p[0], p[1]
+                cross = x0 * y1 - x1 * y0
+                a += cross
+                cx += (x0 + x1) * cross
+                cy += (y0 + y1) * cross
+                x0, y0 = x1, y1
+        if a:
+            out.append((abs(0.5 * a), cx / (3.0 * a), cy / (3.0 * a)))
+        else:
+            out.append((0.0, 0.0, 0.0))
+    return out
+
+
+def _parabola_parts(x0, y0, x1, y1, x2, y2):
+    '''The integrals over [x0, x1] and [x1, x2] of the parabola through
+    three points (Simpson's rule for uneven spacing)'''
+    h0 = x1 - x0
+    h1 = x2 - x1
+    first = h0 / 6.0 * ((2 * h0 + 3 * h1) / (h0 + h1) * y0 +
+                        (h0 + 3 * h1) / h1 * y1 -
+                        h0 * h0 / (h1 * (h0 + h1)) * y2)
+    second = h1 / 6.0 * (-h1 * h1 / (h0 * (h0 + h1)) * y0 +
+                         (h1 + 3 * h0) / h0 * y1 +
+                         (2 * h1 + 3 * h0) / (h0 + h1) * y2)
+    return first, second
+
+
+def volume_table(stations, areas, rule='simpson'):
+    '''Running totals of the volume from the first station. Simpson's
+    rule fits a parabola through each pair of intervals, and through
+    the last three stations for an odd one out at the end; areas that
+    would make a parabola dip below zero fall back to the trapezoid'''
+    pairs = sorted(zip(stations, areas))
+    zs = [z for z, _ in pairs]
+    areas = [a for _, a in pairs]
+    n = len(zs)
+    parts = [interval_volume(zs[i], areas[i], zs[i + 1], areas[i + 1])
+             for i in range(n - 1)]
+
+    if rule == 'simpson' and n > 2:
+        for i in range(0, n - 2, 2):
+            if zs[i] == zs[i + 1] or zs[i + 1] == zs[i + 2]:
+                continue
+            first, second = _parabola_parts(zs[i], areas[i], zs[i + 1],
+                                            areas[i + 1], zs[i + 2],
+                                            areas[i + 2])
+            if first >= 0 and second >= 0:
+                parts[i], parts[i + 1] = first, second
+        if n % 2 == 0 and zs[-3] != zs[-2] != zs[-1]:
+            _, last = _parabola_parts(zs[-3], areas[-3], zs[-2], areas[-2],
+                                      zs[-1], areas[-1])
+            if last >= 0:
+                parts[-1] = last
+    elif rule not in ('simpson', 'trapezoid'):
+        raise ValueError('unknown rule: {0}'.format(rule))
+
+    volumes = [0.0]
+    for part in parts:
+        volumes.append(volumes[-1] + part)
+    return VolumeTable(zs, areas, volumes)
+
+
+def _partial(a0, a1, t):
+    '''The fraction of a trapezoid from its start to t (0 to 1)'''
+    total = a0 + a1
+    if not total:
+        return t
+    return t * (2 * a0 + t * (a1 - a0)) / total
+
+
+def volume_to(table, z):
+    '''The volume from the first station to z'''
+    zs, areas, volumes = table
+    if z <= zs[0]:
+        return 0.0
+    if z >= zs[-1]:
+        return volumes[-1]
+    i = bisect.bisect_right(zs, z) - 1
+    t = (z - zs[i]) / (zs[i + 1] - zs[i])
+    return volumes[i] + _partial(areas[i], areas[i + 1], t) * \
+        (volumes[i + 1] - volumes[i])
+
+
+def station_at_volume(table, volume):
+    '''The station with the given volume between it and the first
+    station'''
+    zs, areas, volumes = table
+    if volume <= 0:
+        return zs[0]
+    if volume >= volumes[-1]:
+        return zs[-1]
+    i = bisect.bisect_right(volumes, volume) - 1
+    while volumes[i + 1] == volumes[i]:
+        i += 1
+    f = (volume - volumes[i]) / (volumes[i + 1] - volumes[i])
+
+    # solve _partial(a0, a1, t) = f for t
+    a0, a1 = areas[i], areas[i + 1]
+    total = a0 + a1
+    da = a1 - a0
+    if not total or abs(da) < 1e-12 * total:
+        t = f
+    else:
+        t = (-2 * a0 + math.sqrt(4 * a0 * a0 + 4 * da * f * total)) / \
+            (2 * da)
+    return zs[i] + t * (zs[i + 1] - zs[i])
+
+
+def area_curve(sections, waterline=None, rule='simpson'):
+    '''The sectional area curve of the (unraked) sections below the
+    waterline, or to the sheer without one, with the running volume,
+    the volume, its longitudinal center and the station that halves it.
+    Areas and volumes are for the half hull'''
+    sections = sorted((s for s in sections if s), key=lambda s: s[0][2])
+    if not sections:
+        raise ValueError('need at least one section')
+    stations = [s[0][2] for s in sections]
+    props = section_properties(sections, waterline)
+    areas = [a for a, cx, cy in props]
+    table = volume_table(stations, areas, rule)
+    moments = volume_table(stations, [a * z for a, z in
+                                      zip(areas, stations)], rule)
+    volume = table.volumes[-1]
+
+    return {'waterline': waterline,
+            'rule': rule,
+            'stations': stations,
+            'areas': areas,
+            'centroids': [[cx, cy] for a, cx, cy in props],
+            'cumulative_volume': table.volumes,
+            'volume': volume,
+            'lcb': moments.volumes[-1] / volume if volume else None,
+            'half_volume_station': station_at_volume(table, volume / 2.0)}
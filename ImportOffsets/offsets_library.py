@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+
+"""
+An index of a library of offset tables for finding the hulls most like
+a new design.
+
+Each table is read with offset_reader() and boiled down to a short
+vector of shape features: length/beam, beam/depth, the prismatic
+coefficient, the sectional area curve at eleven points, and the rocker
+and flare. The vectors are kept in a small JSON index next to the
+library with the modification time and size of each table, so updating
+the index only reads the tables that were added or changed since.
+
+    python offsets_library.py update library/
+    python offsets_library.py similar library/ new_design.csv -n 5
+
+Distances are taken after scaling each feature by its spread over the
+library, so no one feature swamps the others. A search is a single pass
+over the vectors, a few milliseconds for thousands of hulls.
+"""
+
+__author__ = "Robert Marchese"
+__version__ = "0.1.0"
+__license__ = "MIT"
+
+import argparse
+import heapq
+import json
+import logging
+import math
+import os
+import sys
+
+try:
+    from . import offsets_hydro
+    from . import offsets_reader
+except ImportError:
+    import offsets_hydro
+    import offsets_reader
+
+
+logger = logging.getLogger('offsets library')
+
+INDEX = 'hulls.index.json'
+INDEX_VERSION = 1
+
+# stations the sectional area curve is sampled at, as fractions of the
+# length
+CURVE_POINTS = 11
+
+FEATURES = (['length_beam', 'beam_depth', 'prismatic'] +
+            ['area_{0}'.format(k) for k in range(CURVE_POINTS)] +
+            ['rocker', 'flare'])
+
+
+def _interpolate(xs, ys, x):
+    for x0, y0, x1, y1 in zip(xs, ys, xs[1:], ys[1:]):
+        if x0 <= x <= x1:
+            return y0 if x1 == x0 else y0 + (x - x0) / (x1 - x0) * (y1 - y0)
+    return ys[0] if x < xs[0] else ys[-1]
+
+
+def features(offset_data):
+    '''The shape features of a hull, in the order of FEATURES. The
+    tables have no waterline, so the depth from the keel to the sheer
+    stands in for the draft'''
+    sections = [s for s in offset_data['sections'] if s]
+    if len(sections) < 2:
+        raise ValueError('need at least two sections')
+    sections.sort(key=lambda s: s[0][2])
+    stations = [s[0][2] for s in sections]
+    length = stations[-1] - stations[0]
+
+    # the outermost point of each section stands for the sheer, the
+    # first point may be a coaming or a bulwark
+    tops = [max(range(len(s)), key=lambda i: s[i][0]) for s in sections]
+
+    # heights may be measured down from a datum, count them up
+    up = 1.0 if offsets_reader.heights_up(sections) else -1.0
+    sheer = [up * s[i][1] for s, i in zip(sections, tops)]
+    keel = [min(up * p[1] for p in s) for s in sections]
+    depth = max(h - k for h, k in zip(sheer, keel))
+    beam = 2 * max(p[0] for s in sections for p in s)
+    if not length or not depth or not beam:
+        raise ValueError('hull has no length, beam or depth')
+
+    areas = [offsets_hydro.section_area(s) for s in sections]
+    biggest = max(areas)
+    volume = offsets_hydro.volume(stations, areas)
+    prismatic = volume / (biggest * length) if biggest else 0.0
+    positions = [(z - stations[0]) / length for z in stations]
+    curve = [_interpolate(positions, areas, k / (CURVE_POINTS - 1.0)) /
+             (biggest or 1.0) for k in range(CURVE_POINTS)]
+
+    # how far the keel rises from its lowest point to the ends
+    rocker = (max(keel[0], keel[-1]) - min(keel)) / length
+
+    # the mean slope of the topsides, from the sheer to the next line
+    slopes = []
+    for s, i in zip(sections, tops):
+        if i + 1 < len(s) and s[i][1] != s[i + 1][1]:
+            slopes.append(math.atan2(s[i][0] - s[i + 1][0],
+                                     up * (s[i][1] - s[i + 1][1])))
+    flare = sum(slopes) / len(slopes) / (math.pi / 2) if slopes else 0.0
+
+    return [length / beam, beam / depth, prismatic] + curve + \
+        [rocker, flare]
+
+
+def table_files(folder):
+    '''The offset tables under folder'''
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith('.csv'):
+                yield os.path.join(root, name)
+
+
+def _signature(filename):
+    st = os.stat(filename)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def load_index(folder):
+    '''The index of folder, empty when there is none or it was written
+    by another version'''
+    try:
+        with open(os.path.join(folder, INDEX)) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if index.get('version') != INDEX_VERSION or \
+            index.get('features') != FEATURES:
+        return {}
+    return index.get('hulls', {})
+
+
+def save_index(folder, hulls):
+    filename = os.path.join(folder, INDEX)
+    tmp = filename + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'version': INDEX_VERSION, 'features': FEATURES,
+                   'hulls': hulls}, f, separators=(',', ':'))
+    os.replace(tmp, filename)
+
+
+def update(folder):
+    '''Bring the index of folder up to date, reading only the tables
+    that are new or changed. Tables that cannot be read are kept in the
+    index with their error so they are not read again until they
+    change. Returns the hulls and the number of tables read'''
+    old = load_index(folder)
+    hulls = {}
+    read = 0
+    for filename in table_files(folder):
+        name = os.path.relpath(filename, folder).replace(os.sep, '/')
+        signature = _signature(filename)
+        entry = old.get(name)
+        if entry and entry['signature'] == signature:
+            hulls[name] = entry
+            continue
+        read += 1
+        entry = {'signature': signature}
+        try:
+            entry['features'] = features(
+                offsets_reader.offset_reader(filename))
+        except Exception as e:
+            logger.warning('could not index {0}: {1}'.format(filename, e))
+            entry['error'] = str(e)
+        hulls[name] = entry
+
+    if read or len(hulls) != len(old):
+        save_index(folder, hulls)
+    return hulls, read
+
+
+def spreads(vectors):
+    '''The standard deviation of each feature, 1 where it is 0'''
+    n = len(vectors)
+    out = []
+    for column in zip(*vectors):
+        mean = math.fsum(column) / n
+        sd = math.sqrt(math.fsum((v - mean) ** 2 for v in column) / n)
+        out.append(sd or 1.0)
+    return out
+
+
+def similar(hulls, vector, count=5, exclude=(), spread=None):
+    '''The count hulls nearest vector, as (distance, name), nearest
+    first. spread is from spreads(), worked out from hulls if not given'''
+    entries = [(name, entry['features']) for name, entry in hulls.items()
+               if 'features' in entry and name not in exclude]
+    if not entries:
+        return []
+    if spread is None:
+        spread = spreads([f for _, f in entries])
+    scale = [1.0 / s for s in spread]
+    point = [a * s for a, s in zip(vector, scale)]
+    dist = math.dist
+    found = [(dist(point, [b * s for b, s in zip(other, scale)]), name)
+             for name, other in entries]
+    return heapq.nsmallest(count, found)
+
+
+def report(found, stream=sys.stdout):
+    for distance, name in found:
+        stream.write('{0:8.3f}  {1}\n'.format(distance, name))
+
+
+if __name__ == "__main__":
+    ''' This is executed when run from the command line '''
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("command", choices=['update', 'similar'],
+                        help="update the index, or find similar hulls")
+
+    parser.add_argument("folder", help="folder of offset tables")
+
+    parser.add_argument("table", nargs='?',
+                        help="the table to compare (for similar)")
+
+    parser.add_argument("-n", "--count", action="store", type=int,
+                        default=5, help="number of hulls to list")
+
+    parser.add_argument(
+        "--version",
+        action="version",
+        version="%(prog)s (version {version})".format(version=__version__))
+
+    args = parser.parse_args()
+    hulls, read = update(args.folder)
+    if args.command == 'update':
+        sys.stdout.write('{0} tables, {1} read\n'.format(len(hulls), read))
+    else:
+        if not args.table:
+            parser.error('similar needs a table to compare')
+        vector = features(offsets_reader.offset_reader(args.table))
+        name = os.path.relpath(args.table, args.folder).replace(os.sep, '/')
+        report(similar(hulls, vector, args.count, exclude=[name]))
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+
+"""
+Builds a closed triangle mesh of the hull from the cross sections and
+writes it as STL. Each section is closed to the center line the same
+way offsets_draw.add_cross_section() does, and neighbouring sections
+are stitched into a strip, point by point where the sections have the
+same lines. Sections may have different numbers of points (lines that
+stop short of the stem), and then the sheer is joined to the sheer and
+the keel to the keel and the points between zipped together by arc
+length.
+"""
+
+__author__ = "Robert Marchese"
+__version__ = "0.1.0"
+__license__ = "MIT"
+
+import struct
+
+
+def closed_section(section):
+    '''Close a cross section to the center line. Returns the ring of
+    (x, y, z) tuples without repeating the first point'''
+    first = section[0]
+    last = section[-1]
+    points = [(0.0, first[1], first[2])]
+    points += [tuple(p) for p in section]
+    points.append((0.0, last[1], last[2]))
+
+    ring = []
+    for p in points:
+        if not ring or p != ring[-1]:
+            ring.append(p)
+    if len(ring) > 1 and ring[0] == ring[-1]:
+        ring.pop()
+
+    return ring
+
+
+def ring_area(ring):
+    '''Signed area of the ring projected on the xy-plane, positive
+    when the points run counter clockwise'''
+    area = 0.0
+    n = len(ring)
+    for i in range(n):
+        x0, y0 = ring[i][0], ring[i][1]
+        x1, y1 = ring[(i + 1) % n][0], ring[(i + 1) % n][1]
+        area += x0 * y1 - x1 * y0
+
+    return 0.5 * area
+
+
+def _side(ring):
+    '''The indexes of the sheer and keel in a ring from closed_section(),
+    after the center line point at the sheer and before the one at the
+    keel when they were added'''
+    n = len(ring)
+    sheer = 1 if n > 1 and ring[1][1:] == ring[0][1:] else 0
+    keel = n - 2 if n > 2 and ring[-2][1:] == ring[-1][1:] else n - 1
+    return sheer, keel
+
+
+def _params(ring, start, end):
+    '''Normalized arc length along ring from index start to end, end
+    past the last point wrapping round to the first'''
+    n = len(ring)
+    lengths = [0.0]
+    for i in range(start, end):
+        p0 = ring[i % n]
+        p1 = ring[(i + 1) % n]
+        d = ((p1[0] - p0[0]) ** 2 + (p1[1] - p0[1]) ** 2) ** 0.5
+        lengths.append(lengths[-1] + d)
+    total = lengths[-1] or 1.0
+
+    return [l / total for l in lengths]
+
+
+def mean_z(ring):
+    return sum(p[2] for p in ring) / len(ring)
+
+
+def stitch_faces(ring0, ring1):
+    '''Triangulate the band between two rings. Returns index triples
+    into ring0 + ring1, wound counter clockwise seen from outside.
+    Rings with the same lines are joined point by point. Otherwise the
+    sheer is kept to the sheer and the keel to the keel, and the hull
+    sides between them, the decks and the center lines are each zipped
+    together by arc length'''
+    n = len(ring0)
+    m = len(ring1)
+    side0 = _side(ring0)
+    side1 = _side(ring1)
+    if n == m and side0 == side1:
+        ends0 = ends1 = list(range(n + 1))
+    else:
+        ends0 = [0, side0[0], side0[1], n - 1, n]
+        ends1 = [0, side1[0], side1[1], m - 1, m]
+
+    faces = []
+    for a0, b0, a1, b1 in zip(ends0, ends0[1:], ends1, ends1[1:]):
+        t0 = _params(ring0, a0, b0)
+        t1 = _params(ring1, a1, b1)
+        i, j = a0, a1
+        while i < b0 or j < b1:
+            if j == b1 or (i < b0 and t0[i + 1 - a0] <= t1[j + 1 - a1]):
+                faces.append((i % n, (i + 1) % n, n + j % m))
+                i += 1
+            else:
+                faces.append((i % n, n + (j + 1) % m, n + j % m))
+                j += 1
+
+    # outward for a counter clockwise ring0 when ring1 is further aft
+    if (ring_area(ring0) > 0) != (mean_z(ring1) > mean_z(ring0)):
+        faces = [(a, c, b) for a, b, c in faces]
+
+    return faces
+
+
+def cap_faces(ring, offset=0, forward=True):
+    '''Fan triangulation of a section used to close the ends of the
+    hull. forward is True for the cap facing toward lower z'''
+    faces = [(offset, offset + k + 1, offset + k)
+             for k in range(1, len(ring) - 1)]
+    if (ring_area(ring) > 0) != forward:
+        faces = [(a, c, b) for a, b, c in faces]
+
+    return faces
+
+
+def strip_triangles(ring0, ring1):
+    '''The triangles of the band between two rings as point triples'''
+    points = ring0 + ring1
+    return [(points[a], points[b], points[c])
+            for a, b, c in stitch_faces(ring0, ring1)]
+
+
+def cap_triangles(ring, forward=True):
+    return [(ring[a], ring[b], ring[c])
+            for a, b, c in cap_faces(ring, 0, forward)]
+
+
+def mirror_triangles(triangles):
+    '''Reflect triangles across the center line, keeping them facing
+    outward'''
+    return [((-a[0], a[1], a[2]), (-c[0], c[1], c[2]), (-b[0], b[1], b[2]))
+            for a, b, c in triangles]
+
+
+def hull_triangles(sections, half_hull=True):
+    '''Triangles for the whole hull from a list of cross sections'''
+    rings = [closed_section(s) for s in sections]
+
+    ascending = mean_z(rings[0]) <= mean_z(rings[-1])
+    triangles = cap_triangles(rings[0], ascending)
+    for ring0, ring1 in zip(rings, rings[1:]):
+        triangles += strip_triangles(ring0, ring1)
+    triangles += cap_triangles(rings[-1], not ascending)
+
+    if not half_hull:
+        triangles += mirror_triangles(triangles)
+
+    return triangles
+
+
+def normal(tri):
+    a, b, c = tri
+    ux, uy, uz = b[0] - a[0], b[1] - a[1], b[2] - a[2]
+    vx, vy, vz = c[0] - a[0], c[1] - a[1], c[2] - a[2]
+    nx = uy * vz - uz * vy
+    ny = uz * vx - ux * vz
+    nz = ux * vy - uy * vx
+    d = (nx * nx + ny * ny + nz * nz) ** 0.5 or 1.0
+
+    return nx / d, ny / d, nz / d
+
+
+def signed_volume(triangles):
+    '''Volume enclosed by a closed mesh, positive if it faces out'''
+    v = 0.0
+    for a, b, c in triangles:
+        v += (a[0] * (b[1] * c[2] - b[2] * c[1])
+              - a[1] * (b[0] * c[2] - b[2] * c[0])
+              + a[2] * (b[0] * c[1] - b[1] * c[0]))
+
+    return v / 6.0
+
+
+def stl_header(count, name='hull'):
+    '''The 84 byte header of a binary STL file'''
+    header = name.encode('ascii', 'replace')[:80].ljust(80, b' ')
+    return header + struct.pack('<I', count)
+
+
+def pack_triangles(triangles):
+    '''The binary STL records for a list of triangles'''
+    pack = struct.Struct('<12fH').pack
+    return b''.join(pack(*(normal(t) + t[0] + t[1] + t[2] + (0,)))
+                    for t in triangles)
+
+
+def write_stl(opf, triangles, name='hull', binary=True):
+    '''Write triangles to a file opened in binary mode'''
+    if binary:
+        opf.write(stl_header(len(triangles), name))
+        opf.write(pack_triangles(triangles))
+    else:
+        out = ['solid {0}\n'.format(name)]
+        for t in triangles:
+            out.append('facet normal {0:e} {1:e} {2:e}\n'.format(*normal(t)))
+            out.append(' outer loop\n')
+            for p in t:
+                out.append('  vertex {0:e} {1:e} {2:e}\n'.format(*p))
+            out.append(' endloop\nendfacet\n')
+        out.append('endsolid {0}\n'.format(name))
+        opf.write(''.join(out).encode('ascii'))
+
+
+def export_stl(offset_data, filename, half_hull=True, binary=True):
+    '''Mesh the sections of offset_data and write them to an STL file'''
+    triangles = hull_triangles(offset_data['sections'], half_hull)
+    with open(filename, 'wb') as opf:
+        write_stl(opf, triangles, binary=binary)
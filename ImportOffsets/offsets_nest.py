@@ -0,0 +1,407 @@
+# -*- coding: utf-8 -*-
+
+"""
+Nest the flat parts of a hull, the station molds and the developed
+panels, onto plywood sheets.
+
+Parts are placed largest first, each at the lowest then leftmost spot
+on the first sheet it fits, trying each allowed rotation. The spots
+tried are the corners of the parts already placed (bottom-left fill).
+The parts on each sheet are kept in a grid of cells so a candidate
+spot is only checked against the parts near it, first by bounding box
+and then outline against outline.
+
+    python offsets_nest.py table.csv --sheet 48x96 --plank 0.25
+
+writes table.nest.svg with one sheet above the other and prints the
+material used.
+"""
+
+__author__ = "Robert Marchese"
+__version__ = "0.1.0"
+__license__ = "MIT"
+
+import argparse
+import collections
+import math
+import os
+import sys
+
+try:
+    from . import offsets_frames
+    from . import offsets_panels
+    from . import offsets_plan
+    from . import offsets_reader
+except ImportError:
+    import offsets_frames
+    import offsets_panels
+    import offsets_plan
+    import offsets_reader
+
+
+# clearance is the outline grown by half the gap left between parts,
+# what is kept apart on the sheet; None when it is the outline itself
+Part = collections.namedtuple('Part', 'name outline clearance',
+                              defaults=(None,))
+Placement = collections.namedtuple('Placement', 'name sheet angle outline')
+
+ROTATIONS = (0, 90, 180, 270)
+LAYERS = (('sheets', 8), ('parts', 7), ('labels', 3))
+
+
+def parse_sheet(text):
+    '''Sheet size from "48x96"'''
+    try:
+        width, height = [float(v) for v in text.lower().split('x')]
+    except ValueError:
+        raise ValueError('sheet size should look like 48x96: '
+                         '{0}'.format(text))
+    return width, height
+
+
+def _bounds(points):
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _turn(points, angle):
+    '''The points turned angle degrees counter clockwise'''
+    c = math.cos(math.radians(angle))
+    s = math.sin(math.radians(angle))
+    if angle % 90 == 0:
+        c, s = round(c), round(s)
+    return [(x * c - y * s, x * s + y * c) for x, y in points]
+
+
+def _move(points, dx, dy):
+    return [(x + dx, y + dy) for x, y in points]
+
+
+def _inside(point, polygon, eps=1e-9):
+    '''True when point is strictly inside polygon (even-odd rule).
+    Points within eps of the boundary are not inside'''
+    x, y = point
+    inside = False
+    n = len(polygon)
+    for i in range(n):
+        x0, y0 = polygon[i - 1]
+        x1, y1 = polygon[i]
+        dx, dy = x1 - x0, y1 - y0
+        if min(x0, x1) - eps <= x <= max(x0, x1) + eps and \
+                min(y0, y1) - eps <= y <= max(y0, y1) + eps and \
+                abs((x - x0) * dy - (y - y0) * dx) <= eps * math.hypot(dx, dy):
+            return False
+        if (y0 > y) != (y1 > y):
+            if x0 + (y - y0) * dx / dy > x:
+                inside = not inside
+    return inside
+
+
+def _crosses(a, b):
+    '''True when an edge of a crosses an edge of b. Edges that only
+    touch do not count, so parts may share a boundary'''
+    bx = [(min(p[0], q[0]), max(p[0], q[0]), p, q)
+          for p, q in zip(b, b[1:] + b[:1])]
+    for p0, p1 in zip(a, a[1:] + a[:1]):
+        lo, hi = min(p0[0], p1[0]), max(p0[0], p1[0])
+        rx, ry = p1[0] - p0[0], p1[1] - p0[1]
+        for lo2, hi2, q0, q1 in bx:
+            if lo2 > hi or hi2 < lo:
+                continue
+            sx, sy = q1[0] - q0[0], q1[1] - q0[1]
+            denom = rx * sy - ry * sx
+            if denom == 0:
+                continue
+            qx, qy = q0[0] - p0[0], q0[1] - p0[1]
+            t = (qx * sy - qy * sx) / denom
+            u = (qx * ry - qy * rx) / denom
+            if 1e-9 < t < 1 - 1e-9 and 1e-9 < u < 1 - 1e-9:
+                return True
+    return False
+
+
+def _probes(polygon):
+    '''Points just inside a counter clockwise polygon, one by each edge'''
+    out = []
+    for (x0, y0), (x1, y1) in zip(polygon, polygon[1:] + polygon[:1]):
+        length = math.hypot(x1 - x0, y1 - y0)
+        if length == 0:
+            continue
+        e = 1e-6 * length
+        out.append(((x0 + x1) / 2 - e * (y1 - y0) / length,
+                    (y0 + y1) / 2 + e * (x1 - x0) / length))
+    return out
+
+
+def overlaps(a, b):
+    '''True when the polygons a and b share more than their boundary'''
+    if _crosses(a, b):
+        return True
+    return any(_inside(p, b) for p in a + _probes(a)) or \
+        any(_inside(p, a) for p in b)
+
+
+class Sheet(object):
+    '''The parts placed on one sheet, with a grid of cells listing the
+    parts over each so overlap checks only look nearby'''
+
+    def __init__(self, width, height, cell=None):
+        self.width = width
+        self.height = height
+        self.cell = cell or max(width, height) / 16.0
+        self.parts = []
+        self.grid = collections.defaultdict(list)
+        self.xs = {0.0}
+        self.ys = {0.0}
+
+    def _cells(self, box):
+        c = self.cell
+        for i in range(int(box[0] // c), int(box[2] // c) + 1):
+            for j in range(int(box[1] // c), int(box[3] // c) + 1):
+                yield i, j
+
+    def fits(self, outline, box):
+        '''True when outline at its place overlaps nothing on the sheet'''
+        if box[0] < 0 or box[1] < 0 or box[2] > self.width + 1e-9 or \
+                box[3] > self.height + 1e-9:
+            return False
+        seen = set()
+        for key in self._cells(box):
+            for k in self.grid.get(key, ()):
+                if k in seen:
+                    continue
+                seen.add(k)
+                other, obox = self.parts[k]
+                if obox[0] >= box[2] or box[0] >= obox[2] or \
+                        obox[1] >= box[3] or box[1] >= obox[3]:
+                    continue
+                if overlaps(outline, other):
+                    return False
+        return True
+
+    def add(self, outline, box):
+        k = len(self.parts)
+        self.parts.append((outline, box))
+        for key in self._cells(box):
+            self.grid[key].append(k)
+        self.xs.add(box[2])
+        self.ys.add(box[3])
+
+    def spot(self, outline):
+        '''The lowest, then leftmost, place for outline, whose bounding
+        box starts at the origin. Returns (x, y) or None'''
+        _, _, w, h = _bounds(outline)
+        for y in sorted(self.ys):
+            if y + h > self.height + 1e-9:
+                break
+            for x in sorted(self.xs):
+                if x + w > self.width + 1e-9:
+                    break
+                box = (x, y, x + w, y + h)
+                moved = [(px + x, py + y) for px, py in outline]
+                if self.fits(moved, box):
+                    return x, y
+        return None
+
+
+def polygon_part(name, points, gap=0.0):
+    '''A Part from a polygon, closing point optional. Its clearance is
+    the polygon grown by half the gap, so parts nested edge to edge end
+    up gap apart'''
+    points = [tuple(p) for p in points]
+    if len(points) > 1 and points[0] == points[-1]:
+        points.pop()
+    if offsets_frames.polygon_area(points) < 0:
+        points.reverse()
+    clearance = None
+    if gap:
+        clearance = offsets_frames.offset_polygon(points, gap / 2.0)
+    return Part(name, points, clearance)
+
+
+def _turns(part, rotations, width, height):
+    '''(angle, clearance, outline) of the part turned to each of the
+    rotations that fit the sheet, both moved so the clearance starts at
+    the origin'''
+    out = []
+    for angle in rotations:
+        clearance = _turn(part.clearance or part.outline, angle)
+        x0, y0, x1, y1 = _bounds(clearance)
+        if x1 - x0 > width + 1e-9 or y1 - y0 > height + 1e-9:
+            continue
+        out.append((angle, _move(clearance, -x0, -y0),
+                    _move(_turn(part.outline, angle), -x0, -y0)))
+    return out
+
+
+def nest(parts, sheet=(48.0, 96.0), rotations=ROTATIONS):
+    '''Place the parts on as few sheets as bottom-left fill manages,
+    keeping their clearances apart. Returns the list of Placements, with
+    the outlines of the parts where they go, and the parts too big for a
+    sheet'''
+    width, height = sheet
+    order = sorted(parts, key=lambda p: -abs(
+        offsets_frames.polygon_area(p.clearance or p.outline)))
+    sheets = []
+    placed = []
+    unplaced = []
+    for part in order:
+        turns = _turns(part, rotations, width, height)
+        if not turns:
+            unplaced.append(part)
+            continue
+        for k in range(len(sheets) + 1):
+            if k == len(sheets):
+                sheets.append(Sheet(width, height))
+            best = None
+            for angle, clearance, outline in turns:
+                spot = sheets[k].spot(clearance)
+                if spot is None:
+                    continue
+                key = (spot[1], spot[0], _bounds(clearance)[3])
+                if best is None or key < best[0]:
+                    best = (key, angle, clearance, outline, spot)
+            if best is not None:
+                break
+        _, angle, clearance, outline, (x, y) = best
+        sheets[k].add(_move(clearance, x, y),
+                      (x, y) + (x + _bounds(clearance)[2],
+                                y + _bounds(clearance)[3]))
+        placed.append(Placement(part.name, k, angle, _move(outline, x, y)))
+
+    return placed, unplaced
+
+
+def utilisation(placed, sheet):
+    '''The fraction of each sheet used, and of all the sheets together'''
+    count = max([p.sheet for p in placed] or [-1]) + 1
+    area = sheet[0] * sheet[1]
+    used = [0.0] * count
+    for p in placed:
+        used[p.sheet] += abs(offsets_frames.polygon_area(p.outline))
+    each = [u / area for u in used]
+    total = sum(used) / (area * count) if count else 0.0
+    return each, total
+
+
+def hull_parts(offset_data, plank=0.0, kerf=0.0, names=None, tolerance=0.01,
+               gap=0.25, labels=None):
+    '''The parts to cut for a hull: a mold for each station, as its
+    cutter path, and a pair of each developed panel. names are the lines
+    the panels run between, labels the station names the molds are
+    called by, offsets_reader.station_labels()'''
+    parts = []
+    for frame in offsets_frames.frames(offset_data, plank, kerf,
+                                       names=labels):
+        parts.append(polygon_part(frame.name, frame.path, gap))
+    for panel in offsets_panels.develop(offset_data, names):
+        outline = offsets_plan.simplify(offsets_panels.outline(panel),
+                                        tolerance)
+        for side in ('port', 'starboard'):
+            parts.append(polygon_part('{0} {1}'.format(panel.name, side),
+                                      outline, gap))
+    return parts
+
+
+def write_layout(opf, placed, sheet, fmt='svg', scale=1.0, units='in',
+                 digits=3):
+    '''Draw the sheets one above the other with their parts'''
+    width, height = sheet
+    count = max([p.sheet for p in placed] or [0]) + 1
+    space = 0.1 * width
+    extent = (0.0, 0.0, width, count * height + (count - 1) * space)
+    if fmt == 'svg':
+        writer = offsets_plan.SvgWriter(opf, extent, scale, units, digits)
+    elif fmt == 'dxf':
+        writer = offsets_plan.DxfWriter(opf, extent, scale, digits, LAYERS)
+    else:
+        raise ValueError('unknown drawing format: {0}'.format(fmt))
+
+    def base(k):
+        return (count - 1 - k) * (height + space)
+
+    for k in range(count):
+        y = base(k)
+        writer.polyline('sheets', [(0.0, y), (width, y), (width, y + height),
+                                   (0.0, y + height), (0.0, y)])
+    for p in placed:
+        y = base(p.sheet)
+        writer.polyline('parts', [(px, py + y) for px, py in
+                                  p.outline + p.outline[:1]])
+    size = 0.02 * width
+    for p in placed:
+        x0, y0, x1, y1 = _bounds(p.outline)
+        writer.text('labels', x0 + size, base(p.sheet) + (y0 + y1) / 2, size,
+                    p.name)
+    writer.close()
+
+
+def report(placed, unplaced, sheet, stream=sys.stdout):
+    each, total = utilisation(placed, sheet)
+    for k, used in enumerate(each):
+        count = sum(1 for p in placed if p.sheet == k)
+        stream.write('sheet {0}: {1} parts, {2:.1f}% used\n'.format(
+            k + 1, count, 100 * used))
+    stream.write('{0} sheets of {1:g}x{2:g}, {3:.1f}% used\n'.format(
+        len(each), sheet[0], sheet[1], 100 * total))
+    for part in unplaced:
+        stream.write('too big for the sheet: {0}\n'.format(part.name))
+
+
+if __name__ == "__main__":
+    ''' This is executed when run from the command line '''
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("filenames", nargs='+',
+                        help="input .csv files (offset tables)")
+
+    parser.add_argument("--sheet", action="store", default="48x96",
+                        help="sheet size, width x height (default 48x96)")
+
+    parser.add_argument("-g", "--gap", action="store", type=float,
+                        default=0.25, help="space left between parts")
+
+    parser.add_argument("-p", "--plank", action="store", type=float,
+                        default=0.0, help="plank thickness")
+
+    parser.add_argument("-k", "--kerf", action="store", type=float,
+                        default=0.0, help="width of the cut")
+
+    parser.add_argument("-r", "--rotations", action="store",
+                        default="0,90,180,270",
+                        help="comma separated angles parts may be turned")
+
+    parser.add_argument("-f", "--format", choices=offsets_plan.FORMATS,
+                        default='svg', help="layout format (default svg)")
+
+    parser.add_argument("-b", "--bow", action="store", type=float,
+                        dest="bow_angle", default=90,
+                        help="Angle of the bow measured from the baseline ")
+
+    parser.add_argument("-t", "--transom", action="store", type=float,
+                        dest="transom_angle", default=90,
+                        help="Angle of the transom measured from the "
+                             "baseline")
+
+    parser.add_argument(
+        "--version",
+        action="version",
+        version="%(prog)s (version {version})".format(version=__version__))
+
+    args = parser.parse_args()
+    sheet = parse_sheet(args.sheet)
+    rotations = [float(a) for a in args.rotations.split(',')]
+    for filename in args.filenames:
+        rows = offsets_reader.read_rows(filename)
+        offset_data = offsets_reader.rake_ends(
+            offsets_reader.offsets_from_rows(rows), args.bow_angle,
+            args.transom_angle)
+        parts = hull_parts(offset_data, args.plank, args.kerf, gap=args.gap,
+                           labels=offsets_reader.station_labels(rows))
+        placed, unplaced = nest(parts, sheet, rotations)
+        sys.stdout.write('{0}\n'.format(filename))
+        report(placed, unplaced, sheet)
+        name = os.path.splitext(filename)[0] + '.nest.' + args.format
+        with open(name, 'w') as opf:
+            write_layout(opf, placed, sheet, args.format)
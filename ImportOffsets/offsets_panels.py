@@ -0,0 +1,413 @@
+# -*- coding: utf-8 -*-
+
+"""
+Develops (unrolls) the panels of a sheet built hull. The strip between
+two neighbouring lines, gunwale to chine or chine to bottom, is
+triangulated along its length and the triangles are laid flat one after
+the other, each keeping the lengths of its edges, so the flat pattern
+has the true length of both edges of the panel.
+
+A sheet of plywood can only take the shape if the strip is developable:
+from each point on one edge there is a straight line (a ruling) to the
+other edge along which the surface does not twist. The developability
+error is, for each point of the upper edge, the twist in degrees of the
+best line found to the lower edge, 0 where there is a ruling. A degree
+or two is normal for a table read off a drawing, much more means the
+panel needs to be fitted or the lines faired.
+
+The patterns are written as SVG or DXF with the station marks, so the
+builder can transfer them to the sheet.
+"""
+
+__author__ = "Robert Marchese"
+__version__ = "0.1.0"
+__license__ = "MIT"
+
+import argparse
+import collections
+import math
+import os
+import sys
+
+try:
+    from . import offsets_plan
+    from . import offsets_reader
+except ImportError:
+    import offsets_plan
+    import offsets_reader
+
+
+Panel = collections.namedtuple(
+    'Panel', 'name upper lower stations max_error rms_error')
+Panel.__doc__ = '''A panel laid flat. upper and lower are the 2D
+points along the two edges, stations are the (upper, lower) point
+pairs at the stations both lines reach and the errors are the twist
+in degrees'''
+
+LAYERS = (('outline', 7), ('stations', 1), ('labels', 3))
+
+
+def _valid(points):
+    '''The points of a line that are there, with their station index'''
+    return [(i, p) for i, p in enumerate(points) if p]
+
+
+def strip_faces(a, b):
+    '''Triangulate the strip between the open polylines a and b, taking
+    the shorter diagonal at each step. Returns the vertex each triangle
+    adds as ('a' or 'b', index), in the order the strip is unrolled.
+    Each triangle is the new vertex and the last vertex reached on
+    each side'''
+    n = len(a)
+    m = len(b)
+    i = j = 0
+    steps = []
+    while i < n - 1 or j < m - 1:
+        if j == m - 1 or (i < n - 1 and
+                          math.dist(a[i + 1], b[j]) <=
+                          math.dist(a[i], b[j + 1])):
+            i += 1
+            steps.append(('a', i))
+        else:
+            j += 1
+            steps.append(('b', j))
+
+    return steps
+
+
+def _place(p, q, dp, dq, side):
+    '''The point dp from p and dq from q, on the left of p->q when side
+    is positive'''
+    ux = q[0] - p[0]
+    uy = q[1] - p[1]
+    base = math.sqrt(ux * ux + uy * uy)
+    if base == 0:
+        return (p[0] + dp, p[1])
+    ux /= base
+    uy /= base
+    along = (dp * dp - dq * dq + base * base) / (2 * base)
+    h = math.sqrt(max(dp * dp - along * along, 0.0))
+    if side < 0:
+        h = -h
+
+    return (p[0] + along * ux - h * uy, p[1] + along * uy + h * ux)
+
+
+def _side(p, q, r):
+    '''Positive when r is on the left of p->q'''
+    return (q[0] - p[0]) * (r[1] - p[1]) - (q[1] - p[1]) * (r[0] - p[0])
+
+
+def unroll(a, b):
+    '''Lay the strip between the 3D polylines a and b flat. Returns the
+    2D points of a and b'''
+    flat_a = [None] * len(a)
+    flat_b = [None] * len(b)
+    flat_a[0] = (0.0, 0.0)
+    flat_b[0] = (0.0, -math.dist(a[0], b[0]))
+
+    i = j = 0
+    last = None
+    for side, k in strip_faces(a, b):
+        p3, q3 = a[i], b[j]
+        p2, q2 = flat_a[i], flat_b[j]
+        if side == 'a':
+            v3 = a[k]
+        else:
+            v3 = b[k]
+
+        # away from the triangle laid before this one
+        away = 1.0 if last is None else -_side(p2, q2, last)
+        v2 = _place(p2, q2, math.dist(v3, p3), math.dist(v3, q3), away)
+
+        if side == 'a':
+            last = flat_a[i]
+            flat_a[k] = v2
+            i = k
+        else:
+            last = flat_b[j]
+            flat_b[k] = v2
+            j = k
+
+    return flat_a, flat_b
+
+
+def sub(u, v):
+    '''The 3D vector u - v'''
+    return (u[0] - v[0], u[1] - v[1], u[2] - v[2])
+
+
+def cross(u, v):
+    '''The cross product of 3D vectors'''
+    return (u[1] * v[2] - u[2] * v[1],
+            u[2] * v[0] - u[0] * v[2],
+            u[0] * v[1] - u[1] * v[0])
+
+
+def dot(u, v):
+    '''The dot product of 3D vectors'''
+    return u[0] * v[0] + u[1] * v[1] + u[2] * v[2]
+
+
+def tangents(points):
+    '''Central difference tangents along a polyline'''
+    n = len(points)
+    return [sub(points[min(k + 1, n - 1)], points[max(k - 1, 0)])
+            for k in range(n)]
+
+
+def twist(p, tp, q, tq):
+    '''The signed angle between the planes the tangent tp at p and the
+    tangent tq at q make with the line p-q. A developable surface has
+    lines (rulings) between its edges with no twist'''
+    r = sub(q, p)
+    size = math.sqrt(dot(r, r))
+    if size == 0:
+        return 0.0
+    np = cross(tp, r)
+    nq = cross(tq, r)
+
+    return math.atan2(dot(cross(np, nq), r) / size, dot(np, nq))
+
+
+def ruling_errors(a, b, reach, samples=256):
+    '''The twist (radians) of the best line to b from points along a.
+    It is 0 where a ruling can be found, a line whose twist changes
+    sign, among the points of b within reach along the hull, at the
+    ends of a, or where the twist gets smaller toward the end of b.
+
+    Rulings run in order along the panel so the search starts from the
+    last one found. Long lines are checked at about samples points on
+    each edge, which is plenty to find the worst twist of a resampled
+    table'''
+    ta = tangents(a)
+    tb = tangents(b)
+    n = len(a)
+    m = len(b)
+    stride = max(1, m // samples)
+    j = 0
+    errors = []
+    for i in range(0, n, max(1, n // samples)):
+        p = a[i]
+        tp = ta[i]
+        # start from the nearest point of b from the last ruling on
+        while j + 1 < m and abs(b[j + 1][2] - p[2]) < abs(b[j][2] - p[2]):
+            j += 1
+
+        seen = {j: twist(p, tp, b[j], tb[j])}
+        found = seen[j] == 0
+        lo = hi = j
+        while not found:
+            moved = False
+            for k, last in ((min(hi + stride, m - 1), hi),
+                            (max(lo - stride, 0), lo)):
+                if k == last or abs(b[k][2] - p[2]) > reach:
+                    continue
+                seen[k] = twist(p, tp, b[k], tb[k])
+                if seen[k] == 0 or (seen[k] > 0) != (seen[last] > 0):
+                    found = True
+                    j = k
+                    break
+                if k > last:
+                    hi = k
+                else:
+                    lo = k
+                moved = True
+            if not moved:
+                break
+
+        # the ends of the panel, the stem and transom, are cut edges so
+        # a ruling may leave through them instead of reaching b
+        best = min(seen, key=lambda k: abs(seen[k]))
+        if found or best in (0, m - 1) or i in (0, n - 1):
+            errors.append(0.0)
+        else:
+            errors.append(abs(seen[best]))
+
+    return errors
+
+
+def level(points, start, end):
+    '''Rotate and move the points so the chord from start to end lies
+    along the x axis from the origin'''
+    dx = end[0] - start[0]
+    dy = end[1] - start[1]
+    length = math.sqrt(dx * dx + dy * dy) or 1.0
+    c = dx / length
+    s = dy / length
+    return [((x - start[0]) * c + (y - start[1]) * s,
+             (y - start[1]) * c - (x - start[0]) * s) for x, y in points]
+
+
+def develop_panel(name, upper, lower):
+    '''Develop the panel between two lines of offset_data (lists of
+    (x, y, z) points, [] where missing). Returns a Panel, or None when
+    the lines do not make a strip'''
+    upper = _valid(upper)
+    lower = _valid(lower)
+    if not upper or not lower or len(upper) + len(lower) < 3:
+        return None
+
+    a = [p for _, p in upper]
+    b = [p for _, p in lower]
+    flat_a, flat_b = unroll(a, b)
+
+    n = len(flat_a)
+    flat = level(flat_a + flat_b, flat_a[0], flat_a[-1])
+    flat_a, flat_b = flat[:n], flat[n:]
+
+    where = dict((i, k) for k, (i, _) in enumerate(lower))
+    stations = [(flat_a[k], flat_b[where[i]])
+                for k, (i, _) in enumerate(upper) if i in where]
+
+    # rulings may fan out across a few stations, but not much further
+    # than the width of the panel
+    reach = max(math.dist(p, q) for p, q in zip(a, b)) * 4
+    errors = [math.degrees(e) for e in ruling_errors(a, b, reach)]
+    max_error = max(errors or [0.0])
+    rms_error = math.sqrt(sum(e * e for e in errors) / len(errors)) \
+        if errors else 0.0
+
+    return Panel(name, flat_a, flat_b, stations, max_error, rms_error)
+
+
+def panel_names(offset_data, names=None, centerline=False):
+    '''The lines to develop panels between, in order down the section.
+    By default the lines in the order of offset_data, leaving out the
+    center line projections unless centerline adds the panel from the
+    lowest line to the center line (a flat bottom)'''
+    if names is None:
+        names = [name for name in offset_data['lines']
+                 if not name.startswith('_')]
+    names = list(names)
+    if centerline:
+        names.append('_lower_cl')
+
+    return names
+
+
+def develop(offset_data, names=None, centerline=False):
+    '''Develop the panel between each pair of neighbouring lines.
+    Returns a list of Panels'''
+    names = panel_names(offset_data, names, centerline)
+    lines = offset_data['lines']
+    panels = []
+    for upper, lower in zip(names, names[1:]):
+        panel = develop_panel('{0}-{1}'.format(upper, lower), lines[upper],
+                              lines[lower])
+        if panel:
+            panels.append(panel)
+
+    return panels
+
+
+def outline(panel):
+    '''The closed outline of a flat panel'''
+    return panel.upper + panel.lower[::-1] + [panel.upper[0]]
+
+
+def _bounds(points):
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def write_patterns(opf, panels, fmt='svg', tolerance=0.01, scale=1.0,
+                   units='in', digits=3, gap=None):
+    '''Write the flat panels one above the other to an open text file.
+    The outlines are simplified to within tolerance'''
+    bounds = [_bounds(outline(p)) for p in panels]
+    if gap is None:
+        gap = 0.05 * max([b[2] - b[0] for b in bounds] or [1.0])
+    label = gap * 0.5
+
+    # stack the panels downward, the first at the top
+    shifts = []
+    y = 0.0
+    for b in bounds:
+        y -= b[3] - b[1] + gap + label
+        shifts.append((-b[0], y - b[1]))
+    width = max([b[2] - b[0] for b in bounds] or [1.0])
+    extent = (0.0, y, width, 0.0)
+
+    if fmt == 'svg':
+        writer = offsets_plan.SvgWriter(opf, extent, scale, units, digits)
+    elif fmt == 'dxf':
+        writer = offsets_plan.DxfWriter(opf, extent, scale, digits, LAYERS)
+    else:
+        raise ValueError('unknown drawing format: {0}'.format(fmt))
+
+    def moved(points, shift):
+        return [(x + shift[0], y + shift[1]) for x, y in points]
+
+    for panel, shift in zip(panels, shifts):
+        writer.polyline('outline', offsets_plan.simplify(
+            moved(outline(panel), shift), tolerance))
+    for panel, shift in zip(panels, shifts):
+        for pair in panel.stations:
+            writer.polyline('stations', moved(pair, shift))
+    for panel, b, shift in zip(panels, bounds, shifts):
+        writer.text('labels', 0.0, b[3] + shift[1] + 0.2 * label,
+                    0.6 * label, panel.name)
+    writer.close()
+
+
+def report(panels, stream=sys.stdout):
+    stream.write('{0:<24}{1:>12}{2:>12}{3:>12}\n'.format(
+        'panel', 'length', 'max twist', 'rms twist'))
+    for panel in panels:
+        stream.write('{0:<24}{1:>12.3f}{2:>12.2f}{3:>12.2f}\n'.format(
+            panel.name, panel.upper[-1][0], panel.max_error,
+            panel.rms_error))
+
+
+if __name__ == "__main__":
+    ''' This is executed when run from the command line '''
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("filenames", nargs='+',
+                        help="input .csv files (offset tables)")
+
+    parser.add_argument("-f", "--format", action="append", dest="formats",
+                        choices=offsets_plan.FORMATS,
+                        help="pattern format, may be repeated (default svg)")
+
+    parser.add_argument("-l", "--lines", action="store", dest="lines",
+                        help="comma separated lines to develop between "
+                             "(default every line in table order)")
+
+    parser.add_argument("-c", "--centerline", action="store_true",
+                        default=False,
+                        help="add the panel from the lowest line to the "
+                             "center line")
+
+    parser.add_argument("-b", "--bow", action="store", type=float,
+                        dest="bow_angle", default=90,
+                        help="Angle of the bow measured from the baseline ")
+
+    parser.add_argument("-t", "--transom", action="store", type=float,
+                        dest="transom_angle", default=90,
+                        help="Angle of the transom measured from the "
+                             "baseline")
+
+    parser.add_argument(
+        "--version",
+        action="version",
+        version="%(prog)s (version {version})".format(version=__version__))
+
+    args = parser.parse_args()
+    for filename in args.filenames:
+        lines, line_order, angles = offsets_reader.parse_csv_offsets(filename)
+        offset_data = offsets_reader.rake_ends(
+            offsets_reader.offsets_from_lines(lines, line_order, angles),
+            args.bow_angle, args.transom_angle)
+        names = args.lines.split(',') if args.lines else \
+            [name for name in line_order if name in lines]
+        panels = develop(offset_data, names, args.centerline)
+
+        sys.stdout.write('{0}\n'.format(filename))
+        report(panels)
+        for fmt in args.formats or ['svg']:
+            out = os.path.splitext(filename)[0] + '.panels.' + fmt
+            with open(out, 'w') as opf:
+                write_patterns(opf, panels, fmt)
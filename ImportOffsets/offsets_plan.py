@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+
+"""
+Draws the lines plan of a hull, the three classic views laid out on one
+sheet, as SVG or DXF:
+
+    profile         the lines seen from the side, station along the
+                    sheet and height up
+    half-breadth    the lines seen from above, below the profile
+    body plan       the sections end on, to the right of the profile,
+                    the forward half of the stations on the right of
+                    the centerline and the aft half on the left
+
+Heights measured down from a datum are turned over, so the keel is at
+the bottom of the profile and body plan whichever way the table runs.
+
+Each polyline is simplified (Douglas-Peucker) to within a tolerance in
+table units before it is written, and the writers put out each polyline
+as it is made, so resampled hulls with thousands of stations can be
+drawn full size without holding the drawing in memory.
+"""
+
+__author__ = "Robert Marchese"
+__version__ = "0.1.0"
+__license__ = "MIT"
+
+import argparse
+import os
+from xml.sax.saxutils import escape
+
+try:
+    from . import offsets_reader
+except ImportError:
+    import offsets_reader
+
+
+FORMATS = ('svg', 'dxf')
+
+# layers in the order they are drawn, with their DXF colors
+LAYERS = (('centerline', 8), ('stations', 9), ('profile', 1),
+          ('half-breadth', 5), ('body-plan', 3))
+
+
+def simplify(points, tolerance):
+    '''Douglas-Peucker: the fewest of the 2D points, ends included, that
+    keep the polyline within tolerance of the original'''
+    n = len(points)
+    if n < 3 or tolerance <= 0:
+        return list(points)
+
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    keep = [False] * n
+    keep[0] = keep[-1] = True
+    tol2 = tolerance * tolerance
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        ax = xs[first]
+        ay = ys[first]
+        dx = xs[last] - ax
+        dy = ys[last] - ay
+        seg2 = dx * dx + dy * dy
+
+        # twice the area of the triangle each point makes with the
+        # chord, over the chord length is the distance from it
+        if seg2 > 0:
+            d = [abs((x - ax) * dy - (y - ay) * dx) for x, y in
+                 zip(xs[first + 1:last], ys[first + 1:last])]
+            limit = tol2 * seg2
+        else:
+            d = [(x - ax) ** 2 + (y - ay) ** 2 for x, y in
+                 zip(xs[first + 1:last], ys[first + 1:last])]
+            limit = tol2
+        worst = max(d)
+        if (worst * worst if seg2 > 0 else worst) > limit:
+            index = first + 1 + d.index(worst)
+            keep[index] = True
+            stack.append((index, last))
+            stack.append((first, index))
+
+    return [p for p, k in zip(points, keep) if k]
+
+
+def runs(points):
+    '''Split a line at its missing points ([] in offset_data)'''
+    run = []
+    for p in points:
+        if p:
+            run.append(p)
+        elif run:
+            yield run
+            run = []
+    if run:
+        yield run
+
+
+class Layout(object):
+    '''Where each view goes on the sheet, in table units with y up'''
+
+    def __init__(self, offset_data, gap=None):
+        sections = [[p for p in s if p] for s in offset_data['sections']]
+        # heights measured down from a datum are drawn the right way up
+        self.sign = 1.0 if offsets_reader.heights_up(sections) else -1.0
+        points = [p for s in sections for p in s]
+        points.extend(p for line in offset_data['lines'].values()
+                      for p in line if p)
+        xs = [p[0] for p in points] + [0.0]
+        ys = [self.sign * p[1] for p in points]
+        zs = [p[2] for p in points]
+        self.z0, self.z1 = min(zs), max(zs)
+        self.y0, self.y1 = min(ys), max(ys)
+        self.x0, self.x1 = min(xs), max(xs)
+        span = max(self.z1 - self.z0, self.y1 - self.y0, self.x1 - self.x0)
+        self.gap = 0.1 * span if gap is None else gap
+
+        # the half-breadth centerline, below the profile
+        self.hb_base = self.y0 - self.gap - self.x1
+        # the body plan centerline, right of the profile
+        self.bp_center = self.z1 + self.gap + max(self.x1, -self.x0)
+        self.midship = 0.5 * (self.z0 + self.z1)
+
+    def extent(self):
+        '''(xmin, ymin, xmax, ymax) of the whole sheet'''
+        half = max(self.x1, -self.x0)
+        return (self.z0, self.hb_base + self.x0,
+                self.bp_center + half, self.y1)
+
+    def profile(self, points):
+        return [(p[2], self.sign * p[1]) for p in points]
+
+    def half_breadth(self, points):
+        base = self.hb_base
+        return [(p[2], base + p[0]) for p in points]
+
+    def body_plan(self, points):
+        '''Forward sections to the right of the centerline, aft ones
+        mirrored to the left'''
+        c = self.bp_center
+        sign = self.sign
+        zs = [p[2] for p in points]
+        if sum(zs) / len(zs) >= self.midship:
+            return [(c + p[0], sign * p[1]) for p in points]
+        return [(c - p[0], sign * p[1]) for p in points]
+
+
+def plan_polylines(offset_data, tolerance=0.01, layout=None):
+    '''Yield (layer, points) for each polyline of the drawing, in layer
+    order'''
+    if layout is None:
+        layout = Layout(offset_data)
+
+    half = max(layout.x1, -layout.x0)
+    yield 'centerline', [(layout.z0, layout.hb_base),
+                         (layout.z1, layout.hb_base)]
+    yield 'centerline', [(layout.bp_center, layout.y0),
+                         (layout.bp_center, layout.y1)]
+
+    for section in offset_data['sections']:
+        z = section[0][2] if section and section[0] else None
+        if z is None:
+            continue
+        yield 'stations', [(z, layout.y0), (z, layout.y1)]
+        yield 'stations', [(z, layout.hb_base), (z, layout.hb_base + half)]
+
+    for view, layer in ((layout.profile, 'profile'),
+                        (layout.half_breadth, 'half-breadth')):
+        for points in offset_data['lines'].values():
+            for run in runs(points):
+                yield layer, simplify(view(run), tolerance)
+
+    for section in offset_data['sections']:
+        section = [p for p in section if p]
+        if len(section) > 1:
+            yield 'body-plan', simplify(layout.body_plan(section), tolerance)
+
+
+class SvgWriter(object):
+    '''Writes polylines to an open text file as they come, one group
+    per layer. scale is sheet units per table unit'''
+
+    def __init__(self, opf, extent, scale=1.0, units='in', digits=3,
+                 stroke=0.01):
+        self.opf = opf
+        self.scale = scale
+        self.left = extent[0]
+        self.top = extent[3]
+        self.layer = None
+        self.fmt = '{{0:.{0}f}},{{1:.{0}f}}'.format(digits)
+
+        width = (extent[2] - extent[0]) * scale
+        height = (extent[3] - extent[1]) * scale
+        opf.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        opf.write('<svg xmlns="http://www.w3.org/2000/svg" '
+                  'width="{0:.{3}f}{2}" height="{1:.{3}f}{2}" '
+                  'viewBox="0 0 {0:.{3}f} {1:.{3}f}">\n'.format(
+                      width, height, units, digits))
+        opf.write('<style>polyline{{fill:none;stroke:black;'
+                  'stroke-width:{0}}}</style>\n'.format(stroke))
+
+    def _group(self, layer):
+        if layer != self.layer:
+            if self.layer is not None:
+                self.opf.write('</g>\n')
+            self.opf.write('<g id="{0}">\n'.format(layer))
+            self.layer = layer
+
+    def polyline(self, layer, points):
+        self._group(layer)
+        s = self.scale
+        fmt = self.fmt.format
+        left = self.left
+        top = self.top
+        self.opf.write('<polyline points="{0}"/>\n'.format(' '.join(
+            fmt((x - left) * s, (top - y) * s) for x, y in points)))
+
+    def text(self, layer, x, y, height, text):
+        '''A label with its baseline starting at x, y'''
+        self._group(layer)
+        s = self.scale
+        self.opf.write('<text x="{0:.3f}" y="{1:.3f}" font-size="{2:.3f}">'
+                       '{3}</text>\n'.format((x - self.left) * s,
+                                            (self.top - y) * s, height * s,
+                                            escape(str(text))))
+
+    def close(self):
+        if self.layer is not None:
+            self.opf.write('</g>\n')
+        self.opf.write('</svg>\n')
+
+
+class DxfWriter(object):
+    '''Writes polylines to an open text file as R12 DXF POLYLINE
+    entities, which every CAD and CAM program reads'''
+
+    def __init__(self, opf, extent, scale=1.0, digits=3, layers=LAYERS):
+        self.opf = opf
+        self.scale = scale
+        self.fmt = ('0\nVERTEX\n8\n{{0}}\n10\n{{1:.{0}f}}\n20\n{{2:.{0}f}}\n'
+                    '30\n0.0\n'.format(digits))
+
+        opf.write('0\nSECTION\n2\nHEADER\n9\n$ACADVER\n1\nAC1009\n')
+        opf.write('9\n$EXTMIN\n10\n{0}\n20\n{1}\n30\n0.0\n'.format(
+            extent[0] * scale, extent[1] * scale))
+        opf.write('9\n$EXTMAX\n10\n{0}\n20\n{1}\n30\n0.0\n'.format(
+            extent[2] * scale, extent[3] * scale))
+        opf.write('0\nENDSEC\n')
+        opf.write('0\nSECTION\n2\nTABLES\n0\nTABLE\n2\nLAYER\n70\n{0}\n'
+                  .format(len(layers)))
+        for name, color in layers:
+            opf.write('0\nLAYER\n2\n{0}\n70\n0\n62\n{1}\n6\nCONTINUOUS\n'
+                      .format(name, color))
+        opf.write('0\nENDTAB\n0\nENDSEC\n')
+        opf.write('0\nSECTION\n2\nENTITIES\n')
+
+    def polyline(self, layer, points):
+        s = self.scale
+        fmt = self.fmt.format
+        self.opf.write('0\nPOLYLINE\n8\n{0}\n66\n1\n70\n0\n'.format(layer))
+        self.opf.write(''.join(fmt(layer, x * s, y * s) for x, y in points))
+        self.opf.write('0\nSEQEND\n8\n{0}\n'.format(layer))
+
+    def text(self, layer, x, y, height, text):
+        s = self.scale
+        self.opf.write('0\nTEXT\n8\n{0}\n10\n{1}\n20\n{2}\n30\n0.0\n'
+                       '40\n{3}\n1\n{4}\n'.format(layer, x * s, y * s,
+                                                  height * s, text))
+
+    def close(self):
+        self.opf.write('0\nENDSEC\n0\nEOF\n')
+
+
+def write_plan(opf, offset_data, fmt='svg', tolerance=0.01, scale=1.0,
+               units='in', digits=3):
+    '''Write the lines plan of offset_data to an open text file'''
+    layout = Layout(offset_data)
+    if fmt == 'svg':
+        writer = SvgWriter(opf, layout.extent(), scale, units, digits)
+    elif fmt == 'dxf':
+        writer = DxfWriter(opf, layout.extent(), scale, digits)
+    else:
+        raise ValueError('unknown drawing format: {0}'.format(fmt))
+
+    for layer, points in plan_polylines(offset_data, tolerance, layout):
+        writer.polyline(layer, points)
+    writer.close()
+
+
+def export_svg(offset_data, filename, tolerance=0.01):
+    with open(filename, 'w') as opf:
+        write_plan(opf, offset_data, 'svg', tolerance)
+
+
+def export_dxf(offset_data, filename, tolerance=0.01):
+    with open(filename, 'w') as opf:
+        write_plan(opf, offset_data, 'dxf', tolerance)
+
+
+if __name__ == "__main__":
+    ''' This is executed when run from the command line '''
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("filenames", nargs='+',
+                        help="input .csv files (offset tables)")
+
+    parser.add_argument("-f", "--format", action="append", dest="formats",
+                        choices=FORMATS,
+                        help="drawing format, may be repeated (default svg)")
+
+    parser.add_argument("--tolerance", action="store", type=float,
+                        default=0.01,
+                        help="simplify the curves to within this distance "
+                             "in table units (default 0.01)")
+
+    parser.add_argument("-s", "--scale", action="store", type=float,
+                        default=1.0,
+                        help="sheet units per table unit (default 1)")
+
+    parser.add_argument("-u", "--units", action="store", default='in',
+                        help="SVG sheet units (default in)")
+
+    parser.add_argument("-b", "--bow", action="store", type=float,
+                        dest="bow_angle", default=90,
+                        help="Angle of the bow measured from the baseline ")
+
+    parser.add_argument("-t", "--transom", action="store", type=float,
+                        dest="transom_angle", default=90,
+                        help="Angle of the transom measured from the "
+                             "baseline")
+
+    parser.add_argument(
+        "--version",
+        action="version",
+        version="%(prog)s (version {version})".format(version=__version__))
+
+    args = parser.parse_args()
+    for filename in args.filenames:
+        offset_data = offsets_reader.rake_ends(
+            offsets_reader.offset_reader(filename), args.bow_angle,
+            args.transom_angle)
+        for fmt in args.formats or ['svg']:
+            out = os.path.splitext(filename)[0] + '.' + fmt
+            with open(out, 'w') as opf:
+                write_plan(opf, offset_data, fmt, args.tolerance,
+                           args.scale, args.units)
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+
+"""
+The profile of a hull on its center line, the outline of the side view
+of the keel, stem, sternpost and sheer:
+
+    sheer      the highest point of each section, along the length
+    keel       the lowest point of each section, along the length
+    stem       the end section with the narrower beam, from the sheer
+               down to the keel
+    sternpost  the other end section, a transom or sternpost, from the
+               sheer down to the keel
+
+    python offsets_profile.py SportDoryWithAngle.csv --refine 4
+
+The ends are taken from the end sections as they are raked, so a raked
+stem or transom is drawn where it is, not square at its table station.
+Heights may be measured up from a baseline or down from a datum, the
+highest and lowest are worked out in the direction the table runs.
+
+Between the stations the sheer and keel are only as good as the straight
+lines joining them. With refine, each gap is split into that many more
+points, and at each the lines of the table are interpolated along their
+length and the highest and lowest taken again, so the profile follows a
+keel that changes from one line to another between stations.
+"""
+
+__author__ = "Robert Marchese"
+__version__ = "0.1.0"
+__license__ = "MIT"
+
+import argparse
+import csv
+import json
+import sys
+
+try:
+    from . import offsets_reader
+    from . import offsets_resample
+except ImportError:
+    import offsets_reader
+    import offsets_resample
+
+
+KINDS = ('sheer', 'stem', 'keel', 'sternpost')
+
+
+def _on_center(p):
+    return (0.0, p[1], p[2])
+
+
+def _end(section, sign):
+    '''An end section on the center line, from the top down'''
+    points = [_on_center(p) for p in section]
+    if sign * points[0][1] < sign * points[-1][1]:
+        points.reverse()
+    return points
+
+
+def _beam(section):
+    return max(p[0] for p in section)
+
+
+def _between(stations, count):
+    '''count stations evenly spaced in each gap between stations'''
+    out = []
+    for z0, z1 in zip(stations, stations[1:]):
+        out.extend(z0 + (z1 - z0) * k / (count + 1.0)
+                   for k in range(1, count + 1))
+    return out
+
+
+def _refine(points, lines, sign, highest, count, method):
+    '''points, (0, y, z) along the length, with count more points in each
+    gap from the envelope of the lines there'''
+    stations = sorted(set(p[2] for p in points))
+    targets = _between(stations, count)
+    heights = [offsets_resample.resample_line(line, targets, method)[1]
+               for line in lines]
+    if not highest:
+        sign = -sign
+    added = []
+    for k, z in enumerate(targets):
+        known = [h[k] for h in heights if h[k] is not None]
+        if known:
+            added.append((0.0, max(known, key=lambda y: sign * y), z))
+    return sorted(points + added, key=lambda p: p[2])
+
+
+def profile(offset_data, refine=0, method='spline'):
+    '''The center line profile of a hull, a dict of the sheer, stem, keel
+    and sternpost, each a list of (0, height, station) points. The sheer
+    and keel run along the length from the lowest station, the stem and
+    sternpost from the sheer down. refine adds that many points between
+    stations, interpolated along the lines with method ('linear', 'cubic'
+    or 'spline')'''
+    sections = [s for s in offset_data['sections'] if s]
+    if len(sections) < 2:
+        raise ValueError('need at least two sections')
+    up = offsets_reader.heights_up(sections)
+    sign = 1.0 if up else -1.0
+
+    sheer = []
+    keel = []
+    for s in sections:
+        low, high = offsets_reader.section_envelope(s, up)
+        keel.append(_on_center(low))
+        sheer.append(_on_center(high))
+    sheer.sort(key=lambda p: p[2])
+    keel.sort(key=lambda p: p[2])
+
+    if refine > 0:
+        lines = [points for name, points in offset_data['lines'].items()
+                 if not name.startswith('_')]
+        sheer = _refine(sheer, lines, sign, True, refine, method)
+        keel = _refine(keel, lines, sign, False, refine, method)
+
+    first, last = sections[0], sections[-1]
+    if _beam(last) < _beam(first):
+        first, last = last, first
+
+    return {'sheer': sheer, 'stem': _end(first, sign), 'keel': keel,
+            'sternpost': _end(last, sign)}
+
+
+def _round(value, digits):
+    # adding 0.0 turns -0.0 into 0.0
+    return round(value, digits) + 0.0
+
+
+def profile_rows(outline, digits=4):
+    '''The profile as rows of the part, the point number, the height and
+    the station'''
+    rows = [['part', 'point', 'height', 'station']]
+    for kind in KINDS:
+        for k, p in enumerate(outline[kind]):
+            rows.append([kind, k, _round(p[1], digits), _round(p[2], digits)])
+    return rows
+
+
+def write_csv(opf, outline, digits=4):
+    csv.writer(opf).writerows(profile_rows(outline, digits))
+
+
+def write_json(opf, outline, digits=4):
+    out = dict((kind, [[_round(p[1], digits), _round(p[2], digits)]
+                       for p in outline[kind]]) for kind in KINDS)
+    json.dump(out, opf)
+    opf.write("\n")
+
+
+if __name__ == "__main__":
+    ''' This is executed when run from the command line '''
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("filename", help="input .csv file (offset table)")
+
+    parser.add_argument("-o", "--output", action="store", default='-',
+                        help="output file (default stdout)")
+
+    parser.add_argument("-f", "--format", choices=['csv', 'json'],
+                        default='csv', help="profile format (default csv)")
+
+    parser.add_argument("-r", "--refine", action="store", type=int,
+                        default=0, help="points added between stations")
+
+    parser.add_argument("-m", "--method", choices=['linear', 'cubic',
+                                                   'spline'],
+                        default='spline', help="interpolation along the "
+                                               "lines (default spline)")
+
+    parser.add_argument("-d", "--digits", action="store", type=int,
+                        default=4, help="decimal places (default 4)")
+
+    parser.add_argument(
+        "--version",
+        action="version",
+        version="%(prog)s (version {version})".format(version=__version__))
+
+    args = parser.parse_args()
+    offset_data = offsets_reader.rake_ends(
+        offsets_reader.offset_reader(args.filename))
+    outline = profile(offset_data, args.refine, args.method)
+    write = write_json if args.format == 'json' else write_csv
+    if args.output == '-':
+        write(sys.stdout, outline, args.digits)
+    else:
+        with open(args.output, 'w', newline='') as opf:
+            write(opf, outline, args.digits)
@@ -11,27 +11,42 @@ __license__ = "MIT"
 
 import argparse
 import csv
-import json
 import logging
 from math import radians, sin, cos
 import os
 
-# Setup Logging
-logger = logging.getLogger('offsets reader')
-logger.setLevel(logging.DEBUG)
-fh = logging.FileHandler('offsets_reader.log')
-fh.setLevel(logging.DEBUG)
-ch = logging.StreamHandler()
+try:
+    from . import offsets_timing as timing
+    from . import offsets_writer
+except ImportError:
+    import offsets_timing as timing
+    import offsets_writer
 
-# change to ERROR or WARNING after deplot
-ch.setLevel(logging.DEBUG)
+# Setup Logging, the handlers are only added by setup_logging() so
+# importing the module does not create a log file
+logger = logging.getLogger('offsets reader')
 log_fmt = logging.Formatter(
     '%(asctime)s - %(name)s - %(levelname)s - %(lineno)d - %(message)s')
 log_short_fmt = logging.Formatter('%(levelname)s - %(lineno)d - %(message)s')
-fh.setFormatter(log_fmt)
-ch.setFormatter(log_short_fmt)
-logger.addHandler(fh)
-logger.addHandler(ch)
+
+
+def setup_logging(filename='offsets_reader.log', level=logging.DEBUG):
+    '''Log to a file and the console the way the script always has.
+    Returns the console handler'''
+    logger.setLevel(logging.DEBUG)
+    if filename:
+        fh = logging.FileHandler(filename)
+        fh.setLevel(logging.DEBUG)
+        fh.setFormatter(log_fmt)
+        logger.addHandler(fh)
+
+    # change to ERROR or WARNING after deplot
+    ch = logging.StreamHandler()
+    ch.setLevel(level)
+    ch.setFormatter(log_short_fmt)
+    logger.addHandler(ch)
+
+    return ch
 
 
 def fie_to_di(d):
@@ -49,6 +64,12 @@ def fie_to_di(d):
         return d
 
 
+def di_to_fie(d):
+    '''Converts decimal inches to feet-inches-eigths, rounded to the
+    nearest eighth, as offsets_writer.fie() writes them'''
+    return offsets_writer.fie(d)
+
+
 def get_all_axis(table, axis):
     '''return all rows with a specific axis (width, height, length)
     in a dictionary and set 'name' as the key '''
@@ -77,17 +98,25 @@ def generate_sections(offset_table, line_order):
     (x, y, z) = (width, height length). Returns each as a list
     contained in a dictionary'''
 
-    logger.debug('Input to generate offsets')
-    for line in offset_table:
-        logger.debug(line)
+    with timing.stage('generate_sections'):
+        return _generate_sections(offset_table, line_order)
+
+
+def _generate_sections(offset_table, line_order):
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+        logger.debug('Input to generate offsets')
+        for line in offset_table:
+            logger.debug(line)
 
     sections = []
     for line in line_order:
         if line in offset_table:
             sections.append(offset_table[line])
 
-    logger.debug('Un-transformed sections')
-    logger.debug(sections)
+    if debug:
+        logger.debug('Un-transformed sections')
+        logger.debug(sections)
 
     # Transpose the list of section
     sections = list(map(list, zip(*sections)))
@@ -96,27 +125,67 @@ def generate_sections(offset_table, line_order):
     upper = []
     lower = []
     for s in sections:
-        cs = remove_invalid(s)
+        cs, top, bottom = clean_section(s)
+        timing.count('section_points', len(cs))
         clean_sections.append(cs)
-        css = sorted(cs, key=lambda x: x[1])
-        upper.append(css[0])
-        lower.append(css[-1])
-
-    # Project the top and bottom of profile as their own lines
-    upper = [(0.0, p[1], p[2]) for p in upper]
-    lower = [(0.0, p[1], p[2]) for p in lower]
+        upper.append(top)
+        lower.append(bottom)
 
-    logger.debug('Transformed clean_section')
-    for s in clean_sections:
-        logger.debug(s)
+    if debug:
+        logger.debug('Transformed clean_section')
+        for s in clean_sections:
+            logger.debug(s)
 
-    logger.debug('upper and lower lines')
-    logger.debug(upper)
-    logger.debug(lower)
+        logger.debug('upper and lower lines')
+        logger.debug(upper)
+        logger.debug(lower)
     
     return clean_sections, upper, lower
 
 
+def clean_section(points):
+    '''Remove the missing points from one station's cross section and
+    project its top and bottom onto the center line'''
+    cs = remove_invalid(points)
+    low, high = section_envelope(cs)
+
+    return cs, (0.0, low[1], low[2]), (0.0, high[1], high[2])
+
+
+def section_envelope(points, up=True):
+    '''The lowest and highest points of a section, found in one pass.
+    up is False for heights measured down from a datum, see
+    heights_up(). Of points at the same height the lowest is the first
+    and the highest the last, as sorting the section would give'''
+    sign = 1.0 if up else -1.0
+    low = high = points[0]
+    for p in points:
+        if sign * p[1] < sign * low[1]:
+            low = p
+        if sign * p[1] >= sign * high[1]:
+            high = p
+
+    return low, high
+
+
+def heights_up(sections):
+    '''False when the heights of the table are measured down from a
+    datum, as in the Cartopper table, so the sheer, the first point of
+    each section, is the lowest'''
+    return sum(s[0][1] - min(p[1] for p in s) for s in sections if s) >= \
+        sum(max(p[1] for p in s) - s[0][1] for s in sections if s)
+
+
+def section_at(offset_table, line_order, index):
+    '''Regenerate the cross section at a single station, returns the
+    same (section, upper, lower) values generate_sections() makes for
+    that station'''
+    points = [offset_table[line][index]
+              for line in line_order if line in offset_table]
+
+    return clean_section(points)
+
+
 def try_float(st):
     try:
         x = float(st)
@@ -133,15 +202,47 @@ def lineOrder(table):
     return order
 
 
+def station_labels(table):
+    '''The names of the stations in the header row of a table, raw or
+    cleaned up by munge_table(). The header is the first row that is not
+    a comment, unless it is already one of the length, height, width or
+    angle rows. Returns [] when the table has no header'''
+    for row in table:
+        if not row or str(row[0]).startswith('#'):
+            continue
+        axis = str(row[0]).lower()
+        if any(name in axis for name in ('length', 'height', 'width',
+                                         'angle')):
+            return []
+        return [cell if isinstance(cell, str) else '{0:g}'.format(cell)
+                for cell in row[2:]]
+    return []
+
+
+def read_rows(filename):
+    '''The rows of the csv file as lists of strings'''
+    with timing.stage('read_csv'):
+        with open(filename, 'r') as csvfile:
+            return list(csv.reader(csvfile, delimiter=',', quotechar='"'))
+
+
 def parse_csv_offsets(filename):
     ''' parse the csv expected offset table fields '''
 
-    with open(filename, 'r') as csvfile:
-        raw_table = list(csv.reader(csvfile, delimiter=',', quotechar='"'))
+    raw_table = read_rows(filename)
+    with timing.stage('munge'):
+        return combine_offsets(munge_table(raw_table))
+
 
-    logger.debug('original table:')
-    for i, row in enumerate(raw_table):
-        logger.debug('row {0}: {1}'.format(i, row))
+def munge_table(raw_table):
+    '''Drop the comments from the rows read from the csv file, fill in
+    the 'dittos' and convert the cells to decimal inches. Returns the
+    cleaned up table'''
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+        logger.debug('original table:')
+        for i, row in enumerate(raw_table):
+            logger.debug('row {0}: {1}'.format(i, row))
 
     # Remove comments lines
     offset_table = [r for r in raw_table if not r[0].startswith('#')]
@@ -164,10 +265,20 @@ def parse_csv_offsets(filename):
         offset_table[i][0] = current
 
     # convert feet-inches-eights to decimal inches
-    logger.debug('modified table:')
+    if debug:
+        logger.debug('modified table:')
     for i, row in enumerate(offset_table):
         offset_table[i] = [fie_to_di(x) for x in row]
-        logger.debug('row {0}: {1}'.format(i, offset_table[i]))
+        if debug:
+            logger.debug('row {0}: {1}'.format(i, offset_table[i]))
+
+    return offset_table
+
+
+def combine_offsets(offset_table):
+    '''Recombine the widths, heights and stations of a cleaned up table
+    into (x, y, z) points for each line. Returns the lines, the line
+    names in the order they appeared and the optional section angles'''
 
     # create a list of lines names preserving the order they appeared
     line_order = lineOrder(offset_table)
@@ -187,12 +298,19 @@ def parse_csv_offsets(filename):
     # TODO: clean this up, need to skip the '' key
     ot_angles = ot_angles.get('', None)
 
+    # keep the lines in the order they run down the sections, the order
+    # of the width rows may differ from the order of the height rows
+    names = [name for name in line_order if name in ot_widths]
+    names += [name for name in ot_widths if name not in names]
+
     ot_combined = {}
-    for line_name in ot_widths:
+    for line_name in names:
         x = ot_widths[line_name]
         y = ot_heights[line_name]
         z = [float(zs) for zs in ot_lengths['station']]
         line_points = remove_invalid(list(zip(x, y, z)), [])
+        if timing.enabled():
+            timing.count('points', sum(1 for p in line_points if p))
         ot_combined[line_name] = line_points
 
     return ot_combined, line_order, ot_angles
@@ -219,6 +337,11 @@ def rotate_point(cy, cz, angle, p):
 
 
 def rake_angle(offsets, st_index, angle):
+    with timing.stage('rake_angle'):
+        return _rake_angle(offsets, st_index, angle)
+
+
+def _rake_angle(offsets, st_index, angle):
     xc_original = offsets['sections'][st_index]
 
     # Angle is givent in degrees from the baseline
@@ -237,26 +360,64 @@ def rake_angle(offsets, st_index, angle):
     offsets['sections'][st_index] = xc_new
 
     # Apply rotation in xz plane around y = y0 to lines
+    debug = logger.isEnabledFor(logging.DEBUG)
     for name, coords in offsets['lines'].items():
         if coords[st_index]:
-            logger.debug("modifying {0} at station {1}".format(name, st_index))
+            if debug:
+                logger.debug("modifying {0} at station {1}".format(
+                    name, st_index))
             pt = list(coords[st_index])
             pt = rotate_point(y0, z0, angle, pt)
             coords[st_index] = pt
-        else:
+        elif debug:
             logger.debug("ignoring {0} at station {1}".format(name, st_index))
 
     return offsets 
 
 
+def rake_ends(offset_data, bow_angle=90, transom_angle=90):
+    '''Rake the first and last sections using the angles from the table
+    if it had them, otherwise the given bow and transom angles'''
+    bindex = 0
+    tindex = len(offset_data['sections']) - 1
+    if 'angle' in offset_data:
+        logger.debug("apply section angles from tables")
+        logger.debug(offset_data['angle'])
+        ba = offset_data['angle'][bindex]
+        ta = offset_data['angle'][tindex]
+    else:
+        logger.debug("apply section angles from command line")
+        ba = float(bow_angle)
+        ta = float(transom_angle)
+
+    # Apply optional rake angles at bow and transom
+    offset_data = rake_angle(offset_data, bindex, 90 - ba)
+    offset_data = rake_angle(offset_data, tindex, 90 - ta)
+
+    return offset_data
+
+
 def offset_reader(filename):
     ''' read a table of offsets from a csv file and produce a
     dictionary containing the lines and cross sections '''
 
-    offset_data = {}
-
     # Read the lines from an offset table
-    lines, line_order, section_angles = parse_csv_offsets(filename)
+    return offsets_from_lines(*parse_csv_offsets(filename))
+
+
+def offsets_from_rows(raw_table):
+    '''The same dictionary offset_reader() produces from the rows of a
+    table that was already read, eg. by csv.reader()'''
+    with timing.stage('munge'):
+        lines = combine_offsets(munge_table(raw_table))
+
+    return offsets_from_lines(*lines)
+
+
+def offsets_from_lines(lines, line_order, section_angles=None):
+    '''Add the cross sections to the lines returned by
+    combine_offsets()'''
+    offset_data = {}
     offset_data['lines'] = lines
 
     # Add a set of cross sections
@@ -270,6 +431,25 @@ def offset_reader(filename):
     return offset_data
 
 
+def main(args):
+    offset_data = offset_reader(args.filename)
+
+    # Use angles from table if they were given
+    # TODO: apply angle at each station
+    # TODO: use command line as override
+    offset_data = rake_ends(offset_data, args.bow_angle, args.transom_angle)
+
+    out_filename, _ = os.path.splitext(args.filename)
+    out_filename = out_filename + '.json'
+    with timing.stage('serialize'):
+        with open(out_filename, 'w') as opf:
+            offsets_writer.write_json(opf, offset_data, args.precision,
+                                      args.backend)
+            timing.count('bytes_written', opf.tell())
+    logger.debug('wrote {0} lines and {1} sections to {2}'.format(
+        len(offset_data['lines']), len(offset_data['sections']), out_filename))
+
+
 if __name__ == "__main__":
     ''' This is executed when run from the command line '''
     parser = argparse.ArgumentParser()
@@ -286,6 +466,32 @@ if __name__ == "__main__":
                         dest="transom_angle", default=90,
                         help="Angle of the transom measured from the baseline")
 
+    parser.add_argument("-w", "--watch", action="store_true",
+                        dest="watch", default=False,
+                        help="keep running and regenerate the .json, .scad "
+                             "and .stl files whenever the table changes")
+
+    # JSON output
+    parser.add_argument("-p", "--precision", action="store",
+                        dest="precision", default=None,
+                        type=offsets_writer.parse_precision,
+                        help="round the coordinates to this resolution "
+                             "(eg. 1/64 or 0.01)")
+
+    parser.add_argument("--backend", action="store", dest="backend",
+                        default='json', choices=offsets_writer.BACKENDS,
+                        help="JSON encoder, orjson is faster when installed "
+                             "(default json)")
+
+    # Optional timing report and profiler output
+    parser.add_argument("--timing", action="store", dest="timing",
+                        help="write a JSON timing report to this file "
+                             "('-' for stdout)")
+
+    parser.add_argument("--profile", action="store", dest="profile",
+                        help="write cProfile stats to this file "
+                             "(implies --timing)")
+
     # Specify output of "--version"
     parser.add_argument(
         "--version",
@@ -293,31 +499,27 @@ if __name__ == "__main__":
         version="%(prog)s (version {version})".format(version=__version__))
 
     args = parser.parse_args()
+    ch = setup_logging()
     logger.debug("arguments" + str(args))
 
-    offset_data = offset_reader(args.filename)
-
-    # Use angles from table if they were given
-    # TODO: apply angle at each station
-    # TODO: use command line as override
-    bindex = 0
-    tindex = len(offset_data['sections']) - 1
-    if 'angle' in offset_data:
-        logger.debug("apply section angles from tables")
-        logger.debug(offset_data['angle'])
-        ba = offset_data['angle'][bindex]
-        ta = offset_data['angle'][tindex]
+    if args.profile and not args.timing:
+        args.timing = args.profile + '.json'
+    timing.enable(bool(args.timing))
+
+    if args.watch:
+        import offsets_watch
+        offsets_watch.logger.setLevel(logging.INFO)
+        offsets_watch.logger.addHandler(ch)
+        try:
+            offsets_watch.watch([args.filename], bow_angle=args.bow_angle,
+                                transom_angle=args.transom_angle,
+                                precision=args.precision)
+        except KeyboardInterrupt:
+            pass
+    elif args.profile:
+        timing.run_profiled(main, args.profile, args)
     else:
-        logger.debug("apply section angles from command line")
-        ba = float(args.bow_angle)
-        ta = float(args.transom_angle)
+        main(args)
 
-    # Apply optional rake angles at bow and transom
-    offset_data = rake_angle(offset_data, bindex, 90 - ba)
-    offset_data = rake_angle(offset_data, tindex, 90 - ta)
-
-    out_filename, _ = os.path.splitext(args.filename)
-    out_filename = out_filename + '.json'
-    logger.debug('writing json data:\n' + json.dumps(offset_data))
-    with open(out_filename, 'w') as opf:
-        json.dump(offset_data, opf)
+    if args.timing:
+        timing.write_report(args.timing)
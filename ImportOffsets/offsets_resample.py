@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+
+"""
+Resamples an offsets table at a new set of stations. Each line is
+interpolated along its length, linearly or with a monotone cubic that
+follows the offsets without overshooting them, and the new table is
+written in the same csv layout parse_csv_offsets() reads.
+
+fit_points() goes the other way, picking the fewest points of a line
+that a smooth spline through them keeps within a tolerance of the rest,
+so long resampled or scanned lines can be drawn with a handful of fit
+points.
+"""
+
+__author__ = "Robert Marchese"
+__version__ = "0.1.0"
+__license__ = "MIT"
+
+import argparse
+import bisect
+import math
+
+try:
+    from . import offsets_reader
+    from . import offsets_writer
+except ImportError:
+    import offsets_reader
+    import offsets_writer
+
+
+def even_stations(z0, z1, count=None, spacing=None):
+    '''count stations (or stations spacing apart) from z0 to z1, both
+    ends included'''
+    if spacing:
+        count = max(1, int(round(abs(z1 - z0) / spacing))) + 1
+    if count < 2:
+        return [z0]
+    step = (z1 - z0) / (count - 1.0)
+    return [z0 + i * step for i in range(count - 1)] + [z1]
+
+
+def pchip_slopes(zs, vs):
+    '''Slopes at each knot for a monotone piecewise cubic (Fritsch and
+    Carlson), flat where the data turns so the curve never overshoots'''
+    n = len(zs)
+    h = [zs[i + 1] - zs[i] for i in range(n - 1)]
+    d = [(vs[i + 1] - vs[i]) / h[i] for i in range(n - 1)]
+    if n == 2:
+        return [d[0], d[0]]
+
+    m = [0.0] * n
+    for i in range(1, n - 1):
+        if d[i - 1] * d[i] > 0:
+            w1 = 2 * h[i] + h[i - 1]
+            w2 = h[i] + 2 * h[i - 1]
+            m[i] = (w1 + w2) / (w1 / d[i - 1] + w2 / d[i])
+
+    # one sided three point estimates at the ends
+    for i, j, k in ((0, 0, 1), (n - 1, n - 2, n - 3)):
+        hj, hk = h[j], h[k]
+        s = ((2 * hj + hk) * d[j] - hj * d[k]) / (hj + hk)
+        if s * d[j] <= 0:
+            s = 0.0
+        elif d[j] * d[k] <= 0 and abs(s) > abs(3 * d[j]):
+            s = 3 * d[j]
+        m[i] = s
+
+    return m
+
+
+def spline_slopes(zs, vs):
+    '''Slopes at each knot for a natural cubic spline, the smooth curve
+    a fitted spline draws through the points'''
+    n = len(zs)
+    h = [zs[i + 1] - zs[i] for i in range(n - 1)]
+    d = [(vs[i + 1] - vs[i]) / h[i] for i in range(n - 1)]
+    if n == 2:
+        return [d[0], d[0]]
+
+    # the tridiagonal system for continuous curvature, zero at the ends
+    lower = [0.0] + [h[i] for i in range(1, n - 1)] + [1.0]
+    diag = [2.0] + [2 * (h[i - 1] + h[i]) for i in range(1, n - 1)] + [2.0]
+    upper = [1.0] + [h[i - 1] for i in range(1, n - 1)] + [0.0]
+    rhs = [3 * d[0]] + [3 * (h[i] * d[i - 1] + h[i - 1] * d[i])
+                        for i in range(1, n - 1)] + [3 * d[-1]]
+    for i in range(1, n):
+        w = lower[i] / diag[i - 1]
+        diag[i] -= w * upper[i - 1]
+        rhs[i] -= w * rhs[i - 1]
+    m = [0.0] * n
+    m[-1] = rhs[-1] / diag[-1]
+    for i in range(n - 2, -1, -1):
+        m[i] = (rhs[i] - upper[i] * m[i + 1]) / diag[i]
+
+    return m
+
+
+def interpolate(zs, vs, targets, method='linear'):
+    '''Values at each target from the knots (zs, vs), zs ascending.
+    None outside the knots. method is 'linear', 'cubic' (monotone) or
+    'spline' (natural cubic spline)'''
+    n = len(zs)
+    slopes = None
+    if n > 1 and method in ('cubic', 'spline'):
+        slopes = (pchip_slopes if method == 'cubic' else spline_slopes)(zs,
+                                                                        vs)
+    out = []
+    for z in targets:
+        if n == 0 or z < zs[0] or z > zs[-1]:
+            out.append(None)
+            continue
+        i = min(max(bisect.bisect_right(zs, z) - 1, 0), n - 2)
+        if n == 1:
+            out.append(vs[0])
+            continue
+        h = zs[i + 1] - zs[i]
+        t = (z - zs[i]) / h
+        if slopes is None:
+            out.append(vs[i] + t * (vs[i + 1] - vs[i]))
+        else:
+            t2 = t * t
+            t3 = t2 * t
+            out.append((2 * t3 - 3 * t2 + 1) * vs[i] +
+                       (t3 - 2 * t2 + t) * h * slopes[i] +
+                       (-2 * t3 + 3 * t2) * vs[i + 1] +
+                       (t3 - t2) * h * slopes[i + 1])
+    return out
+
+
+def fit_points(points, tolerance):
+    '''The fewest of points, a line of 2D or 3D points with the ends
+    included, that a natural cubic spline through them, parameterized
+    by the length along the line, keeps within tolerance of every
+    point. Starting from the ends, the worst point of each span that is
+    out of tolerance is added until none are'''
+    points = [p for p in points if p]
+    points = [p for k, p in enumerate(points)
+              if k == 0 or tuple(p) != tuple(points[k - 1])]
+    n = len(points)
+    if n < 3 or tolerance <= 0:
+        return points
+
+    ts = [0.0]
+    for p, q in zip(points, points[1:]):
+        ts.append(ts[-1] + math.dist(p, q))
+    columns = list(zip(*points))
+    tol2 = tolerance * tolerance
+
+    keep = [0, n - 1]
+    while True:
+        knots = [ts[i] for i in keep]
+        fitted = [interpolate(knots, [column[i] for i in keep], ts, 'spline')
+                  for column in columns]
+        errors = [math.fsum((f[i] - c[i]) ** 2
+                            for f, c in zip(fitted, columns))
+                  for i in range(n)]
+        added = []
+        for a, b in zip(keep, keep[1:]):
+            if b - a > 1:
+                worst = max(range(a + 1, b), key=errors.__getitem__)
+                if errors[worst] > tol2:
+                    added.append(worst)
+        if not added:
+            return [points[i] for i in keep]
+        keep = sorted(keep + added)
+
+
+def resample_line(points, stations, method='linear'):
+    '''Widths and heights of one line ((x, y, z) points, [] where
+    missing) at the new stations. None where the line does not reach'''
+    known = sorted((p[2], p[0], p[1]) for p in points if p)
+    zs = [k[0] for k in known]
+    widths = interpolate(zs, [k[1] for k in known], stations, method)
+    heights = interpolate(zs, [k[2] for k in known], stations, method)
+
+    return widths, heights
+
+
+def resample(lines, line_order, stations, method='linear', angles=None,
+             old_stations=None):
+    '''Resample the lines from combine_offsets() at stations. Returns
+    the heights and widths for offsets_writer.offsets_rows() and the
+    section angles
+    interpolated between the old stations, if there were any'''
+    widths = []
+    heights = []
+    for name in line_order:
+        if name not in lines:
+            continue
+        w, h = resample_line(lines[name], stations, method)
+        widths.append((name, w))
+        heights.append((name, h))
+
+    new_angles = None
+    if angles and old_stations:
+        pairs = sorted(zip(old_stations, angles))
+        new_angles = interpolate([p[0] for p in pairs], [p[1] for p in pairs],
+                                 stations)
+        new_angles = [90.0 if a is None else a for a in new_angles]
+
+    return {'heights': heights, 'widths': widths}, new_angles
+
+
+def resample_file(filename, out_filename, count=None, spacing=None,
+                  method='linear', units='decimal', digits=4):
+    '''Resample the table in filename and write it to out_filename.
+    Returns the new stations'''
+    raw_table = offsets_reader.read_rows(filename)
+    table = offsets_reader.munge_table(raw_table)
+    lines, line_order, angles = offsets_reader.combine_offsets(table)
+    old = [float(z) for z in
+           offsets_reader.get_all_axis(table, 'length')['station']]
+
+    stations = even_stations(old[0], old[-1], count or len(old), spacing)
+    table, new_angles = resample(lines, line_order, stations, method,
+                                 angles, old)
+    rows = offsets_writer.offsets_rows(stations, table['heights'],
+                                       table['widths'], new_angles, units,
+                                       digits)
+    with open(out_filename, 'w', newline='') as csvfile:
+        offsets_writer.write_rows(csvfile, rows)
+
+    return stations
+
+
+if __name__ == "__main__":
+    ''' This is executed when run from the command line '''
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("filename", help="input .csv file (offset table)")
+    parser.add_argument("output", help="output .csv file")
+
+    parser.add_argument("-n", "--stations", type=int, dest="count",
+                        help="number of stations (default the same)")
+
+    parser.add_argument("-s", "--spacing", type=float, dest="spacing",
+                        help="distance between stations instead of a count")
+
+    parser.add_argument("-m", "--method", choices=['linear', 'cubic'],
+                        default='linear', help="interpolation along lines")
+
+    parser.add_argument("-u", "--units", choices=['decimal', 'fie'],
+                        default='decimal',
+                        help="write decimal inches or feet-inches-eighths")
+
+    parser.add_argument(
+        "--version",
+        action="version",
+        version="%(prog)s (version {version})".format(version=__version__))
+
+    args = parser.parse_args()
+    resample_file(args.filename, args.output, args.count, args.spacing,
+                  args.method, args.units)
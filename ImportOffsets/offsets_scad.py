@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+"""
+Writes an OpenSCAD model of the hull in the same layout as
+cartopper.scad: one variable per closed section and per line, and a
+half_hull() module that stitches neighbouring sections into closed
+polyhedra. The faces for each pair come from offsets_mesh, so sections
+with different numbers of points can be stitched.
+"""
+
+__author__ = "Robert Marchese"
+__version__ = "0.1.0"
+__license__ = "MIT"
+
+import json
+import re
+
+try:
+    from . import offsets_mesh
+except ImportError:
+    import offsets_mesh
+
+
+def scad_name(name):
+    '''Make a line name usable as an OpenSCAD variable'''
+    name = re.sub(r'\W', '_', str(name))
+    if not name or name[0].isdigit():
+        name = 'line_' + name
+    return name
+
+
+def section_text(index, ring):
+    return 'section{0}={1};\n'.format(index, json.dumps(ring))
+
+
+def line_text(name, points):
+    points = [p for p in points if p]
+    return '{0}={1};\n'.format(scad_name(name), json.dumps(points))
+
+
+def stitch_text(index, ring0, ring1):
+    '''One closed polyhedron between section index and index + 1.
+    OpenSCAD wants faces clockwise seen from outside, the reverse of
+    the STL winding'''
+    n = len(ring0)
+    faces = [[a, c, b] for a, b, c in offsets_mesh.stitch_faces(ring0, ring1)]
+    faces.append(end_face(ring0, 0, ring1))
+    faces.append(end_face(ring1, n, ring0))
+
+    return '    stitch (section{0}, section{1}, {2});\n'.format(
+        index, index + 1, json.dumps(faces))
+
+
+def end_face(ring, offset, other):
+    '''The end of a strip at ring as one polygon, clockwise seen from
+    outside (away from the other end of the strip)'''
+    forward = offsets_mesh.mean_z(ring) <= offsets_mesh.mean_z(other)
+    indices = list(range(offset, offset + len(ring)))
+    if (offsets_mesh.ring_area(ring) > 0) != forward:
+        indices.reverse()
+
+    return indices
+
+
+def scad_text(section_texts, line_texts, stitch_texts, source='',
+              half_hull=True, scale=1.0):
+    '''Assemble the pieces made by section_text(), line_text() and
+    stitch_text() into the OpenSCAD file'''
+    out = ['\n\n// Generated by offsets_scad.py']
+    out.append(' from {0}\n'.format(source) if source else '\n')
+    out.extend(section_texts)
+    out.append('\n')
+    out.extend(line_texts)
+    out.append('\n')
+    out.append('scale({0}) {{\n'.format(scale))
+    out.append('    half_hull();\n')
+    if not half_hull:
+        out.append('    mirror() half_hull();\n')
+    out.append('}\n\n')
+    out.append('module half_hull () {\n')
+    out.extend(stitch_texts)
+    out.append('}\n\n')
+    out.append('// Closed polyhedron between two sections\n')
+    out.append('module stitch(p0, p1, faces) {\n')
+    out.append('    polyhedron(concat(p0, p1), faces);\n')
+    out.append('}\n')
+
+    return ''.join(out)
+
+
+def write_scad(opf, offset_data, source='', half_hull=True, scale=1.0):
+    '''Write offset_data as an OpenSCAD model to an open text file'''
+    rings = [offsets_mesh.closed_section(s) for s in offset_data['sections']]
+    sections = [section_text(i, r) for i, r in enumerate(rings)]
+    lines = [line_text(name, points)
+             for name, points in offset_data['lines'].items()]
+    stitches = [stitch_text(i, r0, r1)
+                for i, (r0, r1) in enumerate(zip(rings, rings[1:]))]
+    opf.write(scad_text(sections, lines, stitches, source, half_hull, scale))
+
+
+def export_scad(offset_data, filename, half_hull=False):
+    with open(filename, 'w') as opf:
+        write_scad(opf, offset_data, half_hull=half_hull)
@@ -0,0 +1,429 @@
+# -*- coding: utf-8 -*-
+
+"""
+Build an offsets table from a 3D scan of a hull, an XYZ or PLY point
+cloud. The points are read a block at a time and binned into a thin
+slab at each station. Within a slab only the outermost point in each
+band of heights and the lowest point in each band of widths are kept,
+so memory depends on the size of the sections, not the number of
+points, and clouds of tens of millions of points can be read on an
+ordinary workstation.
+
+The half section at each station is the envelope of the kept points,
+and the table is read off it: the half breadth at each waterline, the
+height at each buttock, and the sheer and keel.
+
+    python offsets_scan.py hull.ply hull.csv --count 13 \\
+        --waterlines 4,8,12 --buttocks 6,12 --resolution 0.25
+
+The scan should be in table units with the length along x, the width
+along y from the center plane and the height along z; use --axes when
+the scanner's axes are different.
+"""
+
+__author__ = "Robert Marchese"
+__version__ = "0.1.0"
+__license__ = "MIT"
+
+import argparse
+import bisect
+import math
+import os
+import struct
+
+try:
+    from . import offsets_resample
+    from . import offsets_writer
+except ImportError:
+    import offsets_resample
+    import offsets_writer
+
+
+# points per block
+BLOCK = 65536
+
+PLY_TYPES = {'char': 'b', 'int8': 'b', 'uchar': 'B', 'uint8': 'B',
+             'short': 'h', 'int16': 'h', 'ushort': 'H', 'uint16': 'H',
+             'int': 'i', 'int32': 'i', 'uint': 'I', 'uint32': 'I',
+             'float': 'f', 'float32': 'f', 'double': 'd', 'float64': 'd'}
+
+
+def read_xyz(filename, block=BLOCK):
+    '''Yield lists of (x, y, z) from a text file of one point per line.
+    Extra columns (colour, normals) are ignored, as are lines that are
+    not numbers'''
+    with open(filename) as f:
+        points = []
+        for line in f:
+            cells = line.replace(',', ' ').split()
+            try:
+                points.append((float(cells[0]), float(cells[1]),
+                               float(cells[2])))
+            except (ValueError, IndexError):
+                continue
+            if len(points) == block:
+                yield points
+                points = []
+        if points:
+            yield points
+
+
+def ply_header(f):
+    '''Read the header of a PLY file open in binary mode. Returns the
+    format, the vertex count and the vertex properties as (name, type)'''
+    if f.readline().strip() != b'ply':
+        raise ValueError('not a PLY file')
+    fmt = None
+    count = None
+    props = []
+    element = None
+    for raw in f:
+        words = raw.decode('ascii', 'replace').split()
+        if not words or words[0] in ('comment', 'obj_info'):
+            continue
+        if words[0] == 'end_header':
+            break
+        if words[0] == 'format':
+            fmt = words[1]
+        elif words[0] == 'element':
+            if element == 'vertex':
+                element = 'done'
+            elif element is None:
+                element = words[1]
+                if element != 'vertex':
+                    raise ValueError('PLY vertices must come first')
+                count = int(words[2])
+        elif words[0] == 'property' and element == 'vertex':
+            if words[1] == 'list':
+                raise ValueError('PLY vertex lists are not supported')
+            props.append((words[2], words[1]))
+
+    names = [name for name, _ in props]
+    if count is None or not all(c in names for c in 'xyz'):
+        raise ValueError('PLY file has no x, y, z vertices')
+    return fmt, count, props
+
+
+def read_ply(filename, block=BLOCK):
+    '''Yield lists of (x, y, z) from an ASCII or binary PLY file'''
+    with open(filename, 'rb') as f:
+        fmt, count, props = ply_header(f)
+        names = [name for name, _ in props]
+        ix, iy, iz = [names.index(c) for c in 'xyz']
+
+        if fmt == 'ascii':
+            points = []
+            for _ in range(count):
+                cells = f.readline().split()
+                points.append((float(cells[ix]), float(cells[iy]),
+                               float(cells[iz])))
+                if len(points) == block:
+                    yield points
+                    points = []
+            if points:
+                yield points
+            return
+
+        order = {'binary_little_endian': '<', 'binary_big_endian': '>'}
+        if fmt not in order:
+            raise ValueError('unknown PLY format: {0}'.format(fmt))
+        record = struct.Struct(order[fmt] + ''.join(PLY_TYPES[t]
+                                                    for _, t in props))
+        left = count
+        while left:
+            n = min(block, left)
+            data = f.read(n * record.size)
+            if len(data) < n * record.size:
+                raise ValueError('PLY file is shorter than its header says')
+            yield [(v[ix], v[iy], v[iz]) for v in record.iter_unpack(data)]
+            left -= n
+
+
+def read_points(filename, block=BLOCK):
+    '''Yield blocks of points from an .xyz (or .txt, .pts) or .ply file'''
+    if os.path.splitext(filename)[1].lower() == '.ply':
+        return read_ply(filename, block)
+    return read_xyz(filename, block)
+
+
+def axes_order(axes):
+    '''The index of the length, width and height in a scan point, from
+    axes naming the scan axes in that order, such as "xyz" or "zxy"'''
+    axes = axes.lower()
+    if sorted(axes) != ['x', 'y', 'z']:
+        raise ValueError('axes should be x, y and z in some order: '
+                         '{0}'.format(axes))
+    return tuple('xyz'.index(c) for c in axes)
+
+
+def extent(filename, axes='xyz', block=BLOCK):
+    '''The lowest and highest length of the points'''
+    il = axes_order(axes)[0]
+    lo = hi = None
+    for points in read_points(filename, block):
+        values = [p[il] for p in points]
+        lo = min(values) if lo is None else min(lo, min(values))
+        hi = max(values) if hi is None else max(hi, max(values))
+    return lo, hi
+
+
+class SectionBins(object):
+    '''The points near each station, cut down to the envelope of the
+    section. For each band of heights resolution high the outermost
+    point is kept, and for each band of widths the lowest. Points are
+    half breadth, height pairs'''
+
+    def __init__(self, stations, slab=None, resolution=0.25, axes='xyz'):
+        self.stations = sorted(stations)
+        if slab is None:
+            slab = resolution
+        self.slab = slab
+        self.resolution = resolution
+        self.axes = axes_order(axes)
+        self.outer = [{} for _ in self.stations]
+        self.lower = [{} for _ in self.stations]
+        self.count = 0
+
+    def add(self, points):
+        '''Bin a block of scan points'''
+        stations = self.stations
+        last = len(stations) - 1
+        slab = self.slab
+        res = self.resolution
+        il, iw, ih = self.axes
+        outer = self.outer
+        lower = self.lower
+        locate = bisect.bisect_left
+        binned = 0
+        for p in points:
+            length = p[il]
+            k = locate(stations, length)
+            if k > last or (k > 0 and length - stations[k - 1] <
+                            stations[k] - length):
+                k -= 1
+            if abs(length - stations[k]) > slab:
+                continue
+            w = abs(p[iw])
+            h = p[ih]
+            binned += 1
+
+            band = int(h // res)
+            best = outer[k].get(band)
+            if best is None or w > best[0]:
+                outer[k][band] = (w, h)
+
+            band = int(w // res)
+            best = lower[k].get(band)
+            if best is None or h < best[1]:
+                lower[k][band] = (w, h)
+        self.count += binned
+
+    def envelope(self, k):
+        '''The outermost points of station k, by height, and the lowest
+        points, by width'''
+        outer = [self.outer[k][b] for b in sorted(self.outer[k])]
+        lower = [self.lower[k][b] for b in sorted(self.lower[k])]
+        return outer, lower
+
+
+def _interpolate(points, value, key, other):
+    '''Linear interpolation in points, sorted on index key, for the
+    index other at value. None when value is outside the points'''
+    if not points or value < points[0][key] or value > points[-1][key]:
+        return None
+    keys = [p[key] for p in points]
+    i = bisect.bisect_left(keys, value)
+    if keys[i] == value or i == 0:
+        return points[i][other]
+    p, q = points[i - 1], points[i]
+    t = (value - p[key]) / (q[key] - p[key])
+    return p[other] + t * (q[other] - p[other])
+
+
+def _girth(top, w, h):
+    '''How far round the section from the sheer a point is, the angle
+    below the sheer height seen from the center line there. An ordinary
+    section, sheer to keel, runs steadily from 0 to a right angle'''
+    return math.atan2(top - h, w)
+
+
+def _in_order(keys):
+    '''The indexes of the longest run of keys in order that ends with
+    the last, the earlier of two lines kept on a tie'''
+    best = [[k] for k in range(len(keys))]
+    for k in range(1, len(keys)):
+        for j in range(k):
+            if keys[j] <= keys[k] and len(best[j]) + 1 > len(best[k]):
+                best[k] = best[j] + [k]
+    return set(best[-1])
+
+
+def order_lines(names, heights, widths):
+    '''Put the lines, names sheer first and keel last, in order round
+    the girth of the midship section, the one with the most lines and
+    then the widest. Waterlines and buttocks cross each other along the
+    length, so at another station a line may fall out of that order; its
+    cell is left blank there rather than have the section cross itself.
+    heights and widths are dicts of a list of cells per line, None where
+    blank. Returns the heights and widths for
+    offsets_writer.offsets_rows()'''
+    count = len(heights[names[0]])
+
+    def keys(k):
+        points = dict((name, (widths[name][k], heights[name][k]))
+                      for name in names if heights[name][k] is not None)
+        if not points:
+            return {}
+        top = max(h for _, h in points.values())
+        return dict((name, _girth(top, w, h))
+                    for name, (w, h) in points.items())
+
+    girths = [keys(k) for k in range(count)]
+    if count:
+        middle = max(range(count), key=lambda k: (
+            len(girths[k]), widths[names[0]][k] or 0.0))
+        # lines missing at midship go where they are on average
+        order = dict((name, girths[middle].get(name)) for name in names)
+        for name in names:
+            if order[name] is None:
+                known = [g[name] for g in girths if name in g]
+                order[name] = sum(known) / len(known) if known else 0.0
+        inner = sorted(names[1:-1], key=order.__getitem__)
+        names = names[:1] + inner + names[-1:]
+
+    for k, girth in enumerate(girths):
+        present = [name for name in names if name in girth]
+        kept = _in_order([girth[name] for name in present])
+        for i, name in enumerate(present):
+            if i not in kept:
+                heights[name][k] = widths[name][k] = None
+
+    return ([(name, heights[name]) for name in names],
+            [(name, widths[name]) for name in names])
+
+
+def table_offsets(sections, waterlines, buttocks, read):
+    '''The table read off each of sections by read(section, waterlines,
+    buttocks), which gives the (width, height) of the sheer, each
+    waterline from the top, each buttock from the outside and the keel,
+    None for a point the section misses, or None for an empty section.
+    Returns the heights and widths for offsets_writer.offsets_rows(), in
+    order round the girth as order_lines() puts them'''
+    waterlines = sorted((float(h) for h in waterlines), reverse=True)
+    buttocks = sorted((float(w) for w in buttocks), reverse=True)
+    names = ['sheer'] + ['wl{0:g}'.format(h) for h in waterlines] + \
+        ['bt{0:g}'.format(w) for w in buttocks] + ['keel']
+    heights = dict((name, []) for name in names)
+    widths = dict((name, []) for name in names)
+
+    for section in sections:
+        points = read(section, waterlines, buttocks) or \
+            [(None, None)] * len(names)
+        for name, (w, h) in zip(names, points):
+            ok = w is not None and h is not None
+            widths[name].append(w if ok else None)
+            heights[name].append(h if ok else None)
+
+    return order_lines(names, heights, widths)
+
+
+def _envelope_offsets(envelope, waterlines, buttocks):
+    outer, lower = envelope
+    if not outer:
+        return None
+    return ([(outer[-1][0], max(h for _, h in outer))] +
+            [(_interpolate(outer, h, 1, 0), h) for h in waterlines] +
+            [(w, _interpolate(lower, w, 0, 1)) for w in buttocks] +
+            [(0.0, lower[0][1])])
+
+
+def read_offsets(bins, waterlines=(), buttocks=()):
+    '''Read the table off the binned sections, see table_offsets()'''
+    return table_offsets([bins.envelope(k) for k in range(len(bins.stations))],
+                         waterlines, buttocks, _envelope_offsets)
+
+
+def scan_table(filename, stations=None, count=None, waterlines=(),
+               buttocks=(), slab=None, resolution=0.25, axes='xyz',
+               block=BLOCK):
+    '''Bin the points of a scan and read off the table. Gives count
+    evenly spaced stations over the length of the scan when stations is
+    None, which takes an extra pass over the file. Returns the stations
+    and the heights and widths'''
+    if stations is None:
+        lo, hi = extent(filename, axes, block)
+        if lo is None:
+            raise ValueError('no points in {0}'.format(filename))
+        # keep the end stations a slab inside the ends of the scan
+        inset = resolution if slab is None else slab
+        stations = offsets_resample.even_stations(lo + inset, hi - inset,
+                                                  count or 11)
+
+    bins = SectionBins(stations, slab, resolution, axes)
+    for points in read_points(filename, block):
+        bins.add(points)
+
+    heights, widths = read_offsets(bins, waterlines, buttocks)
+    return bins.stations, heights, widths
+
+
+def write_table(filename, stations, heights, widths, units='decimal',
+                digits=None):
+    rows = offsets_writer.offsets_rows(stations, heights, widths,
+                                       units=units, digits=digits)
+    with open(filename, 'w', newline='') as csvfile:
+        offsets_writer.write_rows(csvfile, rows)
+
+
+def _floats(text):
+    return [float(v) for v in text.split(',')] if text else []
+
+
+if __name__ == "__main__":
+    ''' This is executed when run from the command line '''
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("filename", help="input .xyz or .ply point cloud")
+    parser.add_argument("output", help="output .csv file (offset table)")
+
+    parser.add_argument("-s", "--stations", action="store",
+                        help="comma separated station positions")
+
+    parser.add_argument("-n", "--count", action="store", type=int,
+                        default=11, help="number of evenly spaced stations "
+                                         "when --stations is not given")
+
+    parser.add_argument("-w", "--waterlines", action="store",
+                        help="comma separated waterline heights")
+
+    parser.add_argument("-k", "--buttocks", action="store",
+                        help="comma separated buttock half breadths")
+
+    parser.add_argument("-r", "--resolution", action="store", type=float,
+                        default=0.25, help="height and width of the bands "
+                                           "the sections are binned in")
+
+    parser.add_argument("--slab", action="store", type=float,
+                        help="take points this far either side of each "
+                             "station (default the resolution)")
+
+    parser.add_argument("--axes", action="store", default="xyz",
+                        help="scan axes along the length, width and "
+                             "height (default xyz)")
+
+    parser.add_argument("-u", "--units", choices=['decimal', 'fie'],
+                        default='decimal', help="table units")
+
+    parser.add_argument(
+        "--version",
+        action="version",
+        version="%(prog)s (version {version})".format(version=__version__))
+
+    args = parser.parse_args()
+    if args.count < 2:
+        parser.error("--count must be at least 2")
+    stations, heights, widths = scan_table(
+        args.filename, _floats(args.stations) or None, args.count,
+        _floats(args.waterlines), _floats(args.buttocks), args.slab,
+        args.resolution, args.axes)
+    write_table(args.output, stations, heights, widths, args.units)
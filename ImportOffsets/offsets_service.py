@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*-
+
+"""
+A long running local conversion service. Tools that would otherwise
+run offsets_reader.py once per table POST the csv text instead and get
+back the JSON, OpenSCAD, STL or hydrostatics. Results are kept in an
+LRU cache keyed by a hash of the table and the options, and the
+conversions run on a process pool so a big mesh does not hold up the
+other requests.
+
+    POST /json?precision=1/64     offset_data as written by offsets_reader
+    POST /scad?full=1             OpenSCAD model
+    POST /stl?full=1              binary STL mesh
+    POST /hydro                   section areas, centroids and volume
+    GET  /stats                   cache and request counters
+
+bow and transom set the end angles when the table has none. The server
+listens on localhost or on a Unix socket, there is no authentication.
+"""
+
+__author__ = "Robert Marchese"
+__version__ = "0.1.0"
+__license__ = "MIT"
+
+import argparse
+import asyncio
+import collections
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import hashlib
+import http.client
+import io
+import json
+import logging
+import socket
+from urllib.parse import parse_qs, urlsplit
+
+try:
+    from . import offsets_hydro
+    from . import offsets_mesh
+    from . import offsets_reader
+    from . import offsets_scad
+    from . import offsets_writer
+except ImportError:
+    import offsets_hydro
+    import offsets_mesh
+    import offsets_reader
+    import offsets_scad
+    import offsets_writer
+
+
+logger = logging.getLogger('offsets service')
+
+# path -> content type of the result
+KINDS = {
+    'json': 'application/json',
+    'scad': 'text/plain; charset=utf-8',
+    'stl': 'model/stl',
+    'hydro': 'application/json',
+}
+
+MAX_BODY = 64 * 1024 * 1024
+
+STATUS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+          405: 'Method Not Allowed', 413: 'Payload Too Large',
+          422: 'Unprocessable Entity'}
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        Exception.__init__(self, message)
+        self.status = status
+
+
+def convert(kind, text, bow_angle=90, transom_angle=90, precision=None,
+            half_hull=True):
+    '''Convert the csv text of a table, returns the bytes of the
+    result. This runs in the worker processes'''
+    raw_table = list(csv.reader(io.StringIO(text), delimiter=',',
+                                quotechar='"'))
+    offset_data = offsets_reader.offsets_from_rows(raw_table)
+
+    if kind == 'hydro':
+        result = offsets_hydro.hydrostatics(offset_data['sections'])
+        return json.dumps(result).encode('utf-8')
+
+    offset_data = offsets_reader.rake_ends(offset_data, bow_angle,
+                                           transom_angle)
+    if kind == 'stl':
+        opf = io.BytesIO()
+        offsets_mesh.write_stl(opf, offsets_mesh.hull_triangles(
+            offset_data['sections'], half_hull))
+        return opf.getvalue()
+
+    opf = io.StringIO()
+    if kind == 'scad':
+        offsets_scad.write_scad(opf, offset_data, half_hull=half_hull)
+    else:
+        offsets_writer.write_json(opf, offset_data, precision)
+    return opf.getvalue().encode('utf-8')
+
+
+def parse_options(kind, query):
+    '''The keyword arguments of convert() from the query string. Only
+    the options that change the result of kind are kept, so they do not
+    split the cache'''
+    params = dict((k, v[-1]) for k, v in parse_qs(query).items())
+    options = {}
+    try:
+        if kind != 'hydro':
+            options['bow_angle'] = float(params.get('bow', 90))
+            options['transom_angle'] = float(params.get('transom', 90))
+        if kind == 'json':
+            options['precision'] = offsets_writer.parse_precision(
+                params.get('precision'))
+        if kind in ('scad', 'stl'):
+            options['half_hull'] = params.get('full', '0') in ('', '0')
+    except ValueError as e:
+        raise RequestError(400, str(e))
+
+    return options
+
+
+def cache_key(kind, text, options):
+    digest = hashlib.sha256(text.encode('utf-8'))
+    digest.update(repr((kind, sorted(options.items()))).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class LRUCache(object):
+    '''Results by key, the least recently used are dropped once there
+    are more than maxsize of them or they add up to more than
+    maxbytes'''
+
+    def __init__(self, maxsize=256, maxbytes=256 * 1024 * 1024):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.nbytes = 0
+        self._items = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key):
+        value = self._items.get(key)
+        if value is not None:
+            self._items.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        if key in self._items:
+            self.nbytes -= len(self._items.pop(key))
+        if len(value) > self.maxbytes:
+            return
+        self._items[key] = value
+        self.nbytes += len(value)
+        while len(self._items) > self.maxsize or self.nbytes > self.maxbytes:
+            _, dropped = self._items.popitem(last=False)
+            self.nbytes -= len(dropped)
+
+
+class ConversionService(object):
+    '''Answers conversion requests from the cache or the worker pool.
+    workers=0 converts on a thread of this process instead'''
+
+    def __init__(self, workers=None, cache_size=256,
+                 cache_bytes=256 * 1024 * 1024):
+        self.cache = LRUCache(cache_size, cache_bytes)
+        self.pool = ProcessPoolExecutor(workers) if workers != 0 else None
+        self.pending = {}
+        self.counters = collections.Counter()
+
+    async def result(self, kind, text, options):
+        '''The converted table and whether it came from the cache.
+        Identical requests that arrive while one is being converted wait
+        for the same result'''
+        key = cache_key(kind, text, options)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.counters['hits'] += 1
+            return cached, True
+
+        if key in self.pending:
+            self.counters['hits'] += 1
+            return await asyncio.shield(self.pending[key]), True
+
+        self.counters['misses'] += 1
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self.pool, _convert, kind, text, options)
+        self.pending[key] = future
+        try:
+            data = await future
+        finally:
+            del self.pending[key]
+        self.cache.put(key, data)
+
+        return data, False
+
+    def stats(self):
+        stats = dict(self.counters)
+        stats.update(cached=len(self.cache), cached_bytes=self.cache.nbytes)
+        return stats
+
+    async def respond(self, method, target, body):
+        '''Returns the status, content type and body of the response
+        and the headers to add'''
+        url = urlsplit(target)
+        kind = url.path.strip('/')
+        if kind == 'stats':
+            return 200, 'application/json', json.dumps(
+                self.stats()).encode('utf-8'), {}
+        if kind not in KINDS:
+            raise RequestError(404, 'unknown path {0}'.format(url.path))
+        if method != 'POST':
+            raise RequestError(405, 'POST the csv text of a table')
+
+        options = parse_options(kind, url.query)
+        try:
+            text = body.decode('utf-8-sig')
+        except UnicodeDecodeError as e:
+            raise RequestError(400, str(e))
+        try:
+            data, hit = await self.result(kind, text, options)
+        except Exception as e:
+            logger.debug('conversion failed', exc_info=True)
+            raise RequestError(422, 'could not convert the table: {0!r}'
+                               .format(e))
+
+        return 200, KINDS[kind], data, {'X-Cache': 'hit' if hit else 'miss'}
+
+    async def handle(self, reader, writer):
+        '''Serve HTTP/1.1 requests on one connection'''
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                self.counters['requests'] += 1
+                try:
+                    status, ctype, data, extra = await self.respond(
+                        method, target, body)
+                except RequestError as e:
+                    status, ctype, extra = e.status, 'text/plain', {}
+                    data = (str(e) + '\n').encode('utf-8')
+                    self.counters['errors'] += 1
+                logger.info('{0} {1} {2} {3}'.format(
+                    method, target, status, len(data)))
+
+                close = headers.get('connection', '').lower() == 'close'
+                write_response(writer, status, ctype, data, extra, close)
+                await writer.drain()
+                if close:
+                    break
+        except RequestError as e:
+            write_response(writer, e.status, 'text/plain',
+                           (str(e) + '\n').encode('utf-8'), {}, True)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def close(self):
+        if self.pool:
+            self.pool.shutdown()
+
+
+def _convert(kind, text, options):
+    return convert(kind, text, **options)
+
+
+async def read_request(reader):
+    '''Read one request, returns (method, target, headers, body) or None
+    when the client closed the connection'''
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    try:
+        method, target, _ = line.decode('latin-1').split()
+    except ValueError:
+        raise RequestError(400, 'bad request line')
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if not line.strip():
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise RequestError(400, 'bad Content-Length')
+    if length > MAX_BODY:
+        raise RequestError(413, 'tables are limited to {0} bytes'.format(
+            MAX_BODY))
+    body = await reader.readexactly(length) if length else b''
+
+    return method.upper(), target, headers, body
+
+
+def write_response(writer, status, ctype, data, extra, close=False):
+    head = ['HTTP/1.1 {0} {1}'.format(status, STATUS.get(status, '')),
+            'Content-Type: ' + ctype,
+            'Content-Length: {0}'.format(len(data))]
+    head.extend('{0}: {1}'.format(k, v) for k, v in extra.items())
+    if close:
+        head.append('Connection: close')
+    writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + data)
+
+
+async def start_server(service, host='127.0.0.1', port=8765, path=None):
+    '''Start listening on host:port, or on the Unix socket path'''
+    if path:
+        return await asyncio.start_unix_server(service.handle, path)
+    return await asyncio.start_server(service.handle, host, port)
+
+
+async def serve(service, host='127.0.0.1', port=8765, path=None):
+    server = await start_server(service, host, port, path)
+    for s in server.sockets:
+        logger.info('listening on {0}'.format(s.getsockname()))
+    async with server:
+        await server.serve_forever()
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path):
+        http.client.HTTPConnection.__init__(self, 'localhost')
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.path)
+
+
+def request(kind, text, host='127.0.0.1', port=8765, path=None,
+            **params):
+    '''Ask a running service to convert the csv text of a table.
+    Returns the response body, raises RuntimeError on an error'''
+    if path:
+        conn = UnixHTTPConnection(path)
+    else:
+        conn = http.client.HTTPConnection(host, port)
+    query = '&'.join('{0}={1}'.format(k, v) for k, v in params.items())
+    try:
+        conn.request('POST', '/{0}?{1}'.format(kind, query),
+                     text.encode('utf-8'))
+        response = conn.getresponse()
+        data = response.read()
+    finally:
+        conn.close()
+    if response.status != 200:
+        raise RuntimeError(data.decode('utf-8', 'replace').strip())
+
+    return data
+
+
+if __name__ == "__main__":
+    ''' This is executed when run from the command line '''
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("--host", action="store", dest="host",
+                        default='127.0.0.1',
+                        help="address to listen on (default 127.0.0.1)")
+
+    parser.add_argument("--port", action="store", type=int, dest="port",
+                        default=8765, help="port to listen on")
+
+    parser.add_argument("-u", "--unix", action="store", dest="path",
+                        help="listen on this Unix socket instead")
+
+    parser.add_argument("-w", "--workers", action="store", type=int,
+                        dest="workers", default=None,
+                        help="conversion processes (default one per CPU, "
+                             "0 to convert in this process)")
+
+    parser.add_argument("-c", "--cache", action="store", type=int,
+                        dest="cache", default=256,
+                        help="results kept in the cache")
+
+    parser.add_argument(
+        "--version",
+        action="version",
+        version="%(prog)s (version {version})".format(version=__version__))
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO,
+                        format='%(levelname)s - %(message)s')
+    logging.getLogger('offsets reader').setLevel(logging.WARNING)
+
+    service = ConversionService(args.workers, args.cache)
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.path))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
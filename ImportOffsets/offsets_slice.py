@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+
+"""
+Slice an STL hull from another design program into an offsets table,
+the reverse of offsets_mesh.py. The mesh is cut at each station, the
+cut segments are chained into the section outline, and the table is
+read off the outlines: the half breadth at each waterline, the height
+at each buttock, and the sheer and keel.
+
+The triangles are sorted by their lowest station coordinate and the
+stations are cut in order, so each cut only looks at the triangles that
+span it rather than the whole mesh.
+
+    python offsets_slice.py hull.stl hull.csv --count 13 \\
+        --waterlines 4,8,12 --buttocks 6,12
+
+The mesh is taken to be laid out as offsets_mesh.py writes it, the
+width along x, the height along y and the length along z. Meshes from
+programs with the length along x and z up need --axes xyz.
+"""
+
+__author__ = "Robert Marchese"
+__version__ = "0.1.0"
+__license__ = "MIT"
+
+import argparse
+import os
+import struct
+
+try:
+    from . import offsets_resample
+    from . import offsets_scan
+except ImportError:
+    import offsets_resample
+    import offsets_scan
+
+
+# the axes of offsets_mesh.py STL files, length along z, width along x
+MESH_AXES = 'zxy'
+
+
+def read_stl(filename):
+    '''The triangles of an ASCII or binary STL file as tuples of three
+    (x, y, z) points'''
+    size = os.path.getsize(filename)
+    with open(filename, 'rb') as f:
+        header = f.read(84)
+        if len(header) == 84:
+            count = struct.unpack('<I', header[80:])[0]
+            if size == 84 + 50 * count:
+                data = f.read(50 * count)
+                return [(v[3:6], v[6:9], v[9:12])
+                        for v in struct.iter_unpack('<12fH', data)]
+        f.seek(0)
+        text = f.read().decode('ascii', 'replace')
+
+    vertices = []
+    for line in text.splitlines():
+        words = line.split()
+        if words and words[0] == 'vertex':
+            vertices.append((float(words[1]), float(words[2]),
+                             float(words[3])))
+    if not vertices or len(vertices) % 3:
+        raise ValueError('{0} is not an STL file'.format(filename))
+    return [tuple(vertices[i:i + 3]) for i in range(0, len(vertices), 3)]
+
+
+def oriented(triangles, axes=MESH_AXES):
+    '''The triangles with their points as (length, width, height)'''
+    il, iw, ih = offsets_scan.axes_order(axes)
+    return [((a[il], a[iw], a[ih]), (b[il], b[iw], b[ih]),
+             (c[il], c[iw], c[ih])) for a, b, c in triangles]
+
+
+def spans(triangles):
+    '''The lowest and highest length of each triangle, with the
+    triangle, sorted on the lowest'''
+    out = [(min(a[0], b[0], c[0]), max(a[0], b[0], c[0]), (a, b, c))
+           for a, b, c in triangles]
+    out.sort(key=lambda span: span[0])
+    return out
+
+
+def cut_segments(triangles, station):
+    '''The (width, height) segments where the plane length = station
+    cuts the triangles. A point on the plane counts as past it, so a
+    triangle with a corner on the plane is cut once, not twice'''
+    segments = []
+    for t in triangles:
+        ends = []
+        for p, q in ((t[0], t[1]), (t[1], t[2]), (t[2], t[0])):
+            dp = p[0] - station
+            dq = q[0] - station
+            if (dp >= 0) != (dq >= 0):
+                s = dp / (dp - dq)
+                ends.append((p[1] + s * (q[1] - p[1]),
+                             p[2] + s * (q[2] - p[2])))
+        if len(ends) == 2 and ends[0] != ends[1]:
+            segments.append((ends[0], ends[1]))
+    return segments
+
+
+def chain_segments(segments, digits=9):
+    '''Join segments that share ends into polylines. Closed outlines
+    end with their first point'''
+    def key(p):
+        return (round(p[0], digits), round(p[1], digits))
+
+    links = {}
+    for k, (a, b) in enumerate(segments):
+        links.setdefault(key(a), []).append(k)
+        links.setdefault(key(b), []).append(k)
+
+    used = [False] * len(segments)
+    polylines = []
+
+    def walk(line, point):
+        while True:
+            nxt = [k for k in links[key(point)] if not used[k]]
+            if not nxt:
+                return
+            k = nxt[0]
+            used[k] = True
+            a, b = segments[k]
+            point = b if key(a) == key(point) else a
+            line.append(point)
+
+    # open chains first start from their loose ends
+    starts = [k for k, (a, b) in enumerate(segments)
+              if len(links[key(a)]) == 1 or len(links[key(b)]) == 1]
+    for k in starts + list(range(len(segments))):
+        if used[k]:
+            continue
+        used[k] = True
+        a, b = segments[k]
+        if len(links[key(b)]) == 1:
+            a, b = b, a
+        line = [a, b]
+        walk(line, b)
+        if len(links[key(a)]) > 1 and key(line[-1]) != key(a):
+            back = [a]
+            walk(back, a)
+            line = back[::-1] + line[1:]
+        polylines.append(line)
+
+    return polylines
+
+
+def slice_mesh(index, stations):
+    '''The section outlines at each station, lists of polylines of
+    (width, height) points, in the order of stations. index is from
+    spans()'''
+    order = sorted(range(len(stations)), key=lambda k: stations[k])
+    sections = [None] * len(stations)
+    active = []
+    i = 0
+    for k in order:
+        station = stations[k]
+        while i < len(index) and index[i][0] <= station:
+            active.append(index[i])
+            i += 1
+        active = [span for span in active if span[1] >= station]
+        sections[k] = chain_segments(cut_segments(
+            [span[2] for span in active], station))
+
+    return sections
+
+
+def _crossings(polylines, value, along, across):
+    '''Where the outlines cross the line index along = value, as the
+    values of index across'''
+    out = []
+    for line in polylines:
+        for p, q in zip(line, line[1:]):
+            dp, dq = p[along] - value, q[along] - value
+            if (dp >= 0) != (dq >= 0):
+                out.append(p[across] + dp / (dp - dq) *
+                           (q[across] - p[across]))
+            elif dp == 0 and dq == 0:
+                out.extend((p[across], q[across]))
+    return out
+
+
+def _outline_offsets(polylines, waterlines, buttocks):
+    points = [p for line in polylines for p in line if p[0] >= -1e-9]
+    if not points:
+        return None
+    top = max(h for _, h in points)
+    out = [(max(w for w, h in points if h >= top - 1e-9), top)]
+    for h in waterlines:
+        found = [w for w in _crossings(polylines, h, 1, 0) if w >= 0]
+        out.append((max(found) if found else None, h))
+    for w in buttocks:
+        found = _crossings(polylines, w, 0, 1)
+        out.append((w, min(found) if found else None))
+    found = _crossings(polylines, 0.0, 0, 1)
+    out.append((0.0, min(found) if found else min(h for _, h in points)))
+    return out
+
+
+def read_offsets(sections, waterlines=(), buttocks=()):
+    '''Read the table off the section outlines, the same lines as
+    offsets_scan.read_offsets(). Only the side of each section with
+    positive width is used'''
+    return offsets_scan.table_offsets(sections, waterlines, buttocks,
+                                      _outline_offsets)
+
+
+def slice_table(filename, stations=None, count=11, waterlines=(),
+                buttocks=(), axes=MESH_AXES):
+    '''Slice an STL file into a table. Gives count evenly spaced
+    stations just inside the ends of the mesh when stations is None.
+    Returns the stations and the heights and widths'''
+    index = spans(oriented(read_stl(filename), axes))
+    if not index:
+        raise ValueError('no triangles in {0}'.format(filename))
+    if stations is None:
+        lo = index[0][0]
+        hi = max(span[1] for span in index)
+        # the ends are usually flat caps, which the plane would lie in
+        inset = 1e-4 * (hi - lo)
+        stations = offsets_resample.even_stations(lo + inset, hi - inset,
+                                                  count)
+
+    heights, widths = read_offsets(slice_mesh(index, stations),
+                                   waterlines, buttocks)
+    return list(stations), heights, widths
+
+
+def _floats(text):
+    return [float(v) for v in text.split(',')] if text else []
+
+
+if __name__ == "__main__":
+    ''' This is executed when run from the command line '''
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("filename", help="input .stl mesh")
+    parser.add_argument("output", help="output .csv file (offset table)")
+
+    parser.add_argument("-s", "--stations", action="store",
+                        help="comma separated station positions")
+
+    parser.add_argument("-n", "--count", action="store", type=int,
+                        default=11, help="number of evenly spaced stations "
+                                         "when --stations is not given")
+
+    parser.add_argument("-w", "--waterlines", action="store",
+                        help="comma separated waterline heights")
+
+    parser.add_argument("-k", "--buttocks", action="store",
+                        help="comma separated buttock half breadths")
+
+    parser.add_argument("--axes", action="store", default=MESH_AXES,
+                        help="mesh axes along the length, width and "
+                             "height (default zxy)")
+
+    parser.add_argument("-u", "--units", choices=['decimal', 'fie'],
+                        default='decimal', help="table units")
+
+    parser.add_argument(
+        "--version",
+        action="version",
+        version="%(prog)s (version {version})".format(version=__version__))
+
+    args = parser.parse_args()
+    if args.count < 2:
+        parser.error("--count must be at least 2")
+    stations, heights, widths = slice_table(
+        args.filename, _floats(args.stations) or None, args.count,
+        _floats(args.waterlines), _floats(args.buttocks), args.axes)
+    offsets_scan.write_table(args.output, stations, heights, widths,
+                             args.units)
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+"""
+Generates synthetic offset tables for stress testing. The hull is
+parametric: the number of stations and lines, hard chines or a round
+bilge, rocker, flare, sheer spring and missing ('x') cells toward the
+stem can all be chosen. Tables are written in the same axis, name,
+stations layout that parse_csv_offsets() reads.
+"""
+
+__author__ = "Robert Marchese"
+__version__ = "0.1.0"
+__license__ = "MIT"
+
+import argparse
+from math import cos, pi, sin
+
+try:
+    from . import offsets_writer
+except ImportError:
+    import offsets_writer
+
+
+def _blend(u, knots):
+    '''Find the panel of a hard chine section that holds fraction u
+    (0 at the sheer, 1 at the keel). Returns the knots on either side
+    and how far u is between them'''
+    for k0, k1 in zip(knots, knots[1:]):
+        if u <= k1:
+            return k0, k1, (u - k0) / (k1 - k0) if k1 > k0 else 0.0
+    return knots[-2], knots[-1], 1.0
+
+
+def line_names(lines, chines):
+    '''Names for the lines, from the sheer down to the keel'''
+    if lines < 2:
+        raise ValueError('need at least two lines, the sheer and keel')
+    inner = lines - 2
+    if chines:
+        names = ['chine{0}'.format(i + 1) if chines > 1 else 'chine'
+                 for i in range(min(chines, inner))]
+        names += ['line{0}'.format(i + 1) for i in range(inner - len(names))]
+    else:
+        names = ['line{0}'.format(i + 1) for i in range(inner)]
+    return ['sheer'] + names + ['keel']
+
+
+def hull_table(stations=13, lines=3, length=138.0, beam=48.0, depth=24.0,
+               chines=1, rocker=0.1, flare=0.15, sheer=0.1, transom=0.3,
+               gaps=0):
+    '''Build the offsets of a parametric hull.
+
+    chines -- number of hard chines, 0 gives a round bilge
+    rocker -- rise of the keel at the ends as a fraction of depth
+    flare -- extra width at the sheer compared to a plumb topside
+    sheer -- rise of the sheer at the ends as a fraction of depth
+    transom -- 0 for a double ender, up to 0.5 for a wide transom
+    gaps -- number of stations at the stem left as 'x' on the lower
+            half of the lines
+
+    Returns the station positions and a dictionary with the 'heights'
+    and 'widths' rows (name, values) in line order. Missing cells are
+    None.'''
+
+    if stations < 2:
+        raise ValueError('need at least two stations')
+
+    # Values that only depend on the station, computed once
+    ts = [i / (stations - 1.0) for i in range(stations)]
+    z = [length * t for t in ts]
+    half = [0.5 * beam * sin(pi * (transom + (1.0 - transom) * t))
+            for t in ts]
+    top = [depth * (1.0 + sheer * (2.0 * t - 1.0) ** 2) for t in ts]
+    keel = [depth * rocker * (2.0 * t - 1.0) ** 2 for t in ts]
+
+    # Values that only depend on the line, computed once
+    names = line_names(lines, chines)
+    us = [j / (lines - 1.0) for j in range(lines)]
+    if chines:
+        knots = [k / (chines + 1.0) for k in range(chines + 2)]
+    else:
+        knots = []
+
+    def shape(u):
+        # width and height factors on the round bilge at fraction u
+        phi = 0.5 * pi * u
+        fx = cos(phi) * (1.0 + flare * (1.0 - u) ** 2) / (1.0 + flare)
+        fy = 1.0 - sin(phi)
+        return fx, fy
+
+    factors = []
+    for u in us:
+        if knots:
+            k0, k1, f = _blend(u, knots)
+            x0, y0 = shape(k0)
+            x1, y1 = shape(k1)
+            factors.append((x0 + f * (x1 - x0), y0 + f * (y1 - y0)))
+        else:
+            factors.append(shape(u))
+
+    gaps = min(max(gaps, 0), stations)
+    first_gap = stations - gaps
+    heights = []
+    widths = []
+    for j, (fx, fy) in enumerate(factors):
+        ys = [k + fy * (h - k) for k, h in zip(keel, top)]
+        xs = [fx * w for w in half]
+        if gaps and 2 * j >= lines:
+            ys[first_gap:] = [None] * gaps
+            xs[first_gap:] = [None] * gaps
+        heights.append((names[j], ys))
+        widths.append((names[j], xs))
+
+    return z, {'heights': heights, 'widths': widths}
+
+
+def table_rows(z, table, units='decimal', digits=4):
+    '''Format a table from hull_table() as csv rows'''
+    return offsets_writer.offsets_rows(z, table['heights'], table['widths'],
+                                       units=units, digits=digits)
+
+
+def generate(filename, units='decimal', digits=4, **params):
+    '''Write a synthetic offsets table to filename, see hull_table()
+    for the parameters'''
+    z, table = hull_table(**params)
+    with open(filename, 'w', newline='') as csvfile:
+        offsets_writer.write_rows(csvfile, table_rows(z, table, units,
+                                                      digits))
+
+
+if __name__ == "__main__":
+    ''' This is executed when run from the command line '''
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("filename", help="output .csv file (offset table)")
+
+    parser.add_argument("-s", "--stations", type=int, default=13)
+    parser.add_argument("-l", "--lines", type=int, default=3)
+    parser.add_argument("--length", type=float, default=138.0,
+                        help="length in inches")
+    parser.add_argument("--beam", type=float, default=48.0,
+                        help="maximum beam in inches")
+    parser.add_argument("--depth", type=float, default=24.0,
+                        help="depth amidships in inches")
+    parser.add_argument("--chines", type=int, default=1,
+                        help="number of chines, 0 for a round bilge")
+    parser.add_argument("--rocker", type=float, default=0.1)
+    parser.add_argument("--flare", type=float, default=0.15)
+    parser.add_argument("--sheer", type=float, default=0.1)
+    parser.add_argument("--transom", type=float, default=0.3)
+    parser.add_argument("--gaps", type=int, default=0,
+                        help="stations left as 'x' at the stem")
+    parser.add_argument("-u", "--units", choices=['decimal', 'fie'],
+                        default='decimal',
+                        help="decimal inches or feet-inches-eighths")
+
+    parser.add_argument(
+        "--version",
+        action="version",
+        version="%(prog)s (version {version})".format(version=__version__))
+
+    args = vars(parser.parse_args())
+    generate(args.pop('filename'), **args)
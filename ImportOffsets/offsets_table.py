@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+
+"""
+An editable offsets table. Cells can be changed one at a time and the
+table keeps track of which stations and lines are dirty. The products
+derived from it (cross sections, the _upper_cl and _lower_cl profile
+lines, the raked end stations and the hydrostatic integrals) are cached
+and only recomputed for the stations that changed, the next time they
+are asked for.
+"""
+
+__author__ = "Robert Marchese"
+__version__ = "0.1.0"
+__license__ = "MIT"
+
+import csv
+
+try:
+    from . import offsets_hydro
+    from . import offsets_reader
+    from . import offsets_writer
+except ImportError:
+    import offsets_hydro
+    import offsets_reader
+    import offsets_writer
+
+
+class OffsetTable(object):
+    '''The widths and heights of each line at each station.
+
+    stations -- the station positions (z)
+    widths, heights -- {line name: [value per station]}, a missing
+        offset is anything that is not a float (None, 'x', '')
+    line_order -- the order the lines are used in the sections
+    angles -- optional section angles from the table'''
+
+    def __init__(self, stations, widths, heights, line_order=None,
+                 angles=None, bow_angle=90, transom_angle=90):
+        self.stations = [float(z) for z in stations]
+        self.line_order = list(line_order or widths)
+        # the lines are kept in the order they run down the sections, as
+        # combine_offsets() does
+        names = [name for name in self.line_order if name in widths]
+        names.extend(name for name in widths if name not in names)
+        self.widths = {name: list(widths[name]) for name in names}
+        self.heights = {name: list(heights[name]) for name in names}
+        self.angles = list(angles) if angles else None
+        self.bow_angle = bow_angle
+        self.transom_angle = transom_angle
+
+        n = len(self.stations)
+        self._lines = {name: [self._make_point(name, i) for i in range(n)]
+                       for name in self.widths}
+
+        # cached products, None means not computed yet
+        self._sections = [None] * n
+        self._upper = [None] * n
+        self._lower = [None] * n
+        self._areas = [None] * n
+        self._slices = [0.0] * max(n - 1, 0)
+        self._dirty_slices = set(range(n - 1))
+        self._volume = 0.0
+        self._raked = {}
+
+        self._dirty_stations = set(range(n))
+        self._dirty_lines = set(self.widths)
+
+    @classmethod
+    def from_csv(cls, filename, **kwargs):
+        '''Read a table the same way parse_csv_offsets() does'''
+        with open(filename, 'r') as csvfile:
+            raw = list(csv.reader(csvfile, delimiter=',', quotechar='"'))
+        table = offsets_reader.munge_table(raw)
+        lines, line_order, angles = offsets_reader.combine_offsets(table)
+
+        widths = offsets_reader.get_all_axis(table, 'width')
+        heights = offsets_reader.get_all_axis(table, 'height')
+        stations = offsets_reader.get_all_axis(table, 'length')['station']
+
+        return cls(stations, widths, heights, line_order, angles, **kwargs)
+
+    def to_csv(self, filename, units='decimal', digits=None):
+        '''Write the table in the layout from_csv() reads. In decimal
+        inches it reads back as the same table'''
+        names = [name for name in self.line_order if name in self.widths]
+        names.extend(name for name in self.widths if name not in names)
+        rows = offsets_writer.offsets_rows(
+            self.stations, [(name, self.heights[name]) for name in names],
+            [(name, self.widths[name]) for name in names], self.angles,
+            units, digits)
+        with open(filename, 'w', newline='') as csvfile:
+            offsets_writer.write_rows(csvfile, rows)
+
+    def __len__(self):
+        return len(self.stations)
+
+    # Editing
+
+    def _make_point(self, name, i):
+        point = (self.widths[name][i], self.heights[name][i],
+                 self.stations[i])
+        if offsets_reader.is_valid(point):
+            return point
+        return []
+
+    def _touch(self, name, i):
+        point = self._make_point(name, i)
+        if point != self._lines[name][i]:
+            self._lines[name][i] = point
+            self._dirty_stations.add(i)
+            self._dirty_lines.add(name)
+
+    def set_width(self, name, i, value):
+        self.widths[name][i] = value
+        self._touch(name, i)
+
+    def set_height(self, name, i, value):
+        self.heights[name][i] = value
+        self._touch(name, i)
+
+    def set_offset(self, name, i, width, height):
+        '''Set both offsets of a line at station i'''
+        self.widths[name][i] = width
+        self.heights[name][i] = height
+        self._touch(name, i)
+
+    def set_station(self, i, z):
+        '''Move station i, which moves every line at that station'''
+        self.stations[i] = float(z)
+        for name in self.widths:
+            self._touch(name, i)
+
+    def set_angles(self, angles=None, bow_angle=None, transom_angle=None):
+        '''Change the section angles, only the raked ends are affected'''
+        self.angles = list(angles) if angles else None
+        if bow_angle is not None:
+            self.bow_angle = bow_angle
+        if transom_angle is not None:
+            self.transom_angle = transom_angle
+        self._raked.clear()
+
+    def dirty(self):
+        '''The stations and lines changed since the products were last
+        brought up to date'''
+        return set(self._dirty_stations), set(self._dirty_lines)
+
+    # Derived products
+
+    def _refresh(self):
+        '''Recompute the per-station products at the dirty stations'''
+        if not self._dirty_stations:
+            return
+        n = len(self.stations)
+        for i in self._dirty_stations:
+            self._sections[i], self._upper[i], self._lower[i] = \
+                offsets_reader.section_at(self._lines, self.line_order, i)
+            self._areas[i] = None
+            self._dirty_slices.update(j for j in (i - 1, i) if 0 <= j < n - 1)
+            if i == 0 or i == n - 1:
+                self._raked.pop(i, None)
+        self._dirty_stations.clear()
+        self._dirty_lines.clear()
+
+    def line(self, name):
+        '''The (x, y, z) points of a line, [] where an offset is missing.
+        The list is shared with the table, do not modify it'''
+        return self._lines[name]
+
+    def section(self, i):
+        self._refresh()
+        return self._sections[i]
+
+    def sections(self):
+        self._refresh()
+        return self._sections
+
+    def profile_lines(self):
+        '''The _upper_cl and _lower_cl lines'''
+        self._refresh()
+        return self._upper, self._lower
+
+    def end_angles(self):
+        '''Bow and transom angles, from the table if it had them'''
+        if self.angles:
+            return self.angles[0], self.angles[-1]
+        return float(self.bow_angle), float(self.transom_angle)
+
+    def raked_end(self, i):
+        '''The section and line points at station i (the first or last)
+        after the rake angle is applied'''
+        self._refresh()
+        if i < 0:
+            i += len(self.stations)
+        if i not in self._raked:
+            angle = self.end_angles()[0 if i == 0 else 1]
+            lines = {name: [points[i]] for name, points in self._lines.items()}
+            lines['_upper_cl'] = [self._upper[i]]
+            lines['_lower_cl'] = [self._lower[i]]
+            end = {'sections': [self._sections[i]], 'lines': lines}
+            end = offsets_reader.rake_angle(end, 0, 90 - angle)
+            self._raked[i] = (end['sections'][0],
+                              {name: p[0] for name, p in end['lines'].items()})
+        return self._raked[i]
+
+    def section_area(self, i):
+        '''Area of the (unraked) half section at station i'''
+        self._refresh()
+        if self._areas[i] is None:
+            self._areas[i] = offsets_hydro.section_area(self._sections[i])
+        return self._areas[i]
+
+    def volume(self):
+        '''Volume of the half hull between the first and last station.
+        Only the slices between changed stations are integrated again'''
+        self._refresh()
+        z = self.stations
+        for j in self._dirty_slices:
+            v = offsets_hydro.interval_volume(z[j], self.section_area(j),
+                                              z[j + 1], self.section_area(j + 1))
+            self._volume += v - self._slices[j]
+            self._slices[j] = v
+        if len(self._dirty_slices) > 1:
+            # avoid accumulating rounding errors on big updates
+            self._volume = sum(self._slices)
+        self._dirty_slices.clear()
+        return self._volume
+
+    def offset_data(self):
+        '''The same dictionary offset_reader() followed by rake_ends()
+        produces'''
+        self._refresh()
+        n = len(self.stations)
+        lines = {name: list(points) for name, points in self._lines.items()}
+        lines['_upper_cl'] = list(self._upper)
+        lines['_lower_cl'] = list(self._lower)
+        sections = list(self._sections)
+
+        for i in sorted({0, n - 1}):
+            section, points = self.raked_end(i)
+            sections[i] = section
+            for name, p in points.items():
+                lines[name][i] = p
+
+        offset_data = {'lines': lines, 'sections': sections}
+        if self.angles:
+            offset_data['angle'] = self.angles
+
+        return offset_data
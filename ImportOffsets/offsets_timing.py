@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+"""
+Named stage timers and counters for the offsets pipeline. Timing is
+off by default and every call collapses to a dictionary lookup or a
+shared no-op context manager, so the hooks can stay in production code.
+"""
+
+__author__ = "Robert Marchese"
+__version__ = "0.1.0"
+__license__ = "MIT"
+
+import json
+import sys
+import time
+
+
+_enabled = False
+_stages = {}
+_counters = {}
+
+
+class _NullStage(object):
+    '''Context manager returned when timing is disabled'''
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage(object):
+    '''Accumulates the wall time spent inside a with block'''
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        entry = _stages.get(self.name)
+        if entry is None:
+            _stages[self.name] = [1, elapsed]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+        return False
+
+
+def enable(on=True):
+    '''Turn the timers and counters on (or off)'''
+    global _enabled
+    _enabled = bool(on)
+
+
+def enabled():
+    return _enabled
+
+
+def reset():
+    '''Forget everything recorded so far'''
+    _stages.clear()
+    _counters.clear()
+
+
+def stage(name):
+    '''Time a block of code: with stage('parse'): ...'''
+    if _enabled:
+        return _Stage(name)
+    return _NULL_STAGE
+
+
+def count(name, n=1):
+    '''Add n to the named counter'''
+    if _enabled:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def report():
+    '''Return the recorded stages and counters as a plain dictionary'''
+    stages = {}
+    for name, (calls, seconds) in _stages.items():
+        stages[name] = {'calls': calls, 'seconds': seconds}
+
+    return {'stages': stages, 'counters': dict(_counters)}
+
+
+def write_report(filename):
+    '''Write the report as JSON, use '-' for stdout'''
+    if filename == '-':
+        json.dump(report(), sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+    else:
+        with open(filename, 'w') as opf:
+            json.dump(report(), opf, indent=2, sort_keys=True)
+
+
+def run_profiled(func, filename, *args, **kwargs):
+    '''Call func under cProfile, dump the stats to filename and
+    return whatever func returned'''
+    import cProfile
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        profiler.dump_stats(filename)
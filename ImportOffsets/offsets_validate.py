@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+
+"""
+Checks an offsets table for the mistakes that otherwise show up as a
+traceback or a twisted model: missing or unordered stations, lines
+with widths but no heights, cells that are not numbers, feet-inches-
+eighths or 'x', and stations without enough points for a section.
+
+The geometry is checked as well: pairs of lines that cross between two
+stations, such as a chine running up above the gunwale, and section
+outlines that cross themselves. Both twist the sections and break the
+loft. The segments are swept in order of their lowest width so only
+those whose bounding boxes overlap are compared, which keeps the check
+quick on resampled hulls with thousands of stations.
+"""
+
+__author__ = "Robert Marchese"
+__version__ = "0.1.0"
+__license__ = "MIT"
+
+import argparse
+import collections
+import sys
+
+try:
+    from . import offsets_reader
+except ImportError:
+    import offsets_reader
+
+
+Problem = collections.namedtuple('Problem', 'level line station message')
+
+ERROR = 'error'
+WARNING = 'warning'
+
+# the range the Fusion 360 command accepts
+ANGLE_RANGE = (45.0, 135.0)
+
+
+def _missing(cell):
+    return cell in ('', 'x')
+
+
+def _sweep(boxes):
+    '''The pairs of keys of the (left, right, bottom, top, key) boxes
+    that overlap. The boxes are sorted on their left edge so each is
+    only compared with those still open when it starts'''
+    active = []
+    for box in sorted(boxes, key=lambda b: b[0]):
+        active = [a for a in active if a[1] >= box[0]]
+        for a in active:
+            if a[2] <= box[3] and box[2] <= a[3]:
+                yield a[4], box[4]
+        active.append(box)
+
+
+def _box(p, q, key):
+    return (min(p[0], q[0]), max(p[0], q[0]), min(p[1], q[1]),
+            max(p[1], q[1]), key)
+
+
+def _cross(p0, p1, q0, q1):
+    '''Whether the segments p0-p1 and q0-q1 cross away from their
+    ends'''
+    rx, ry = p1[0] - p0[0], p1[1] - p0[1]
+    sx, sy = q1[0] - q0[0], q1[1] - q0[1]
+    denom = rx * sy - ry * sx
+    if denom == 0:
+        return False
+    qx, qy = q0[0] - p0[0], q0[1] - p0[1]
+    t = (qx * sy - qy * sx) / denom
+    u = (qx * ry - qy * rx) / denom
+    return 0 < t < 1 and 0 < u < 1
+
+
+def _line_order(lines, line_order):
+    if line_order is None:
+        line_order = [name for name in lines if not name.startswith('_')]
+    return [name for name in line_order if name in lines]
+
+
+def line_crossings(lines, line_order=None):
+    '''Where pairs of lines cross between two stations, as (station,
+    line, other line, fraction of the way to the next station). Lines
+    cross when their heights and their widths both change places in the
+    same bay, so they meet on the hull. lines is from combine_offsets()
+    or offset_data['lines']'''
+    line_order = _line_order(lines, line_order)
+    rank = dict((name, k) for k, name in enumerate(line_order))
+    count = max([len(lines[name]) for name in line_order] or [0])
+    found = []
+    for i in range(count - 1):
+        boxes = []
+        for name in line_order:
+            points = lines[name][i:i + 2]
+            if len(points) == 2 and points[0] and points[1]:
+                boxes.append(_box(points[0], points[1], name))
+        hits = []
+        for a, b in _sweep(boxes):
+            if rank[a] > rank[b]:
+                a, b = b, a
+            p0, p1 = lines[a][i], lines[a][i + 1]
+            q0, q1 = lines[b][i], lines[b][i + 1]
+            dw0, dw1 = p0[0] - q0[0], p1[0] - q1[0]
+            dh0, dh1 = p0[1] - q0[1], p1[1] - q1[1]
+            if dw0 * dw1 < 0 and dh0 * dh1 < 0:
+                t = (dw0 / (dw0 - dw1) + dh0 / (dh0 - dh1)) / 2
+                hits.append((rank[a], rank[b], (i, a, b, t)))
+        found.extend(hit[2] for hit in sorted(hits))
+    return found
+
+
+def section_crossings(lines, line_order=None):
+    '''Where the outline of each section crosses itself, as (station,
+    edge, other edge), an edge being the names of the lines at its ends.
+    The outline runs down the lines in order, back up their mirror
+    image and across the top, so a line above the sheer crosses the
+    top, given as the top line twice'''
+    line_order = _line_order(lines, line_order)
+    count = max([len(lines[name]) for name in line_order] or [0])
+    found = []
+    for i in range(count):
+        side = [(name, lines[name][i]) for name in line_order
+                if i < len(lines[name]) and lines[name][i]]
+        outline = [(name, (p[0], p[1])) for name, p in side] + \
+            [(name, (-p[0], p[1])) for name, p in reversed(side)]
+        outline = [v for k, v in enumerate(outline)
+                   if k == 0 or v[1] != outline[k - 1][1]]
+        if len(outline) > 1 and outline[-1][1] == outline[0][1]:
+            outline.pop()
+        n = len(outline)
+        if n < 4:
+            continue
+
+        edges = [(outline[k], outline[(k + 1) % n]) for k in range(n)]
+        boxes = [_box(a[1], b[1], k) for k, (a, b) in enumerate(edges)]
+        seen = set()
+        for j, k in _sweep(boxes):
+            if abs(j - k) in (1, n - 1):
+                continue
+            (a, b), (c, d) = edges[j], edges[k]
+            if not _cross(a[1], b[1], c[1], d[1]):
+                continue
+            pair = tuple(sorted([tuple(sorted((a[0], b[0]))),
+                                 tuple(sorted((c[0], d[0])))]))
+            if pair not in seen:
+                seen.add(pair)
+                found.append((i, (a[0], b[0]), (c[0], d[0])))
+    return found
+
+
+def _edge(names):
+    if names[0] == names[1]:
+        return 'the {0} across the centerline'.format(names[0])
+    return '{0}-{1}'.format(*names)
+
+
+def _label(labels, i):
+    '''The name of station i, its column index when the table has none'''
+    if labels and i < len(labels) and labels[i]:
+        return labels[i]
+    return str(i)
+
+
+def check_geometry(lines, line_order=None, labels=None):
+    '''Check the lines for crossings. Returns a list of Problems, lines
+    that meet are warnings as tables of waterlines and buttocks meet by
+    design, sections that cross themselves are errors. labels are the
+    station names'''
+    problems = []
+    for i, a, b, t in line_crossings(lines, line_order):
+        problems.append(Problem(WARNING, a, _label(labels, i),
+                                'crosses {0} {1:.0%} of the way to station '
+                                '{2}'.format(b, t, _label(labels, i + 1))))
+    for i, edge, other in section_crossings(lines, line_order):
+        problems.append(Problem(ERROR, None, _label(labels, i),
+                                'section crosses itself, {0} and {1}'.format(
+                                    _edge(edge), _edge(other))))
+    return problems
+
+
+def check_table(table, labels=None):
+    '''Check a table cleaned up by munge_table(). labels are the station
+    names from the header row, read from the table when not given.
+    Returns a list of Problems, station is the name of the station (its
+    column index when the table has no header) or None when the problem
+    is not at one station'''
+    problems = []
+    if labels is None:
+        labels = offsets_reader.station_labels(table)
+
+    def report(level, line, i, message):
+        problems.append(Problem(level, line, None if i is None else
+                                _label(labels, i), message))
+
+    lengths = offsets_reader.get_all_axis(table, 'length')
+    if 'station' not in lengths:
+        report(ERROR, None, None, "no 'length, station' row")
+        return problems
+    stations = lengths['station']
+    while stations and _missing(stations[-1]):
+        stations = stations[:-1]
+    n = len(stations)
+
+    for i, z in enumerate(stations):
+        if not isinstance(z, float):
+            report(ERROR, 'station', i, 'station is not a number: {0!r}'
+                   .format(z))
+    zs = [z for z in stations if isinstance(z, float)]
+    steps = [z1 - z0 for z0, z1 in zip(zs, zs[1:])]
+    if any(s == 0 for s in steps):
+        report(ERROR, 'station', None, 'repeated station position')
+    elif steps and not (all(s > 0 for s in steps) or
+                        all(s < 0 for s in steps)):
+        report(ERROR, 'station', None, 'stations are not in order')
+
+    widths = offsets_reader.get_all_axis(table, 'width')
+    heights = offsets_reader.get_all_axis(table, 'height')
+    for name in widths:
+        if name not in heights:
+            report(ERROR, name, None, 'widths but no heights')
+    for name in heights:
+        if name not in widths:
+            report(WARNING, name, None, 'heights but no widths, ignored')
+
+    for axis, rows in (('width', widths), ('height', heights)):
+        for name, cells in rows.items():
+            used = cells[:n]
+            while len(cells) > n and _missing(cells[-1]):
+                cells = cells[:-1]
+            if len(cells) != n:
+                report(WARNING, name, None, '{0} {1} cells for {2} stations'
+                       .format(len(cells), axis, n))
+            for i, cell in enumerate(used):
+                if isinstance(cell, float):
+                    if axis == 'width' and cell < 0:
+                        report(WARNING, name, i, 'negative width')
+                elif not _missing(cell):
+                    report(ERROR, name, i, '{0} is not a number: {1!r}'
+                           .format(axis, cell))
+
+    angles = offsets_reader.get_all_axis(table, 'angle').get('')
+    if angles:
+        for i, a in enumerate(angles[:n]):
+            if not isinstance(a, float):
+                if not _missing(a):
+                    report(ERROR, 'angle', i, 'angle is not a number: {0!r}'
+                           .format(a))
+            elif not ANGLE_RANGE[0] <= a <= ANGLE_RANGE[1]:
+                report(WARNING, 'angle', i, 'angle {0} is outside {1}-{2}'
+                       .format(a, *ANGLE_RANGE))
+
+    if not any(p.level == ERROR for p in problems):
+        lines, line_order, _ = offsets_reader.combine_offsets(table)
+        for i in range(n):
+            points = [lines[name][i] for name in line_order
+                      if name in lines and i < len(lines[name])]
+            if sum(1 for p in points if p) < 2:
+                report(ERROR, None, i, 'fewer than two points in the section')
+        problems.extend(check_geometry(lines, line_order, labels))
+
+    return problems
+
+
+def validate(filename):
+    '''Check the table in a csv file'''
+    raw_table = offsets_reader.read_rows(filename)
+    return check_table(offsets_reader.munge_table(raw_table),
+                       offsets_reader.station_labels(raw_table))
+
+
+def format_problem(filename, problem):
+    where = [filename]
+    if problem.line is not None:
+        where.append(str(problem.line))
+    if problem.station is not None:
+        where.append('station {0}'.format(problem.station))
+    return '{0}: {1}: {2}'.format(', '.join(where), problem.level,
+                                  problem.message)
+
+
+def main(filenames, stream=sys.stdout):
+    '''Print the problems in each table, returns 1 if any had errors'''
+    status = 0
+    for filename in filenames:
+        problems = validate(filename)
+        for problem in problems:
+            stream.write(format_problem(filename, problem) + '\n')
+        if any(p.level == ERROR for p in problems):
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    ''' This is executed when run from the command line '''
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("filenames", nargs='+',
+                        help="input .csv files (offset tables)")
+
+    parser.add_argument(
+        "--version",
+        action="version",
+        version="%(prog)s (version {version})".format(version=__version__))
+
+    args = parser.parse_args()
+    sys.exit(main(args.filenames))
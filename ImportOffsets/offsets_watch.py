@@ -0,0 +1,460 @@
+# -*- coding: utf-8 -*-
+
+"""
+Watches offset tables and regenerates their outputs (JSON, OpenSCAD
+and STL) whenever they are saved. Each new parse is compared with the
+cached one cell by cell and only the lines, sections and output pieces
+touched by the changed cells are rebuilt. Outputs are replaced
+atomically so a viewer never loads a half-written file.
+"""
+
+__author__ = "Robert Marchese"
+__version__ = "0.1.0"
+__license__ = "MIT"
+
+import argparse
+import csv
+import json
+import logging
+import os
+import time
+import traceback
+
+try:
+    from . import offsets_mesh
+    from . import offsets_reader
+    from . import offsets_scad
+    from . import offsets_timing as timing
+    from . import offsets_writer
+    from .offsets_writer import atomic_write
+except ImportError:
+    import offsets_mesh
+    import offsets_reader
+    import offsets_scad
+    import offsets_timing as timing
+    import offsets_writer
+    from offsets_writer import atomic_write
+
+
+logger = logging.getLogger('offsets watch')
+
+OUTPUTS = ('json', 'scad', 'stl')
+PROFILE_LINES = ('_upper_cl', '_lower_cl')
+
+
+def diff_lines(old, new):
+    '''Compare two parsed tables (the lines from parse_csv_offsets()).
+    Returns the set of changed station indices and the set of changed
+    line names, or None if the shape of the table changed'''
+    if old is None or list(old) != list(new):
+        return None
+
+    stations = set()
+    names = set()
+    for name, points in new.items():
+        old_points = old[name]
+        if len(old_points) != len(points):
+            return None
+        if old_points != points:
+            names.add(name)
+            stations.update(i for i, (p0, p1) in
+                            enumerate(zip(old_points, points)) if p0 != p1)
+
+    return stations, names
+
+
+class HullState(object):
+    '''The cached parse of one offsets table and the pieces of each
+    output generated from it'''
+
+    def __init__(self, filename, bow_angle=90, transom_angle=90,
+                 outputs=OUTPUTS, half_hull=True, precision=None):
+        self.filename = filename
+        self.bow_angle = bow_angle
+        self.transom_angle = transom_angle
+        self.outputs = tuple(outputs)
+        self.half_hull = half_hull
+        self.quantize = offsets_writer.quantizer(precision)
+
+        # the csv rows, the cleaned up table and where each line is in it
+        self.raw = None
+        self.table = None
+        self.widths = {}
+        self.heights = {}
+        self.stations = []
+        self.patchable = {}
+
+        self.lines = None
+        self.line_order = []
+        self.angles = None
+        self.sections = []
+        self.upper = []
+        self.lower = []
+        self.offset_data = None
+
+        # output pieces, rebuilt only where something changed
+        self.json_lines = {}
+        self.json_sections = []
+        self.rings = []
+        self.scad_sections = []
+        self.scad_lines = {}
+        self.scad_stitches = []
+        self.stl_strips = []
+        self.stl_caps = [b'', b'']
+
+    def out_filename(self, ext):
+        base, _ = os.path.splitext(self.filename)
+        return base + '.' + ext
+
+    def update(self):
+        '''Re-read the table and bring the outputs up to date. Returns
+        the number of stations that were regenerated'''
+        with timing.stage('watch_read'):
+            with open(self.filename, 'r') as csvfile:
+                raw = list(csv.reader(csvfile, delimiter=',', quotechar='"'))
+
+        # Edits to the offsets themselves are patched in cell by cell,
+        # anything else (stations, names, angles) is a full parse
+        with timing.stage('watch_patch'):
+            changes = self._patch_cells(raw)
+        if changes is None:
+            with timing.stage('watch_parse'):
+                changes = self._parse(raw)
+        stations, names, full = changes
+        if not stations and not full:
+            return 0
+
+        lines = self.lines
+        n = len(next(iter(lines.values()), []))
+
+        with timing.stage('watch_sections'):
+            self._update_sections(stations, n, full)
+        with timing.stage('watch_rake'):
+            self._rake()
+        if 'scad' in self.outputs or 'stl' in self.outputs:
+            self._update_rings(stations, full)
+
+        # the raked end stations move every line at those stations
+        names = set(names)
+        names.update(PROFILE_LINES)
+        if 0 in stations or n - 1 in stations:
+            names.update(self.offset_data['lines'])
+
+        for output in self.outputs:
+            with timing.stage('watch_' + output):
+                getattr(self, '_update_' + output)(stations, names, full)
+
+        timing.count('watch_stations', len(stations))
+        return len(stations)
+
+    def _parse(self, raw):
+        '''Parse the whole table, then find what changed since the
+        last parse'''
+        table = offsets_reader.munge_table(raw)
+        lines, line_order, angles = offsets_reader.combine_offsets(table)
+
+        changes = diff_lines(self.lines, lines)
+        if changes is None or line_order != self.line_order:
+            stations = set(range(len(next(iter(lines.values()), []))))
+            names = set(lines)
+            full = True
+        else:
+            stations, names = changes
+            full = False
+
+        n = len(next(iter(lines.values()), []))
+        if angles != self.angles:
+            stations.update({0, n - 1})
+
+        self.raw = raw
+        self.table = table
+        self.lines = lines
+        self.line_order = line_order
+        self.angles = angles
+        self._index_rows()
+
+        return stations, names, full
+
+    def _index_rows(self):
+        '''Remember which csv row holds the widths and heights of each
+        line, the same rows combine_offsets() picked'''
+        table_rows = [i for i, r in enumerate(self.raw)
+                      if not r[0].startswith('#')]
+        widths = {}
+        heights = {}
+        for ti, row in enumerate(self.table):
+            if 'width' in row[0]:
+                widths[row[1]] = ti
+            if 'height' in row[0]:
+                heights[row[1]] = ti
+            if 'length' in row[0] and row[1] == 'station':
+                self.stations = [float(zs) for zs in row[2:]]
+
+        self.widths = widths
+        self.heights = heights
+        self.patchable = {}
+        for name in self.lines:
+            for ti in (widths[name], heights[name]):
+                self.patchable[table_rows[ti]] = (ti, name)
+
+    def _patch_cells(self, raw):
+        '''Apply the changed width and height cells to the cached table
+        and lines. Returns None if something other than those cells
+        changed'''
+        if self.lines is None or len(raw) != len(self.raw):
+            return None
+
+        edits = []
+        for r, (old, new) in enumerate(zip(self.raw, raw)):
+            if old == new:
+                continue
+            if (r not in self.patchable or len(old) != len(new) or
+                    old[:2] != new[:2]):
+                return None
+            ti, name = self.patchable[r]
+            edits.extend((r, ti, name, c) for c in range(2, len(new))
+                         if old[c] != new[c])
+
+        stations = set()
+        names = set()
+        for r, ti, name, c in edits:
+            self.table[ti][c] = offsets_reader.fie_to_di(
+                offsets_reader.try_float(raw[r][c].lower()))
+
+            i = c - 2
+            point = (self.table[self.widths[name]][c],
+                     self.table[self.heights[name]][c], self.stations[i])
+            if not offsets_reader.is_valid(point):
+                point = []
+            if point != self.lines[name][i]:
+                self.lines[name][i] = point
+                stations.add(i)
+                names.add(name)
+
+        self.raw = raw
+        timing.count('watch_cells', len(edits))
+        return stations, names, False
+
+    def _update_sections(self, stations, n, full):
+        if full:
+            self.sections = [None] * n
+            self.upper = [None] * n
+            self.lower = [None] * n
+        for i in stations:
+            self.sections[i], self.upper[i], self.lower[i] = \
+                offsets_reader.section_at(self.lines, self.line_order, i)
+
+    def _rake(self):
+        '''Rake the ends of shallow copies of the cached lists, so the
+        cache itself keeps the unrotated points'''
+        lines = {name: list(points) for name, points in self.lines.items()}
+        lines['_upper_cl'] = list(self.upper)
+        lines['_lower_cl'] = list(self.lower)
+        offset_data = {'lines': lines, 'sections': list(self.sections)}
+        if self.angles:
+            offset_data['angle'] = self.angles
+
+        self.offset_data = offsets_reader.rake_ends(
+            offset_data, self.bow_angle, self.transom_angle)
+
+    def _update_json(self, stations, names, full):
+        offset_data = self.offset_data
+        n = len(offset_data['sections'])
+        if full:
+            self.json_lines = {}
+            self.json_sections = [None] * n
+        for name in names:
+            self.json_lines[name] = json.dumps(
+                self.quantize(offset_data['lines'][name]))
+        for i in stations:
+            self.json_sections[i] = json.dumps(
+                self.quantize(offset_data['sections'][i]))
+
+        # Same bytes as offsets_writer.write_json(offset_data)
+        out = offsets_writer.document_chunks(
+            ((name, self.json_lines[name]) for name in offset_data['lines']),
+            self.json_sections, offset_data.get('angle'))
+
+        self._write(self.out_filename('json'), ''.join(out))
+
+    def _update_rings(self, stations, full):
+        n = len(self.offset_data['sections'])
+        if full or len(self.rings) != n:
+            self.rings = [None] * n
+            stations = range(n)
+        for i in stations:
+            self.rings[i] = offsets_mesh.closed_section(
+                self.offset_data['sections'][i])
+
+    @staticmethod
+    def _pairs(stations, n):
+        '''Strips between neighbouring sections touched by stations'''
+        pairs = set()
+        for i in stations:
+            if i > 0:
+                pairs.add(i - 1)
+            if i < n - 1:
+                pairs.add(i)
+        return pairs
+
+    def _update_scad(self, stations, names, full):
+        rings = self.rings
+        n = len(rings)
+        if full:
+            self.scad_sections = [None] * n
+            self.scad_lines = {}
+            self.scad_stitches = [None] * (n - 1)
+        for i in stations:
+            self.scad_sections[i] = offsets_scad.section_text(i, rings[i])
+        for i in self._pairs(stations, n):
+            self.scad_stitches[i] = offsets_scad.stitch_text(
+                i, rings[i], rings[i + 1])
+        for name in names:
+            self.scad_lines[name] = offsets_scad.line_text(
+                name, self.offset_data['lines'][name])
+
+        text = offsets_scad.scad_text(
+            self.scad_sections,
+            [self.scad_lines[name] for name in self.offset_data['lines']],
+            self.scad_stitches, os.path.basename(self.filename),
+            self.half_hull)
+        self._write(self.out_filename('scad'), text)
+
+    def _update_stl(self, stations, names, full):
+        rings = self.rings
+        n = len(rings)
+        if full:
+            self.stl_strips = [None] * (n - 1)
+
+        def pack(triangles):
+            if not self.half_hull:
+                triangles = triangles + offsets_mesh.mirror_triangles(triangles)
+            return (len(triangles),
+                    offsets_mesh.pack_triangles(triangles))
+
+        for i in self._pairs(stations, n):
+            self.stl_strips[i] = pack(
+                offsets_mesh.strip_triangles(rings[i], rings[i + 1]))
+
+        ascending = (offsets_mesh.mean_z(rings[0]) <=
+                     offsets_mesh.mean_z(rings[-1]))
+        if full or 0 in stations:
+            self.stl_caps[0] = pack(
+                offsets_mesh.cap_triangles(rings[0], ascending))
+        if full or n - 1 in stations:
+            self.stl_caps[1] = pack(
+                offsets_mesh.cap_triangles(rings[-1], not ascending))
+
+        pieces = [self.stl_caps[0]] + self.stl_strips + [self.stl_caps[1]]
+        count = sum(c for c, data in pieces)
+        self._write(self.out_filename('stl'),
+                    b''.join([offsets_mesh.stl_header(count)] +
+                             [data for c, data in pieces]), 'wb')
+
+    def _write(self, filename, data, mode='w'):
+        with atomic_write(filename, mode) as opf:
+            opf.write(data)
+        timing.count('bytes_written', len(data))
+        logger.info('wrote {0}'.format(filename))
+
+
+def file_signature(filename):
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def watch(filenames, interval=0.25, bow_angle=90, transom_angle=90,
+          outputs=OUTPUTS, half_hull=True, once=False, precision=None):
+    '''Build the outputs for each table, then poll the tables and
+    update the outputs when they change. A change is only processed
+    once the file has stopped changing for one poll interval, so a
+    spreadsheet that is still saving is not parsed half written'''
+    states = {}
+    seen = {}
+    for filename in filenames:
+        states[filename] = HullState(filename, bow_angle, transom_angle,
+                                     outputs, half_hull, precision)
+        seen[filename] = file_signature(filename)
+        _update(states[filename])
+
+    pending = {}
+    while not once:
+        time.sleep(interval)
+        for filename, state in states.items():
+            sig = file_signature(filename)
+            if sig is None or sig == seen[filename]:
+                pending.pop(filename, None)
+                continue
+            if pending.get(filename) != sig:
+                pending[filename] = sig
+                continue
+            del pending[filename]
+            seen[filename] = sig
+            _update(state)
+
+    return states
+
+
+def _update(state):
+    start = time.perf_counter()
+    try:
+        count = state.update()
+    except Exception:
+        logger.error('could not update {0}\n{1}'.format(
+            state.filename, traceback.format_exc()))
+        return
+    logger.info('{0}: {1} stations regenerated in {2:.1f} ms'.format(
+        state.filename, count, 1000.0 * (time.perf_counter() - start)))
+
+
+if __name__ == "__main__":
+    ''' This is executed when run from the command line '''
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument("filenames", nargs='+',
+                        help="input .csv files (offset tables)")
+
+    parser.add_argument("-b", "--bow", action="store",
+                        dest="bow_angle", default=90,
+                        help="Angle of the bow measured from the baseline ")
+
+    parser.add_argument("-t", "--transom", action="store",
+                        dest="transom_angle", default=90,
+                        help="Angle of the transom measured from the baseline")
+
+    parser.add_argument("-i", "--interval", action="store", type=float,
+                        dest="interval", default=0.25,
+                        help="seconds between checks for changes")
+
+    parser.add_argument("-o", "--outputs", action="store", dest="outputs",
+                        default=','.join(OUTPUTS),
+                        help="comma separated list of outputs to write "
+                             "(json, scad, stl)")
+
+    parser.add_argument("--full", action="store_true", default=False,
+                        help="mirror the outputs into a full hull")
+
+    parser.add_argument("-p", "--precision", action="store",
+                        dest="precision", default=None,
+                        help="round the JSON coordinates to this resolution "
+                             "(eg. 1/64 or 0.01)")
+
+    parser.add_argument(
+        "--version",
+        action="version",
+        version="%(prog)s (version {version})".format(version=__version__))
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO,
+                        format='%(levelname)s - %(message)s')
+    logging.getLogger('offsets reader').setLevel(logging.WARNING)
+
+    try:
+        watch(args.filenames, args.interval, args.bow_angle,
+              args.transom_angle, args.outputs.split(','), not args.full,
+              precision=offsets_writer.parse_precision(args.precision))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+
+"""
+Helpers for writing the files generated from an offsets table.
+
+The JSON output is written a line and a section at a time rather than
+building the whole text in memory. Coordinates can be rounded to a
+resolution (1/64 inch, 0.01 mm) which makes the files several times
+smaller. With no resolution the text is the same as json.dump() writes.
+
+Lines can also be written back out as an offsets table in the csv
+layout parse_csv_offsets() reads. In decimal inches the table reads
+back as exactly the same lines, in feet-inches-eighths the offsets are
+rounded to the nearest eighth.
+"""
+
+__author__ = "Robert Marchese"
+__version__ = "0.1.0"
+__license__ = "MIT"
+
+import contextlib
+import csv
+import json
+import math
+import os
+
+# orjson, fractions and tempfile are imported when first used, they
+# are slow to import for a command that converts one small table
+orjson = None
+
+BACKENDS = ('json', 'orjson', 'auto')
+
+
+@contextlib.contextmanager
+def atomic_write(filename, mode='w'):
+    '''Open a temporary file next to filename for writing and move it
+    into place when the block finishes, so readers only ever see the
+    old file or the complete new one. Nothing is replaced if the block
+    raises'''
+    import tempfile
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp_name = tempfile.mkstemp(
+        prefix='.' + os.path.basename(filename) + '.', dir=directory)
+    try:
+        with os.fdopen(fd, mode) as opf:
+            yield opf
+            opf.flush()
+            os.fsync(opf.fileno())
+
+        # mkstemp makes the file private, keep the old file's permissions
+        if os.path.exists(filename):
+            os.chmod(tmp_name, os.stat(filename).st_mode & 0o7777)
+        else:
+            os.chmod(tmp_name, 0o644)
+        os.replace(tmp_name, filename)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.remove(tmp_name)
+        raise
+
+
+def parse_precision(text):
+    '''The resolution given on the command line as a decimal (0.01) or
+    a fraction (1/64). None or 0 means full precision'''
+    if text is None:
+        return None
+    from fractions import Fraction
+    step = float(Fraction(str(text)))
+    if step < 0:
+        raise ValueError('precision must be positive: {0}'.format(text))
+    return step or None
+
+
+def decimals(precision):
+    '''The number of decimal places that resolve precision: 1/64 and
+    0.01 both need 2'''
+    return max(0, int(math.ceil(-math.log10(precision) - 1e-9)))
+
+
+def quantizer(precision=None):
+    '''A function rounding the coordinates of a list of points to the
+    decimal places needed for precision, so 12.015625 is written as
+    12.02 for 1/64. Missing points ([]) are left alone'''
+    if not precision:
+        return lambda points: points
+
+    # dividing by a power of ten gives the shortest repr, 12.34 rather
+    # than 12.340000000000002
+    scale = 10.0 ** decimals(precision)
+    return lambda points: [[round(c * scale) / scale for c in p]
+                           for p in points]
+
+
+def resolve_backend(backend='json'):
+    '''The name of the JSON encoder to use, 'auto' picks orjson when it
+    is installed'''
+    global orjson
+    if backend not in BACKENDS:
+        raise ValueError('unknown JSON backend: {0}'.format(backend))
+    if backend == 'json':
+        return backend
+    if orjson is None:
+        try:
+            import orjson
+        except ImportError:
+            pass
+    if backend == 'auto':
+        backend = 'orjson' if orjson else 'json'
+    if backend == 'orjson' and orjson is None:
+        raise ValueError('the orjson backend is not installed')
+    return backend
+
+
+def document_chunks(lines, sections, angle=None, extra=None):
+    '''Assemble the JSON texts of each line ((name, text) pairs) and
+    each section into a document the same way json.dump() lays out
+    offset_data. extra holds optional blocks, such as the area curve,
+    added after the angles'''
+    yield '{"lines": {'
+    for k, (name, text) in enumerate(lines):
+        yield '{0}{1}: {2}'.format(', ' if k else '', json.dumps(name), text)
+    yield '}, "sections": ['
+    for k, text in enumerate(sections):
+        yield ', ' + text if k else text
+    yield ']'
+    if angle is not None:
+        yield ', "angle": ' + json.dumps(angle)
+    for key, value in (extra or {}).items():
+        yield ', {0}: {1}'.format(json.dumps(key), json.dumps(value))
+    yield '}'
+
+
+# blocks written after the lines and sections when offset_data has them
+OPTIONAL = ('area_curve',)
+
+
+def json_chunks(offset_data, precision=None):
+    '''Yield the JSON text of offset_data a line and a section at a
+    time'''
+    quantize = quantizer(precision)
+    lines = ((name, json.dumps(quantize(points)))
+             for name, points in offset_data['lines'].items())
+    sections = (json.dumps(quantize(s)) for s in offset_data['sections'])
+    extra = dict((key, offset_data[key]) for key in OPTIONAL
+                 if key in offset_data)
+    return document_chunks(lines, sections, offset_data.get('angle'), extra)
+
+
+def write_json(opf, offset_data, precision=None, backend='json'):
+    '''Write offset_data to an open text file. The orjson backend is
+    faster but leaves out the spaces after separators, the file loads
+    the same either way'''
+    if resolve_backend(backend) == 'orjson':
+        quantize = quantizer(precision)
+        data = {'lines': {name: quantize(points) for name, points in
+                          offset_data['lines'].items()},
+                'sections': [quantize(s) for s in offset_data['sections']]}
+        for key in ('angle',) + OPTIONAL:
+            if key in offset_data:
+                data[key] = offset_data[key]
+        opf.write(orjson.dumps(data).decode('utf-8'))
+        return
+
+    for chunk in json_chunks(offset_data, precision):
+        opf.write(chunk)
+
+
+def export_json(offset_data, filename, precision=None, backend='json'):
+    with open(filename, 'w') as opf:
+        write_json(opf, offset_data, precision, backend)
+
+
+# written for a missing offset
+MISSING = 'x'
+
+
+def fie(d):
+    '''Decimal inches as feet-inches-eighths rounded to the nearest
+    eighth. Negative offsets are written as decimal inches (of the
+    rounded value) since fie_to_di() only reads positive dimensions'''
+    eighths = int(round(d * 8.0))
+    if eighths < 0:
+        return repr(eighths / 8.0)
+    inches, eighth = divmod(eighths, 8)
+    feet, inches = divmod(inches, 12)
+
+    return '{0}-{1}-{2}'.format(feet, inches, eighth)
+
+
+def cell_formatter(units='decimal', digits=None):
+    '''A function formatting one offset for the table. Decimal with no
+    digits writes the shortest text that reads back as the same float'''
+    if units == 'fie':
+        return fie
+    if units != 'decimal':
+        raise ValueError("units must be 'decimal' or 'fie'")
+    if digits is None:
+        return repr
+    return ('{0:.' + str(int(digits)) + 'f}').format
+
+
+def format_cells(values, fmt):
+    '''Format a row of offsets, anything that is not a number (None,
+    'x', '') is written as missing'''
+    return [fmt(v) if isinstance(v, (float, int)) else MISSING
+            for v in values]
+
+
+def offsets_rows(stations, heights, widths, angles=None, units='decimal',
+                 digits=None, labels=None):
+    '''The csv rows of an offsets table. heights and widths are lists
+    of (line name, [value per station]) in the order the lines should
+    appear, labels are the station names in the header (default 0, 1,
+    2...). Angles are always written in decimal degrees'''
+    fmt = cell_formatter(units, digits)
+    labels = [labels[i] if labels and i < len(labels) and labels[i]
+              else str(i) for i in range(len(stations))]
+
+    rows = [['axis', 'name'] + labels]
+    rows.append(['length', 'station'] + format_cells(stations, fmt))
+    for axis, values in (('height', heights), ('width', widths)):
+        for j, (name, cells) in enumerate(values):
+            rows.append([axis if j == 0 else '', name] +
+                        format_cells(cells, fmt))
+    if angles:
+        rows.append(['angle', ''] + format_cells(
+            angles, cell_formatter('decimal', digits)))
+
+    return rows
+
+
+def line_stations(lines):
+    '''The station positions, from the z of the points on each line'''
+    n = max(len(points) for points in lines.values())
+    stations = [None] * n
+    for points in lines.values():
+        for i, p in enumerate(points):
+            if p and stations[i] is None:
+                stations[i] = p[2]
+    if None in stations:
+        raise ValueError('no line has a point at station {0}, give the '
+                         'stations'.format(stations.index(None)))
+
+    return stations
+
+
+def lines_rows(lines, line_order=None, angles=None, stations=None,
+               units='decimal', digits=None, labels=None):
+    '''The csv rows of the table for lines of (x, y, z) points, [] where
+    missing, as made by combine_offsets(). This is the reverse of
+    parse_csv_offsets()'''
+    names = [name for name in line_order or [] if name in lines]
+    names.extend(name for name in lines if name not in names)
+    if stations is None:
+        stations = line_stations(lines)
+
+    heights = [(name, [p[1] if p else None for p in lines[name]])
+               for name in names]
+    widths = [(name, [p[0] if p else None for p in lines[name]])
+              for name in names]
+
+    return offsets_rows(stations, heights, widths, angles, units, digits,
+                        labels)
+
+
+def write_rows(opf, rows):
+    '''Write csv rows to a file opened with newline='''''
+    csv.writer(opf).writerows(rows)
+
+
+def export_table(lines, filename, line_order=None, angles=None,
+                 stations=None, units='decimal', digits=None, labels=None):
+    '''Write lines as an offsets table that parse_csv_offsets() reads'''
+    with open(filename, 'w', newline='') as opf:
+        write_rows(opf, lines_rows(lines, line_order, angles, stations,
+                                   units, digits, labels))
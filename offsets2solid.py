@@ -9,25 +9,34 @@ __version__ = "0.1.0"
 __license__ = "MIT"
 
 import argparse
-import json
 import logging
 import os
 import pandas as pd
 import sys
 from math import isnan, radians, sin, cos
 
-# Setup Logging
+# Share the stage timers with the Fusion 360 scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                'ImportOffsets'))
+import offsets_timing as timing
+import offsets_writer
+
+# Setup Logging, the handlers are added in __main__ so importing the
+# module does not create a log file
 logger = logging.getLogger('offsets')
-logger.setLevel(logging.DEBUG)
-fh = logging.FileHandler('offsets2solid.log')
-fh.setLevel(logging.DEBUG)
-ch = logging.StreamHandler()
-ch.setLevel(logging.DEBUG) #change to ERROR or WARNING after deplot
-log_fmt = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-fh.setFormatter(log_fmt)
-ch.setFormatter(log_fmt)
-logger.addHandler(fh)
-logger.addHandler(ch)
+
+
+def setup_logging(filename='offsets2solid.log'):
+    logger.setLevel(logging.DEBUG)
+    fh = logging.FileHandler(filename)
+    fh.setLevel(logging.DEBUG)
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.DEBUG) #change to ERROR or WARNING after deplot
+    log_fmt = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    fh.setFormatter(log_fmt)
+    ch.setFormatter(log_fmt)
+    logger.addHandler(fh)
+    logger.addHandler(ch)
 
 
 def fie_to_di(d):
@@ -51,6 +60,11 @@ def generate_sections(lt):
     (x, y, z) = (width, height length). Returns each as a list
     contained in a dictionary'''
 
+    with timing.stage('generate_sections'):
+        return _generate_sections(lt)
+
+
+def _generate_sections(lt):
     sections = []
     line_order = ['coaming', 'gunwale', 'sheer', 'chine', 'bottom', 'skeg']
     for index, r in lt.iterrows():
@@ -66,6 +80,7 @@ def generate_sections(lt):
         first = [0, xc[0][1], xc[0][2]]
         last = [0, xc[-1][1], xc[-1][2]]
         xc = [first] + xc + [last]
+        timing.count('section_points', len(xc))
 
         sections.append(xc)
 
@@ -123,8 +138,15 @@ def remove_invalid(plist, replace=None):
 def load_offsets(filename):
     ''' load a table of offsets and convert seperate rows into columns
     of points (width, height, length) representing each line '''
-    ot = pd.read_csv(filename)
-    ot = ot.fillna('')
+    with timing.stage('read_csv'):
+        ot = pd.read_csv(filename)
+        ot = ot.fillna('')
+
+    with timing.stage('munge'):
+        return _munge_offsets(ot)
+
+
+def _munge_offsets(ot):
 
     logger.debug('before munging\n' + str(ot))
 
@@ -153,6 +175,7 @@ def load_offsets(filename):
         y = ot_heights[col]
         z = ot_lengths['station'].astype('float')
         ot_combined[col] = list(zip(x, y, z))
+        timing.count('points', len(z))
 
     logger.debug('Organized in to NxM of (x,y,z)\n' + str(ot_combined))
 
@@ -181,11 +204,17 @@ def rotate_point(cy, cz, angle, p):
 
 # TODO: Move this operation to F360 scripts
 def rake_angle(offsets, st_index, angle):
+    with timing.stage('rake_angle'):
+        return _rake_angle(offsets, st_index, angle)
+
+
+def _rake_angle(offsets, st_index, angle):
     xc_original = offsets['sections'][st_index]
     logger.debug("original section " + str(st_index) + " points\n" + str(xc_original))
 
-    # Angle is givent in degrees from the baseline
-    angle = radians(angle - 90)
+    # The rotation in degrees, 90 - the angle from the baseline, the
+    # same as offsets_reader.rake_angle()
+    angle = radians(angle)
 
     # Assume angle taken at top of section
     y0 = xc_original[0][1]
@@ -222,15 +251,20 @@ def main(args):
     # Apply optional rake angles at bow and transom
     # TODO: Move this operation to F360 scripts
     bindex = 0
-    offset_data = rake_angle(offset_data, bindex, args.bow_angle)
+    offset_data = rake_angle(offset_data, bindex, 90 - float(args.bow_angle))
     tindex = len(offset_data['sections']) - 1
-    offset_data = rake_angle(offset_data, tindex, args.transom_angle)
+    offset_data = rake_angle(offset_data, tindex,
+                             90 - float(args.transom_angle))
 
     out_filename, _ = os.path.splitext(args.filename)
     out_filename = out_filename + '.json'
-    logger.debug('writing json data:\n' + json.dumps(offset_data))
-    with open(out_filename, 'w') as opf:
-        json.dump(offset_data, opf)
+    with timing.stage('serialize'):
+        with open(out_filename, 'w') as opf:
+            offsets_writer.write_json(opf, offset_data, args.precision,
+                                      args.backend)
+            timing.count('bytes_written', opf.tell())
+    logger.debug('wrote {0} lines and {1} sections to {2}'.format(
+        len(offset_data['lines']), len(offset_data['sections']), out_filename))
 
 
 if __name__ == '__main__':
@@ -254,6 +288,22 @@ if __name__ == '__main__':
         dest="transom_angle", default=90,
         help="Angle of the transom measured from the baseline")
 
+    # JSON output
+    parser.add_argument("-p", "--precision", action="store",
+        dest="precision", default=None, type=offsets_writer.parse_precision,
+        help="round the coordinates to this resolution (eg. 1/64 or 0.01)")
+
+    parser.add_argument("--backend", action="store", dest="backend",
+        default='json', choices=offsets_writer.BACKENDS,
+        help="JSON encoder, orjson is faster when installed (default json)")
+
+    # Optional timing report and profiler output
+    parser.add_argument("--timing", action="store", dest="timing",
+        help="write a JSON timing report to this file ('-' for stdout)")
+
+    parser.add_argument("--profile", action="store", dest="profile",
+        help="write cProfile stats to this file (implies --timing)")
+
     # Optional verbosity counter (eg. -v, -vv, -vvv, etc.)
     #parser.add_argument(
     #    "-v",
@@ -269,7 +319,19 @@ if __name__ == '__main__':
         version="%(prog)s (version {version})".format(version=__version__))
 
     args = parser.parse_args()
-    main(args)
+    setup_logging()
+
+    if args.profile and not args.timing:
+        args.timing = args.profile + '.json'
+    timing.enable(bool(args.timing))
+
+    if args.profile:
+        timing.run_profiled(main, args.profile, args)
+    else:
+        main(args)
+
+    if args.timing:
+        timing.write_report(args.timing)
 
 
 
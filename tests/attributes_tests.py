@@ -0,0 +1,114 @@
+'''
+A hull saved in the design attributes must come back as it was read
+from the table, with the settings it was drawn with
+'''
+
+import base64
+import collections
+import json
+import os
+import zlib
+
+import pytest
+
+import offsets_attributes
+import offsets_batch
+import offsets_reader
+
+TESTDATA = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        os.pardir, 'testdata')
+
+Attribute = collections.namedtuple('Attribute', 'groupName name value')
+
+
+class Attributes(object):
+    '''The add() and itemByName() of a Fusion 360 attributes collection'''
+
+    def __init__(self):
+        self.items = {}
+
+    def add(self, group, name, value):
+        assert isinstance(value, str)
+        self.items[group, name] = Attribute(group, name, value)
+        return self.items[group, name]
+
+    def itemByName(self, group, name):
+        return self.items.get((group, name))
+
+
+def test_round_trip():
+    filename = os.path.join(TESTDATA, 'SportDoryWithAngle.csv')
+    offset_data = offsets_reader.offset_reader(filename)
+    attributes = Attributes()
+    assert offsets_attributes.load(attributes) == (None, '')
+    assert offsets_attributes.load_settings(attributes) == \
+        dict(offsets_attributes.SETTINGS)
+
+    offsets_attributes.save(attributes, offset_data, filename,
+                            transomAngle=0.8, halfHull=False,
+                            loftBody='solid')
+    saved, name = offsets_attributes.load(attributes)
+    assert name == filename
+    assert saved == offset_data
+
+    settings = offsets_attributes.load_settings(attributes)
+    assert settings['transomAngle'] == 0.8
+    assert settings['halfHull'] is False
+    assert settings['loftBody'] == 'solid'
+    assert settings['scaleFactor'] == 0.1
+
+    # the packed hull is smaller than the table it came from
+    value = attributes.itemByName('ImportOffset', 'geometry').value
+    assert len(value) < os.path.getsize(filename)
+
+
+def test_every_table():
+    # the sections must come back the same for tables with the width
+    # rows in another order than the height rows
+    for name in sorted(os.listdir(TESTDATA)):
+        if not name.endswith('.csv'):
+            continue
+        offset_data = offsets_reader.offset_reader(
+            os.path.join(TESTDATA, name))
+        saved = offsets_attributes.unpack_geometry(
+            offsets_attributes.pack_geometry(offset_data))
+        assert saved == offset_data, name
+
+
+def test_bad_values():
+    attributes = Attributes()
+    attributes.add('ImportOffset', 'scaleFactor', 'not json')
+    attributes.add('ImportOffset', 'halfHull', '"yes"')
+    assert offsets_attributes.load_settings(attributes) == \
+        dict(offsets_attributes.SETTINGS)
+
+    attributes.add('ImportOffset', 'geometry', 'not a hull')
+    with pytest.raises(ValueError):
+        offsets_attributes.load(attributes)
+
+    # written by a newer version of the add-in
+    newer = json.dumps({'version': offsets_attributes.FORMAT_VERSION + 1})
+    packed = base64.b64encode(zlib.compress(newer.encode())).decode()
+    with pytest.raises(ValueError):
+        offsets_attributes.unpack_geometry(packed)
+
+
+def test_saved_batch():
+    hulls = offsets_batch.read_tables(
+        [os.path.join(TESTDATA, name) for name in
+         ('Cartopper.csv', 'SportDoryWithAngle.csv')])
+    attributes = Attributes()
+    offsets_attributes.save_hulls(
+        attributes, [(h.filename, h.offset_data) for h in hulls],
+        sideBySide=True, layoutGap=6.0)
+    saved = offsets_attributes.load_hulls(attributes)
+    assert [f for f, _ in saved] == [h.filename for h in hulls]
+    assert [d for _, d in saved] == [h.offset_data for h in hulls]
+    settings = offsets_attributes.load_settings(attributes)
+    assert settings['sideBySide'] is True
+    assert settings['layoutGap'] == 6.0
+
+    # a single hull saved later replaces the batch
+    offsets_attributes.save(attributes, hulls[0].offset_data, 'one.csv')
+    assert [f for f, _ in offsets_attributes.load_hulls(attributes)] == \
+        ['one.csv']
@@ -6,7 +6,7 @@ You can auto-discover and run all tests with this command:
 Documentation: https://docs.pytest.org/en/latest/
 """
 
-from offset2solid import fie_to_di
+from offsets_reader import fie_to_di
 
 
 def test_fie_conversion():
@@ -0,0 +1,45 @@
+'''
+A batch of tables must be read in order, whatever fails, and laid out
+side by side without overlapping
+'''
+
+import os
+
+import pytest
+
+import offsets_batch
+
+TESTDATA = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        os.pardir, 'testdata')
+
+
+def test_read_tables(tmpdir):
+    names = ['Cartopper.csv', 'SportDory.csv', 'cartopper.json',
+             'GokstadShip.csv']
+    filenames = [os.path.join(TESTDATA, name) for name in names]
+    missing = str(tmpdir.join('missing.csv'))
+    hulls = offsets_batch.read_tables(filenames[:2] + [missing] +
+                                      filenames[2:])
+    assert [hull.filename for hull in hulls] == \
+        filenames[:2] + [missing] + filenames[2:]
+    assert [hull.error is None for hull in hulls] == \
+        [True, True, False, True, True]
+    assert hulls[2].error.startswith('missing.csv')
+    assert hulls[0].offset_data == \
+        offsets_batch.read_tables(filenames[:1])[0].offset_data
+
+
+def test_layout():
+    hulls = [hull.offset_data for hull in offsets_batch.read_tables(
+        [os.path.join(TESTDATA, name) for name in
+         ('Cartopper.csv', 'SportDory.csv', 'Cartopper.csv')])]
+    assert offsets_batch.layout(hulls) == [(0.0, 0.0, 0.0)] * 3
+
+    widths = [offsets_batch.half_breadth(h) for h in hulls]
+    assert widths[0] == pytest.approx(24.125)
+    offsets = offsets_batch.layout(hulls, 12.0)
+    assert offsets[0] == (0.0, 0.0, 0.0)
+    for k in (1, 2):
+        gap = (offsets[k][0] - widths[k]) - (offsets[k - 1][0] +
+                                             widths[k - 1])
+        assert gap == pytest.approx(12.0)
@@ -0,0 +1,38 @@
+'''
+Quick checks of the benchmark harness, the real runs are done with
+
+    python ImportOffsets/offsets_bench.py -o results.json
+'''
+
+import os
+
+import offsets_bench
+import offsets_synth
+
+
+def test_bench_table_stages(tmpdir):
+    filename = os.path.join(offsets_bench.TESTDATA, 'Cartopper.csv')
+    results = offsets_bench.bench_table(filename, 1, str(tmpdir))
+    for stage in ['parse', 'sections', 'rake', 'serialize', 'export_json']:
+        assert results[stage] >= 0.0
+
+
+def test_synthetic_table_size(tmpdir):
+    filename = str(tmpdir.join('synthetic.csv'))
+    offsets_synth.generate(filename, stations=50, lines=7)
+    results = offsets_bench.bench_table(filename, 1, str(tmpdir))
+    assert 'export_json' in results
+
+
+def test_parse_sizes():
+    assert offsets_bench.parse_sizes('1000x20,40X5') == [(1000, 20), (40, 5)]
+    assert offsets_bench.parse_sizes('') == []
+
+
+def test_compare_threshold():
+    baseline = {'tables': {'a': {'parse': 1.0, 'rake': 0.001}}}
+    results = {'tables': {'a': {'parse': 1.3, 'rake': 0.0025},
+                          'b': {'parse': 9.0}}}
+    regressions = offsets_bench.compare(results, baseline, threshold=0.25)
+    assert [(r['table'], r['stage']) for r in regressions] == [('a', 'parse')]
+    assert offsets_bench.compare(results, baseline, threshold=0.5) == []
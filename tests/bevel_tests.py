@@ -0,0 +1,68 @@
+'''
+The bevels must match the angles of a simple hull worked out by hand
+'''
+
+import json
+import math
+import os
+
+import pytest
+
+import linestable
+import offsets_bevel
+
+TESTDATA = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        os.pardir, 'testdata')
+
+
+def box_hull(flare=0.0):
+    '''A hard chine prism 10 long, widening by flare per unit length'''
+    stations = range(0, 11)
+
+    def line(w, h):
+        return [(w * (1 + flare * z), h, float(z)) for z in stations]
+
+    return {'lines': {'sheer': line(10.0, 10.0), 'chine': line(8.0, 0.0),
+                      'keel': line(0.0, -2.0)}}
+
+
+def test_angles():
+    table = offsets_bevel.bevels(box_hull())
+    assert table['stations'] == [float(z) for z in range(11)]
+    assert table['gunwale']['sheer'] == \
+        pytest.approx([math.degrees(math.atan2(2, 10))] * 11)
+    side, bottom = (-2.0, -10.0), (-8.0, -2.0)
+    turn = math.degrees(math.acos(
+        (side[0] * bottom[0] + side[1] * bottom[1]) /
+        (math.hypot(*side) * math.hypot(*bottom))))
+    assert table['chine']['chine'] == pytest.approx([turn] * 11)
+    assert table['frame']['sheer-chine'] == pytest.approx([0.0] * 11,
+                                                          abs=1e-9)
+
+    # a hull getting fuller aft is bevelled on the aft face of the molds
+    table = offsets_bevel.bevels(box_hull(0.05))
+    assert all(b > 0 for b in table['frame']['chine-keel'])
+
+
+def test_cli(tmpdir):
+    filename = os.path.join(TESTDATA, 'Cartopper.csv')
+    output = str(tmpdir.join('bevels.json'))
+    assert linestable.main(['bevels', filename, '-c', '-f', 'json',
+                            '-o', output]) == 0
+    with open(output) as f:
+        table = json.load(f)
+    assert len(table['stations']) == 13
+    # the stations are labelled as in the table, 12 down to 0
+    assert table['labels'] == [str(k) for k in range(12, -1, -1)]
+    assert list(table['chine']) == ['chine', 'bottom', 'centerline']
+    assert table['chine']['centerline'] == [0.0] * 13
+    assert list(table['frame']) == ['gunwale-chine', 'chine-bottom',
+                                    'bottom-centerline']
+
+    output = str(tmpdir.join('bevels.csv'))
+    assert linestable.main(['bevels', filename, '-o', output]) == 0
+    with open(output) as f:
+        rows = [line.split(',') for line in f.read().splitlines()]
+    assert [row[0] for row in rows] == ['axis', 'length', 'gunwale', 'chine',
+                                        'frame', 'frame']
+    assert rows[0][2:4] == ['12', '11']
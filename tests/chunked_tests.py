@@ -0,0 +1,68 @@
+'''
+Converting a table a block of stations at a time must give the same
+files as the in-memory path
+'''
+
+import glob
+import json
+import os
+import shutil
+
+import offsets_chunked
+import offsets_mesh
+import offsets_reader
+import offsets_synth
+import offsets_writer
+
+TESTDATA = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        os.pardir, 'testdata')
+
+
+def compare(tmpdir, source, block, precision=None, half_hull=True):
+    filename = str(tmpdir.join(os.path.basename(source)))
+    shutil.copy(source, filename)
+    offsets_chunked.convert(filename, block=block, precision=precision,
+                            half_hull=half_hull)
+
+    offset_data = offsets_reader.rake_ends(
+        offsets_reader.offset_reader(filename))
+    base = os.path.splitext(filename)[0]
+    with open(base + '.json') as f:
+        chunked_json = f.read()
+    with open(base + '.stl', 'rb') as f:
+        chunked_stl = f.read()
+
+    with open(base + '.json', 'w') as opf:
+        offsets_writer.write_json(opf, offset_data, precision)
+    offsets_mesh.export_stl(offset_data, base + '.stl', half_hull)
+    with open(base + '.json') as f:
+        assert f.read() == chunked_json
+    with open(base + '.stl', 'rb') as f:
+        assert f.read() == chunked_stl
+
+
+def test_testdata(tmpdir):
+    for source in glob.glob(os.path.join(TESTDATA, '*.csv')):
+        for block in [1, 3, offsets_chunked.BLOCK]:
+            compare(tmpdir, source, block)
+
+
+def test_full_hull_and_precision(tmpdir):
+    compare(tmpdir, os.path.join(TESTDATA, 'SportDoryWithAngle.csv'), 2,
+            precision=1 / 64.0, half_hull=False)
+
+
+def test_synthetic_gaps(tmpdir):
+    source = str(tmpdir.mkdir('synth').join('synth.csv'))
+    offsets_synth.generate(source, stations=250, lines=6, gaps=3)
+    compare(tmpdir, source, 64)
+
+
+def test_json_loads(tmpdir):
+    filename = str(tmpdir.join('SportDoryWithAngle.csv'))
+    shutil.copy(os.path.join(TESTDATA, 'SportDoryWithAngle.csv'), filename)
+    written = offsets_chunked.convert(filename, outputs=['json'], block=4)
+    assert written == [str(tmpdir.join('SportDoryWithAngle.json'))]
+    with open(written[0]) as f:
+        offset_data = json.load(f)
+    assert len(offset_data['sections']) == len(offset_data['angle']) == 8
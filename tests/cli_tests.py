@@ -0,0 +1,178 @@
+'''
+The linestable subcommands must write what the modules behind them do
+'''
+
+import csv
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+import linestable
+import offsets_reader
+import offsets_resample
+import offsets_validate
+
+TESTDATA = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        os.pardir, 'testdata')
+
+
+def copy(tmpdir, name):
+    filename = str(tmpdir.join(name))
+    shutil.copy(os.path.join(TESTDATA, name), filename)
+    return filename
+
+
+def test_convert(tmpdir):
+    filename = copy(tmpdir, 'SportDoryWithAngle.csv')
+    assert linestable.main(['convert', filename, '-b', '80']) == 0
+
+    with open(os.path.splitext(filename)[0] + '.json') as f:
+        written = json.load(f)
+    expected = offsets_reader.rake_ends(
+        offsets_reader.offset_reader(filename), 80)
+    assert written == json.loads(json.dumps(expected))
+
+
+def test_chunked_output(tmpdir):
+    filename = copy(tmpdir, 'SportDoryWithAngle.csv')
+    out = str(tmpdir.join('out.json'))
+    assert linestable.main(['convert', filename, '--chunked', '-o',
+                            out]) == 0
+    assert not os.path.exists(os.path.splitext(filename)[0] + '.json')
+    with open(out) as f:
+        assert json.load(f)['angle'][0] == 45.0
+
+    mesh = str(tmpdir.join('out.stl'))
+    assert linestable.main(['mesh', filename, '--chunked', '-o', mesh]) == 0
+    assert os.path.getsize(mesh) > 84
+
+    # options the chunked path cannot honour are refused
+    assert linestable.main(['convert', filename, '--chunked', '--backend',
+                            'orjson', '-o', out]) == 2
+    assert linestable.main(['mesh', filename, '--chunked', '--ascii']) == 2
+
+
+def test_output_needs_single_table(tmpdir):
+    filenames = [copy(tmpdir, 'Cartopper.csv'), copy(tmpdir, 'SportDory.csv')]
+    with pytest.raises(SystemExit):
+        linestable.main(['convert', '-o', 'out.json'] + filenames)
+
+
+def test_validate(tmpdir):
+    filename = copy(tmpdir, 'Cartopper.csv')
+    assert linestable.main(['validate', filename]) == 0
+
+    bad = str(tmpdir.join('bad.csv'))
+    with open(bad, 'w') as f:
+        f.write('length,station,0,10,10\n'
+                'height,sheer,12,x,fish\n'
+                'width,sheer,20,24,22\n'
+                'width,chine,10,12,11\n')
+    problems = offsets_validate.validate(bad)
+    messages = [p.message for p in problems if p.level == 'error']
+    assert 'repeated station position' in messages
+    assert "height is not a number: 'fish'" in messages
+    assert 'widths but no heights' in messages
+    assert linestable.main(['validate', bad]) == 1
+
+
+def test_crossings(tmpdir):
+    rows = offsets_reader.read_rows(os.path.join(TESTDATA,
+                                                 'SportDoryWithAngle.csv'))
+    assert offsets_validate.check_table(offsets_reader.munge_table(rows)) \
+        == []
+
+    # line2 and line3 swapped at station 3 cross either side of it
+    bad = [list(row) for row in rows]
+    found = [row for row in bad if row[1] in ('line2', 'line3')]
+    for a, b in zip(found[::2], found[1::2]):
+        a[5], b[5] = b[5], a[5]
+    problems = offsets_validate.check_table(offsets_reader.munge_table(bad))
+    assert [(p.level, p.line, p.station) for p in problems
+            if p.line] == [('warning', 'line3', '2'), ('warning', 'line3', '3')]
+    assert problems[0].message.startswith('crosses line2')
+    assert problems[0].message.endswith('to station 3')
+    assert [p.station for p in problems if p.level == 'error'] == ['3']
+
+    # problems are reported at the station names of the header row
+    filename = os.path.join(tmpdir, 'bad.csv')
+    bad = [list(row) for row in rows]
+    bad[3][2] = '3.1'
+    with open(filename, 'w', newline='') as f:
+        csv.writer(f).writerows(bad)
+    problems = offsets_validate.validate(filename)
+    assert problems[0].station == 'Transom'
+    assert offsets_validate.format_problem('bad.csv', problems[0]) \
+        == 'bad.csv, station Transom: error: section crosses itself, ' \
+        'line3-line4 and the sheer across the centerline'
+
+    # line4 above the sheer crosses the top of the section
+    bad = [list(row) for row in rows]
+    bad[3][4] = '2.6'
+    lines, line_order, _ = offsets_reader.combine_offsets(
+        offsets_reader.munge_table(bad))
+    assert offsets_validate.section_crossings(lines, line_order) == \
+        [(2, ('sheer', 'sheer'), ('line3', 'line4'))]
+
+
+def test_resample(tmpdir):
+    filename = copy(tmpdir, 'SportDoryWithAngle.csv')
+    once = str(tmpdir.join('once.csv'))
+    twice = str(tmpdir.join('twice.csv'))
+    assert linestable.main(['resample', filename, once, '-n', '8']) == 0
+    assert linestable.main(['resample', once, twice]) == 0
+
+    # the first pass spaces the stations evenly, the second resamples
+    # at the same stations and gives the offsets back unchanged
+    before = offsets_reader.offset_reader(once)
+    after = offsets_reader.offset_reader(twice)
+    assert after['angle'] == pytest.approx(before['angle'])
+    for s0, s1 in zip(before['sections'], after['sections']):
+        for p0, p1 in zip(s0, s1):
+            assert p1 == pytest.approx(p0, abs=1e-4)
+
+    # halfway between knots of a straight line
+    assert offsets_resample.interpolate([0, 10], [2, 4], [5, 15],
+                                        'cubic') == [3, None]
+
+
+def test_fit_points():
+    # a straight line needs only its ends
+    line = [(0.0, 0.5 * k, float(k)) for k in range(50)]
+    assert offsets_resample.fit_points(line, 0.001) == [line[0], line[-1]]
+
+    curve = [(10 * math.sin(k / 20.0), 0.3 * k, float(k)) for k in range(200)]
+    for tolerance in (0.1, 0.01):
+        kept = offsets_resample.fit_points(curve, tolerance)
+        assert 2 < len(kept) < 40
+        assert kept[0] == curve[0] and kept[-1] == curve[-1]
+
+        # the spline through the kept points, by the length along the
+        # original line, passes within tolerance of every point
+        ts = [0.0]
+        for p, q in zip(curve, curve[1:]):
+            ts.append(ts[-1] + math.dist(p, q))
+        knots = [ts[curve.index(p)] for p in kept]
+        for t, p in zip(ts, curve):
+            fitted = [offsets_resample.interpolate(
+                knots, [q[c] for q in kept], [t], 'spline')[0]
+                for c in range(3)]
+            assert math.dist(fitted, p) <= tolerance + 1e-9
+
+    # the natural spline is the smooth curve, a cubic between two knots
+    assert offsets_resample.interpolate([0, 1, 2], [0, 1, 0], [0.5],
+                                        'spline') == [pytest.approx(0.6875)]
+    assert offsets_resample.fit_points(curve, 0) == curve
+
+
+def test_no_log_file_on_import(tmpdir):
+    subprocess.check_call([sys.executable, '-c', 'import offsets_reader'],
+                          cwd=str(tmpdir),
+                          env=dict(os.environ, PYTHONPATH=os.path.dirname(
+                              linestable.__file__)))
+    assert os.listdir(str(tmpdir)) == []
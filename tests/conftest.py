@@ -0,0 +1,9 @@
+'''
+Make the modules in ImportOffsets importable without Fusion 360
+'''
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir, 'ImportOffsets'))
@@ -0,0 +1,116 @@
+'''
+The mold frames must be the sections less the planking, with the
+cutter path half the kerf outside them
+'''
+
+import io
+import math
+import os
+
+import pytest
+
+import linestable
+import offsets_frames
+import offsets_reader
+
+TESTDATA = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        os.pardir, 'testdata')
+
+
+def test_offset():
+    square = [(0.0, 0.0), (4.0, 0.0), (4.0, 4.0), (0.0, 4.0)]
+    assert offsets_frames.offset_polygon(square, 0.5) == pytest.approx(
+        [(-0.5, -0.5), (4.5, -0.5), (4.5, 4.5), (-0.5, 4.5)])
+    assert offsets_frames.polygon_area(
+        offsets_frames.offset_polygon(square, -1.0)) == pytest.approx(4.0)
+
+    # a slot narrower than the offset closes up, leaving a simple outline
+    slot = [(0.0, 0.0), (10.0, 0.0), (10.0, 10.0), (5.1, 10.0), (5.05, 2.0),
+            (4.95, 2.0), (4.9, 10.0), (0.0, 10.0)]
+    grown = offsets_frames.offset_polygon(slot, 0.5)
+    assert offsets_frames.polygon_area(grown) == pytest.approx(121.0)
+    assert offsets_frames.split_loops(grown) == [grown]
+
+
+def test_frame_outline():
+    # a box section 4 wide and 4 deep
+    section = [(2.0, 4.0, 5.0), (2.0, 0.0, 5.0)]
+    part = offsets_frames.frame_outline(section, 0.5, 1.0, 0.5)
+    assert offsets_frames.polygon_area(part) == pytest.approx(
+        3.0 * 3.5 + 2 * 0.5)
+    xs = [p[0] for p in part]
+    ys = [p[1] for p in part]
+    assert (min(xs), max(xs), min(ys), max(ys)) == (-1.5, 1.5, 0.5, 5.0)
+
+    # heights measured down from a datum give the same frame
+    flipped = [(2.0, -4.0, 5.0), (2.0, 0.0, 5.0)]
+    assert offsets_frames.polygon_area(offsets_frames.frame_outline(
+        flipped, 0.5)) == pytest.approx(3.0 * 3.5)
+
+    # a baseline 2 below the keel adds a tab down to it
+    part = offsets_frames.frame_outline(section, 0.5, 0.0, 1.0,
+                                        baseline=-2.0)
+    assert offsets_frames.polygon_area(part) == pytest.approx(
+        3.0 * 3.5 + 1.0 * 2.5)
+    assert min(p[1] for p in part) == pytest.approx(-2.0)
+    assert offsets_frames.polygon_area(flipped_part(flipped)) == \
+        pytest.approx(3.0 * 3.5 + 1.0 * 2.5)
+
+
+def flipped_part(section):
+    # heights down from a datum, the baseline below the keel is higher
+    return offsets_frames.frame_outline(section, 0.5, 0.0, 1.0,
+                                        baseline=2.0)
+
+
+def test_raked_section():
+    # a section raked back 45 degrees is laid out true size
+    section = [(1.0, 2.0, 0.0), (1.0, 0.0, 2.0)]
+    part = offsets_frames.frame_outline(section)
+    heights = [p[1] for p in part]
+    assert max(heights) - min(heights) == pytest.approx(2 * math.sqrt(2))
+
+
+def test_testdata():
+    offset_data = offsets_reader.rake_ends(offsets_reader.offset_reader(
+        os.path.join(TESTDATA, 'Cartopper.csv')))
+    frames = offsets_frames.frames(offset_data, 0.25, 0.125, 2.0)
+    assert len(frames) == len(offset_data['sections'])
+    for frame in frames:
+        assert offsets_frames.polygon_area(frame.part) > 0
+        assert offsets_frames.polygon_area(frame.path) > \
+            offsets_frames.polygon_area(frame.part)
+
+    # the baseline tabs all reach the same height, below every keel
+    based = offsets_frames.frames(offset_data, 0.25, 0.0, 2.0, base=1.5)
+    lowest = [min(p[1] for p in frame.part) for frame in based]
+    assert lowest == pytest.approx([lowest[0]] * len(based))
+    for frame, plain in zip(based, frames):
+        assert offsets_frames.polygon_area(frame.part) > \
+            offsets_frames.polygon_area(plain.part)
+
+    opf = io.StringIO()
+    offsets_frames.write_gcode(opf, frames, depth=0.75, pass_depth=0.25)
+    lines = opf.getvalue().split('\n')
+    assert lines[1:3] == ['G20', 'G90 G17']
+    assert lines[-2:] == ['M2', '']
+    assert sum(1 for line in lines if line.startswith('G1 Z')) == \
+        3 * len(frames)
+    assert lines.count('G1 Z-0.7500 F20.0') == len(frames)
+
+    opf = io.StringIO()
+    offsets_frames.write_drawing(opf, frames, 'dxf')
+    text = opf.getvalue().split('\n')
+    assert text.count('POLYLINE') == 2 * len(frames)
+    assert text[-3:] == ['0', 'EOF', '']
+
+
+def test_station_names(tmpdir):
+    # the molds are named by the header row, Cartopper runs 12 down to 0
+    output = str(tmpdir.join('cartopper.nc'))
+    assert linestable.main(['frames', os.path.join(TESTDATA, 'Cartopper.csv'),
+                            '-f', 'nc', '-o', output]) == 0
+    with open(output) as f:
+        names = [line for line in f.read().split('\n')
+                 if line.startswith('(station')]
+    assert names[0] == '(station 12)' and names[-1] == '(station 0)'
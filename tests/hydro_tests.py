@@ -0,0 +1,77 @@
+'''
+The running volumes must integrate the sectional area curve and the
+lookups on them must agree with each other
+'''
+
+import io
+import json
+import os
+
+import pytest
+
+import offsets_hydro
+import offsets_reader
+import offsets_writer
+
+TESTDATA = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        os.pardir, 'testdata')
+
+
+def test_volume_table():
+    # Simpson's rule is exact for a parabola, even with uneven stations
+    stations = [0.0, 0.5, 1.3, 2.0, 2.7, 3.1, 4.0]
+    areas = [z * (4.0 - z) for z in stations]
+    table = offsets_hydro.volume_table(stations, areas)
+    assert table.volumes[-1] == pytest.approx(32.0 / 3.0)
+    for z, v in zip(stations, table.volumes):
+        assert v == pytest.approx(2 * z * z - z ** 3 / 3.0)
+
+    trapezoid = offsets_hydro.volume_table(stations, areas, 'trapezoid')
+    assert trapezoid.volumes[-1] == pytest.approx(
+        offsets_hydro.volume(stations, areas))
+
+    # the lookups undo each other and split the volume at the middle
+    assert offsets_hydro.station_at_volume(table, 16.0 / 3.0) == \
+        pytest.approx(2.0)
+    for z in [0.2, 1.0, 2.2, 3.9]:
+        v = offsets_hydro.volume_to(table, z)
+        assert offsets_hydro.station_at_volume(table, v) == pytest.approx(z)
+    assert offsets_hydro.volume_to(table, -1.0) == 0.0
+    assert offsets_hydro.volume_to(table, 5.0) == table.volumes[-1]
+
+
+def test_waterline():
+    # a box section 2 wide (half breadth 1) and 4 deep
+    sections = [[(1.0, 4.0, z), (1.0, 0.0, z)] for z in (0.0, 5.0, 10.0)]
+    props = offsets_hydro.section_properties(sections, 1.5)
+    assert props[0] == pytest.approx((1.5, 0.5, 0.75))
+
+    # the same box with heights measured down from the sheer
+    sections = [[(1.0, 0.0, z), (1.0, 4.0, z)] for z in (0.0, 5.0, 10.0)]
+    curve = offsets_hydro.area_curve(sections, 2.5)
+    assert curve['areas'] == pytest.approx([1.5] * 3)
+    assert curve['volume'] == pytest.approx(15.0)
+    assert curve['lcb'] == pytest.approx(5.0)
+    assert curve['half_volume_station'] == pytest.approx(5.0)
+
+    with pytest.raises(ValueError):
+        offsets_hydro.area_curve([[], []])
+
+
+def test_json_block():
+    offset_data = offsets_reader.offset_reader(
+        os.path.join(TESTDATA, 'SportDory.csv'))
+    curve = offsets_hydro.area_curve(offset_data['sections'], 1.0)
+    assert curve['areas'][-1] == 0.0
+    assert curve['cumulative_volume'][-1] == curve['volume']
+
+    whole = offsets_hydro.area_curve(offset_data['sections'],
+                                     rule='trapezoid')
+    assert whole['volume'] == pytest.approx(
+        offsets_hydro.hydrostatics(offset_data['sections'])['volume'])
+
+    offset_data['area_curve'] = curve
+    opf = io.StringIO()
+    offsets_writer.write_json(opf, offset_data)
+    data = json.loads(opf.getvalue())
+    assert data['area_curve'] == json.loads(json.dumps(curve))
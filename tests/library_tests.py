@@ -0,0 +1,62 @@
+'''
+The library index must only read tables that changed and must find a
+copy of a hull as its nearest neighbour
+'''
+
+import os
+import shutil
+
+import pytest
+
+import offsets_library
+import offsets_reader
+
+TESTDATA = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        os.pardir, 'testdata')
+
+
+def test_features():
+    offset_data = offsets_reader.offset_reader(
+        os.path.join(TESTDATA, 'Cartopper.csv'))
+    vector = offsets_library.features(offset_data)
+    assert len(vector) == len(offsets_library.FEATURES)
+    named = dict(zip(offsets_library.FEATURES, vector))
+    assert 0 < named['prismatic'] < 1
+    curve = vector[3:3 + offsets_library.CURVE_POINTS]
+    assert 0.9 < max(curve) <= 1.0
+    # the Cartopper's heights are measured down but its sides flare out
+    assert named['flare'] > 0 and named['rocker'] > 0
+
+
+def test_update_and_similar(tmpdir):
+    folder = str(tmpdir)
+    os.mkdir(os.path.join(folder, 'dories'))
+    for name in ['Cartopper.csv', 'ChesapeakBaySharpie.csv',
+                 'GokstadShip.csv']:
+        shutil.copy(os.path.join(TESTDATA, name), folder)
+    for name in ['SportDory.csv', 'SportDoryWithAngle.csv']:
+        shutil.copy(os.path.join(TESTDATA, name),
+                    os.path.join(folder, 'dories'))
+    with open(os.path.join(folder, 'broken.csv'), 'w') as f:
+        f.write('not,a,table\n')
+
+    hulls, read = offsets_library.update(folder)
+    assert read == 6
+    assert 'error' in hulls['broken.csv']
+    assert offsets_library.update(folder) == (hulls, 0)
+
+    # only the changed table is read again, and removed ones drop out
+    with open(os.path.join(folder, 'Cartopper.csv'), 'a') as f:
+        f.write('# checked\n')
+    os.remove(os.path.join(folder, 'GokstadShip.csv'))
+    hulls, read = offsets_library.update(folder)
+    assert read == 1
+    assert sorted(hulls) == ['Cartopper.csv', 'ChesapeakBaySharpie.csv',
+                             'broken.csv', 'dories/SportDory.csv',
+                             'dories/SportDoryWithAngle.csv']
+
+    vector = hulls['dories/SportDory.csv']['features']
+    found = offsets_library.similar(hulls, vector, 2,
+                                    exclude=['dories/SportDory.csv'])
+    assert found[0] == (pytest.approx(0.0), 'dories/SportDoryWithAngle.csv')
+    assert len(found) == 2 and found[1][0] > 0
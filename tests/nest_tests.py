@@ -0,0 +1,101 @@
+'''
+Nested parts must stay on their sheets without overlapping, and the
+sheets used must be reported
+'''
+
+import io
+import itertools
+import os
+import xml.etree.ElementTree as ET
+
+import pytest
+
+import offsets_nest
+import offsets_reader
+
+TESTDATA = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        os.pardir, 'testdata')
+
+
+def check(placed, sheet):
+    for p in placed:
+        x0, y0, x1, y1 = offsets_nest._bounds(p.outline)
+        assert x0 >= -1e-9 and y0 >= -1e-9
+        assert x1 <= sheet[0] + 1e-9 and y1 <= sheet[1] + 1e-9
+    for a, b in itertools.combinations(placed, 2):
+        if a.sheet == b.sheet:
+            assert not offsets_nest.overlaps(a.outline, b.outline), \
+                (a.name, b.name)
+
+
+def test_overlaps():
+    square = [(0.0, 0.0), (2.0, 0.0), (2.0, 2.0), (0.0, 2.0)]
+    moved = [(x + 1, y + 1) for x, y in square]
+    beside = [(x + 2, y) for x, y in square]
+    assert offsets_nest.overlaps(square, moved)
+    assert offsets_nest.overlaps(square, list(square))
+    assert not offsets_nest.overlaps(square, beside)
+
+
+def test_rectangles():
+    # eight 2x1 tiles fill a 4x4 sheet exactly, some turned on end
+    parts = [offsets_nest.Part(str(k), [(0.0, 0.0), (2.0, 0.0), (2.0, 1.0),
+                                        (0.0, 1.0)]) for k in range(9)]
+    placed, unplaced = offsets_nest.nest(parts, (4.0, 4.0))
+    check(placed, (4.0, 4.0))
+    assert [p.sheet for p in placed].count(0) == 8
+    assert len(placed) == 9 and unplaced == []
+
+    each, total = offsets_nest.utilisation(placed, (4.0, 4.0))
+    assert each == pytest.approx([1.0, 0.125])
+    assert total == pytest.approx(18.0 / 32.0)
+
+    big = offsets_nest.Part('big', [(0.0, 0.0), (5.0, 0.0), (5.0, 1.0)])
+    placed, unplaced = offsets_nest.nest([big], (4.0, 4.0))
+    assert placed == [] and unplaced == [big]
+
+
+def test_gap():
+    # the parts are kept the gap apart, but drawn and counted at their
+    # own size
+    square = [(0.0, 0.0), (2.0, 0.0), (2.0, 2.0), (0.0, 2.0)]
+    parts = [offsets_nest.polygon_part(str(k), square, 0.5)
+             for k in range(2)]
+    assert parts[0].outline == square
+    placed, unplaced = offsets_nest.nest(parts, (6.0, 3.0), [0])
+    assert unplaced == []
+    boxes = sorted(offsets_nest._bounds(p.outline) for p in placed)
+    assert boxes[0] == pytest.approx((0.25, 0.25, 2.25, 2.25))
+    assert boxes[1] == pytest.approx((2.75, 0.25, 4.75, 2.25))
+    each, total = offsets_nest.utilisation(placed, (6.0, 3.0))
+    assert each == pytest.approx([8.0 / 18.0])
+
+
+def test_testdata():
+    rows = offsets_reader.read_rows(os.path.join(TESTDATA, 'Cartopper.csv'))
+    offset_data = offsets_reader.rake_ends(
+        offsets_reader.offsets_from_rows(rows))
+    parts = offsets_nest.hull_parts(
+        offset_data, 0.25, 0.125, labels=offsets_reader.station_labels(rows))
+    assert len(parts) == 13 + 2 * 2
+    # the molds are named by the header row, which runs 12 down to 0
+    assert parts[0].name == 'station 12' and parts[12].name == 'station 0'
+
+    sheet = (48.0, 160.0)
+    placed, unplaced = offsets_nest.nest(parts, sheet)
+    assert unplaced == []
+    check(placed, sheet)
+    assert sorted(p.name for p in placed) == sorted(p.name for p in parts)
+
+    stream = io.StringIO()
+    offsets_nest.report(placed, unplaced, sheet, stream)
+    assert '% used' in stream.getvalue().split('\n')[-2]
+
+    opf = io.StringIO()
+    offsets_nest.write_layout(opf, placed, sheet)
+    root = ET.fromstring(opf.getvalue())
+    ns = '{http://www.w3.org/2000/svg}'
+    groups = dict((g.get('id'), g) for g in root.findall(ns + 'g'))
+    assert len(groups['parts'].findall(ns + 'polyline')) == len(parts)
+    assert len(groups['sheets'].findall(ns + 'polyline')) == \
+        max(p.sheet for p in placed) + 1
@@ -0,0 +1,81 @@
+'''
+Developed panels must keep the edge lengths of the hull and report no
+error for strips that are developable
+'''
+
+import io
+import math
+import os
+import xml.etree.ElementTree as ET
+
+import pytest
+
+import offsets_panels
+import offsets_reader
+
+TESTDATA = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        os.pardir, 'testdata')
+
+
+def length(points):
+    return sum(math.dist(p, q) for p, q in zip(points, points[1:]))
+
+
+def cone_strip(count=40):
+    '''Two lines across the rulings of a cone, which rolls out flat'''
+    upper = []
+    lower = []
+    for k in range(count):
+        t = 0.8 * k / (count - 1)
+        ruling = (math.cos(t), math.sin(t), 2.0)
+        upper.append(tuple(3.0 * c for c in ruling))
+        lower.append(tuple(5.0 * c for c in ruling))
+    return upper, lower
+
+
+def test_developable_strip():
+    upper, lower = cone_strip()
+    panel = offsets_panels.develop_panel('cone', upper, lower)
+    assert panel.max_error == pytest.approx(0, abs=1e-9)
+    assert length(panel.upper) == pytest.approx(length(upper))
+    assert length(panel.lower) == pytest.approx(length(lower))
+    for (a, b), p, q in zip(panel.stations, upper, lower):
+        assert math.dist(a, b) == pytest.approx(math.dist(p, q))
+
+    # the upper edge is laid along the x axis from the origin
+    assert panel.upper[0] == pytest.approx((0, 0))
+    assert panel.upper[-1][1] == pytest.approx(0, abs=1e-9)
+
+
+def test_twisted_strip():
+    upper = [(0.0, 0.0, float(z)) for z in range(11)]
+    lower = [(math.cos(0.1 * z), math.sin(0.1 * z), float(z))
+             for z in range(11)]
+    panel = offsets_panels.develop_panel('twist', upper, lower)
+    assert panel.max_error > 1e-3
+    assert panel.rms_error <= panel.max_error
+
+
+def test_testdata():
+    offset_data = offsets_reader.rake_ends(offsets_reader.offset_reader(
+        os.path.join(TESTDATA, 'Cartopper.csv')))
+    panels = offsets_panels.develop(offset_data)
+    assert [p.name for p in panels] == ['gunwale-chine', 'chine-bottom']
+    for panel, (upper, lower) in zip(panels, [('gunwale', 'chine'),
+                                             ('chine', 'bottom')]):
+        assert len(panel.stations) == 13
+        assert length(panel.upper) == pytest.approx(
+            length(offset_data['lines'][upper]))
+        assert panel.max_error < 1.0
+
+    centerline = offsets_panels.develop(offset_data, centerline=True)
+    assert centerline[-1].name == 'bottom-_lower_cl'
+
+    opf = io.StringIO()
+    offsets_panels.write_patterns(opf, panels)
+    root = ET.fromstring(opf.getvalue())
+    ns = '{http://www.w3.org/2000/svg}'
+    groups = dict((g.get('id'), g) for g in root.findall(ns + 'g'))
+    assert len(groups['outline'].findall(ns + 'polyline')) == 2
+    assert [t.text for t in groups['labels'].findall(ns + 'text')] == \
+        ['gunwale-chine', 'chine-bottom']
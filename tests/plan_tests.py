@@ -0,0 +1,102 @@
+'''
+The lines plan must hold every view of the hull and the simplified
+curves must stay within the tolerance
+'''
+
+import io
+import math
+import os
+import xml.etree.ElementTree as ET
+
+import offsets_plan
+import offsets_reader
+import offsets_synth
+
+TESTDATA = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        os.pardir, 'testdata')
+
+
+def distance(p, a, b):
+    '''From p to the segment a b'''
+    dx, dy = b[0] - a[0], b[1] - a[1]
+    seg2 = dx * dx + dy * dy
+    t = 0 if seg2 == 0 else ((p[0] - a[0]) * dx + (p[1] - a[1]) * dy) / seg2
+    t = min(max(t, 0), 1)
+    return math.hypot(p[0] - a[0] - t * dx, p[1] - a[1] - t * dy)
+
+
+def test_simplify():
+    line = [(i, 0.0) for i in range(10)]
+    assert offsets_plan.simplify(line, 0.01) == [(0, 0.0), (9, 0.0)]
+
+    curve = [(i / 100.0, math.sin(i / 100.0)) for i in range(315)]
+    for tolerance in [0.001, 0.01, 0.1]:
+        kept = offsets_plan.simplify(curve, tolerance)
+        assert kept[0] == curve[0] and kept[-1] == curve[-1]
+        assert len(kept) < len(curve)
+        for p in curve:
+            assert min(distance(p, a, b) for a, b in
+                       zip(kept, kept[1:])) <= tolerance + 1e-12
+
+    assert offsets_plan.simplify(curve, 0) == curve
+
+
+def plan(offset_data, fmt, tolerance=0.01):
+    opf = io.StringIO()
+    offsets_plan.write_plan(opf, offset_data, fmt, tolerance)
+    return opf.getvalue()
+
+
+def test_svg():
+    offset_data = offsets_reader.rake_ends(offsets_reader.offset_reader(
+        os.path.join(TESTDATA, 'SportDoryWithAngle.csv')))
+    root = ET.fromstring(plan(offset_data, 'svg'))
+    ns = '{http://www.w3.org/2000/svg}'
+    groups = dict((g.get('id'), g.findall(ns + 'polyline'))
+                  for g in root.findall(ns + 'g'))
+
+    stations = len(offset_data['sections'])
+    lines = len(offset_data['lines'])
+    assert len(groups['stations']) == 2 * stations
+    assert len(groups['profile']) == lines
+    assert len(groups['half-breadth']) == lines
+    assert len(groups['body-plan']) == stations
+
+    # everything is on the sheet
+    width, height = [float(v) for v in root.get('viewBox').split()[2:]]
+    for polylines in groups.values():
+        for polyline in polylines:
+            for point in polyline.get('points').split():
+                x, y = [float(v) for v in point.split(',')]
+                assert -1e-3 <= x <= width + 1e-3
+                assert -1e-3 <= y <= height + 1e-3
+
+
+def test_dxf(tmpdir):
+    filename = str(tmpdir.join('big.csv'))
+    offsets_synth.generate(filename, stations=400, lines=12)
+    offset_data = offsets_reader.offset_reader(filename)
+    fine = plan(offset_data, 'dxf', 0).split('\n')
+    coarse = plan(offset_data, 'dxf', 0.05).split('\n')
+
+    for text in (fine, coarse):
+        assert text[-3:] == ['0', 'EOF', '']
+        assert text.count('POLYLINE') == text.count('SEQEND')
+    assert fine.count('POLYLINE') == coarse.count('POLYLINE')
+    assert coarse.count('VERTEX') < fine.count('VERTEX') / 4
+
+
+def test_heights_down():
+    # Cartopper measures heights down from a datum, the views are turned
+    # over so the sheer is above the bottom
+    offset_data = offsets_reader.rake_ends(offsets_reader.offset_reader(
+        os.path.join(TESTDATA, 'Cartopper.csv')))
+    layout = offsets_plan.Layout(offset_data)
+    lines = offset_data['lines']
+    for sheer, bottom in zip(layout.profile(lines['gunwale']),
+                             layout.profile(lines['bottom'])):
+        assert sheer[1] > bottom[1]
+    for section in offset_data['sections']:
+        drawn = layout.body_plan(section)
+        assert drawn[0][1] > drawn[-1][1]
+        assert layout.y0 <= drawn[-1][1] and drawn[0][1] <= layout.y1
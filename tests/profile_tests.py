@@ -0,0 +1,94 @@
+'''
+The center line profile must follow the ends as they are raked and the
+keel between stations
+'''
+
+import json
+import os
+
+import pytest
+
+import linestable
+import offsets_profile
+import offsets_reader
+
+TESTDATA = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        os.pardir, 'testdata')
+
+
+def test_envelope():
+    # the single pass gives the same profile lines as sorting each section
+    for name in ('SportDory.csv', 'Cartopper.csv', 'GokstadShip.csv'):
+        offset_data = offsets_reader.offset_reader(
+            os.path.join(TESTDATA, name))
+        for s, top, bottom in zip(offset_data['sections'],
+                                  offset_data['lines']['_upper_cl'],
+                                  offset_data['lines']['_lower_cl']):
+            css = sorted(s, key=lambda p: p[1])
+            assert top == (0.0, css[0][1], css[0][2])
+            assert bottom == (0.0, css[-1][1], css[-1][2])
+
+    points = [(1.0, 2.0, 0.0), (2.0, 5.0, 0.0), (0.5, -1.0, 0.0)]
+    assert offsets_reader.section_envelope(points) == (points[2], points[1])
+    assert offsets_reader.section_envelope(points, False) == \
+        (points[1], points[2])
+
+
+def test_raked_ends():
+    offset_data = offsets_reader.rake_ends(offsets_reader.offset_reader(
+        os.path.join(TESTDATA, 'SportDoryWithAngle.csv')))
+    outline = offsets_profile.profile(offset_data)
+    stem, sternpost = outline['stem'], outline['sternpost']
+
+    # the stem leans forward from the sheer at the 113 degree rake, the
+    # transom aft at 45 degrees, and both meet the sheer and the keel
+    assert stem[0][2] == pytest.approx(21.0)
+    assert stem[-1][2] < stem[0][2]
+    assert sternpost[0][2] == pytest.approx(0.0)
+    assert sternpost[-1][2] - sternpost[0][2] == \
+        pytest.approx(sternpost[0][1] - sternpost[-1][1])
+    assert outline['sheer'][0] == sternpost[0]
+    assert outline['sheer'][-1] == stem[0]
+    assert outline['keel'][0] == sternpost[-1]
+    assert outline['keel'][-1] == stem[-1]
+
+    # heights measured down from a datum keep the keel at the bottom
+    offset_data = offsets_reader.rake_ends(offsets_reader.offset_reader(
+        os.path.join(TESTDATA, 'Cartopper.csv')))
+    outline = offsets_profile.profile(offset_data)
+    assert all(k[1] > s[1] for k, s in zip(outline['keel'],
+                                           outline['sheer']))
+
+
+def test_refine():
+    # a keel line that stops short of the ends, where a higher line is
+    # the lowest point
+    stations = [0.0, 10.0, 20.0]
+    lines = {'sheer': [(4.0, 10.0, z) for z in stations],
+             'chine': [(3.0, 4.0, z) for z in stations],
+             'keel': [[], (0.0, 0.0, 10.0), []]}
+    offset_data = offsets_reader.offsets_from_lines(
+        lines, ['sheer', 'chine', 'keel'])
+    outline = offsets_profile.profile(offset_data, refine=1,
+                                      method='linear')
+    assert [p[2] for p in outline['keel']] == [0.0, 5.0, 10.0, 15.0, 20.0]
+    assert [p[1] for p in outline['keel']] == [4.0, 4.0, 0.0, 4.0, 4.0]
+    assert [p[1] for p in outline['sheer']] == [10.0] * 5
+
+
+def test_cli(tmpdir):
+    filename = os.path.join(TESTDATA, 'SportDoryWithAngle.csv')
+    output = str(tmpdir.join('profile.json'))
+    assert linestable.main(['profile', filename, '-r', '2', '-f', 'json',
+                            '-o', output]) == 0
+    with open(output) as f:
+        outline = json.load(f)
+    assert list(outline) == list(offsets_profile.KINDS)
+    assert len(outline['sheer']) == 8 + 7 * 2
+
+    output = str(tmpdir.join('profile.csv'))
+    assert linestable.main(['profile', filename, '-o', output]) == 0
+    with open(output) as f:
+        rows = [line.split(',') for line in f.read().splitlines()]
+    assert rows[0] == ['part', 'point', 'height', 'station']
+    assert rows[1][:2] == ['sheer', '0']
@@ -0,0 +1,115 @@
+'''
+A table built from a point cloud must read back the offsets of the
+surface that was scanned
+'''
+
+import math
+import random
+import struct
+
+import pytest
+
+import linestable
+import offsets_reader
+import offsets_scan
+import offsets_validate
+
+
+def hull_points(count=40000, seed=1):
+    '''Points on a round bilge hull 100 long whose half breadth is
+    sqrt(height) times a beam that falls off toward the ends'''
+    rng = random.Random(seed)
+    for _ in range(count):
+        length = rng.uniform(0.0, 100.0)
+        height = rng.uniform(0.0, 9.0)
+        beam = 1.0 + 0.01 * length * (100.0 - length) / 25.0
+        side = rng.choice((-1.0, 1.0))
+        yield length, side * beam * math.sqrt(height), height
+
+
+def expected_width(length, height):
+    return (1.0 + 0.01 * length * (100.0 - length) / 25.0) * \
+        math.sqrt(height)
+
+
+def write_ply(filename, points):
+    with open(filename, 'wb') as f:
+        f.write('ply\nformat binary_little_endian 1.0\ncomment scan\n'
+                'element vertex {0}\nproperty double x\nproperty double y\n'
+                'property double z\nproperty uchar red\nend_header\n'
+                .format(len(points)).encode('ascii'))
+        for p in points:
+            f.write(struct.pack('<dddB', p[0], p[1], p[2], 200))
+
+
+def test_formats(tmpdir):
+    points = list(hull_points(2000))
+    xyz = str(tmpdir.join('hull.xyz'))
+    with open(xyz, 'w') as f:
+        f.write('// x y z r g b\n')
+        for p in points:
+            f.write('{0!r} {1!r} {2!r} 10 20 30\n'.format(*p))
+    ply = str(tmpdir.join('hull.ply'))
+    write_ply(ply, points)
+
+    for filename in (xyz, ply):
+        read = [p for block in offsets_scan.read_points(filename, 300)
+                for p in block]
+        assert read == points
+
+    with pytest.raises(ValueError):
+        offsets_scan.axes_order('xxz')
+
+
+def test_scan_table(tmpdir):
+    ply = str(tmpdir.join('hull.ply'))
+    write_ply(ply, list(hull_points()))
+    stations, heights, widths = offsets_scan.scan_table(
+        ply, [10.0, 50.0, 90.0], waterlines=[2.0, 6.0], buttocks=[2.0],
+        slab=0.5, resolution=0.1)
+
+    heights = dict(heights)
+    widths = dict(widths)
+    assert list(heights) == ['sheer', 'wl6', 'wl2', 'bt2', 'keel']
+    for k, station in enumerate(stations):
+        for h in (2.0, 6.0):
+            assert widths['wl{0:g}'.format(h)][k] == pytest.approx(
+                expected_width(station, h), abs=0.05)
+        assert heights['sheer'][k] == pytest.approx(9.0, abs=0.1)
+        assert heights['keel'][k] == pytest.approx(0.0, abs=0.05)
+
+    # the table reads back into the pipeline
+    filename = str(tmpdir.join('hull.csv'))
+    offsets_scan.write_table(filename, stations, list(heights.items()),
+                             list(widths.items()))
+    lines, line_order, _ = offsets_reader.parse_csv_offsets(filename)
+    assert line_order == ['sheer', 'wl6', 'wl2', 'bt2', 'keel']
+    assert [p[2] for p in lines['wl6']] == pytest.approx(stations)
+
+    # even stations need a pass to find the length of the scan
+    stations, heights, widths = offsets_scan.scan_table(ply, count=5)
+    assert len(stations) == 5
+    assert stations[0] == pytest.approx(0.25, abs=0.05)
+    assert stations[-1] == pytest.approx(99.75, abs=0.05)
+
+    # a single station has no spacing
+    assert linestable.main(['scan', ply, filename, '-n', '1']) == 2
+
+
+def test_mixed_lines(tmpdir):
+    # waterlines and buttocks cross along the length, each section must
+    # still run round its girth without crossing itself
+    ply = str(tmpdir.join('hull.ply'))
+    write_ply(ply, list(hull_points()))
+    stations, heights, widths = offsets_scan.scan_table(
+        ply, [5.0, 10.0, 50.0, 90.0, 95.0], waterlines=[2.0, 6.0],
+        buttocks=[2.0, 4.0], slab=0.5, resolution=0.1)
+    assert [name for name, _ in heights] == \
+        ['sheer', 'wl6', 'bt4', 'wl2', 'bt2', 'keel']
+    # toward the ends the narrower hull puts bt2 above wl2
+    assert dict(heights)['bt2'][0] is None
+
+    filename = str(tmpdir.join('hull.csv'))
+    offsets_scan.write_table(filename, stations, heights, widths)
+    problems = offsets_validate.validate(filename)
+    assert not [p for p in problems if p.level == offsets_validate.ERROR]
@@ -0,0 +1,107 @@
+'''
+The conversion service must return the same results as the scripts and
+answer repeated requests from its cache
+'''
+
+import asyncio
+import json
+import os
+import threading
+
+import pytest
+
+import offsets_hydro
+import offsets_mesh
+import offsets_reader
+import offsets_service
+
+TESTDATA = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        os.pardir, 'testdata')
+
+
+@pytest.fixture
+def server(tmpdir):
+    '''A service on a Unix socket, converting on a thread'''
+    path = str(tmpdir.join('service.sock'))
+    service = offsets_service.ConversionService(workers=0)
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    listening = asyncio.run_coroutine_threadsafe(
+        offsets_service.start_server(service, path=path), loop).result(5)
+    yield service, path
+
+    asyncio.run_coroutine_threadsafe(shutdown(listening), loop).result(5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+    loop.close()
+
+
+async def shutdown(listening):
+    '''Stop listening and finish the connections still open, so each
+    handler closes its writer while the loop runs'''
+    listening.close()
+    await listening.wait_closed()
+    handlers = [task for task in asyncio.all_tasks()
+                if task is not asyncio.current_task()]
+    for task in handlers:
+        task.cancel()
+    await asyncio.gather(*handlers, return_exceptions=True)
+    # let the transports finish closing
+    await asyncio.sleep(0)
+
+
+def table(name):
+    with open(os.path.join(TESTDATA, name)) as f:
+        return f.read()
+
+
+def test_json_and_cache(server):
+    service, path = server
+    text = table('SportDoryWithAngle.csv')
+    offset_data = offsets_reader.rake_ends(offsets_reader.offset_reader(
+        os.path.join(TESTDATA, 'SportDoryWithAngle.csv')))
+
+    first = offsets_service.request('json', text, path=path)
+    assert first == json.dumps(offset_data).encode('utf-8')
+    assert offsets_service.request('json', text, path=path) == first
+    assert service.counters['misses'] == 1
+    assert service.counters['hits'] == 1
+
+    offsets_service.request('json', text, path=path, precision='1/64')
+    assert service.counters['misses'] == 2
+
+
+def test_stl_and_hydro(server):
+    service, path = server
+    text = table('Cartopper.csv')
+    offset_data = offsets_reader.offset_reader(
+        os.path.join(TESTDATA, 'Cartopper.csv'))
+
+    hydro = json.loads(offsets_service.request('hydro', text, path=path))
+    expected = offsets_hydro.hydrostatics(offset_data['sections'])
+    assert hydro['volume'] == pytest.approx(expected['volume'])
+
+    stl = offsets_service.request('stl', text, path=path, full=1)
+    triangles = offsets_mesh.hull_triangles(
+        offsets_reader.rake_ends(offset_data)['sections'], False)
+    assert len(stl) == 84 + 50 * len(triangles)
+
+
+def test_errors(server):
+    service, path = server
+    with pytest.raises(RuntimeError):
+        offsets_service.request('dxf', table('Cartopper.csv'), path=path)
+    with pytest.raises(RuntimeError):
+        offsets_service.request('json', 'not,a\ntable', path=path)
+
+
+def test_lru_cache():
+    cache = offsets_service.LRUCache(maxsize=2, maxbytes=10)
+    cache.put('a', b'1234')
+    cache.put('b', b'1234')
+    assert cache.get('a') == b'1234'
+    cache.put('c', b'1234')
+    assert 'b' not in cache and 'a' in cache
+    cache.put('d', b'12345678')
+    assert len(cache) == 1 and cache.nbytes == 8
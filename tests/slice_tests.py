@@ -0,0 +1,103 @@
+'''
+Slicing a mesh made from a table must give back the offsets of the
+table
+'''
+
+import os
+
+import pytest
+
+import offsets_mesh
+import offsets_reader
+import offsets_scan
+import offsets_slice
+import offsets_validate
+
+TESTDATA = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        os.pardir, 'testdata')
+
+
+def test_chain_segments():
+    square = [((0, 0), (1, 0)), ((1, 1), (0, 1)), ((1, 0), (1, 1)),
+              ((0, 1), (0, 0))]
+    lines = offsets_slice.chain_segments(square)
+    assert len(lines) == 1 and len(lines[0]) == 5
+    assert lines[0][0] == lines[0][-1]
+
+    # an open chain is walked from one loose end to the other
+    open_chain = [((1, 0), (2, 0)), ((3, 0), (2, 0)), ((0, 0), (1, 0))]
+    lines = offsets_slice.chain_segments(open_chain)
+    assert lines in ([[(0, 0), (1, 0), (2, 0), (3, 0)]],
+                     [[(3, 0), (2, 0), (1, 0), (0, 0)]])
+
+
+@pytest.mark.parametrize('binary', [True, False])
+def test_slice_table(tmpdir, binary):
+    offset_data = offsets_reader.offset_reader(
+        os.path.join(TESTDATA, 'SportDory.csv'))
+    filename = str(tmpdir.join('dory.stl'))
+    offsets_mesh.export_stl(offset_data, filename, half_hull=False,
+                            binary=binary)
+
+    sections = offset_data['sections'][1:-1]
+    stations = [s[0][2] for s in sections]
+    stations, heights, widths = offsets_slice.slice_table(
+        filename, stations, waterlines=[1.0], buttocks=[1.0])
+    table = str(tmpdir.join('dory.csv'))
+    offsets_scan.write_table(table, stations, heights, widths)
+    assert not [p for p in offsets_validate.validate(table)
+                if p.level == offsets_validate.ERROR]
+
+    # each section runs round its girth from the sheer down to the keel
+    assert [name for name, _ in heights] == ['sheer', 'wl1', 'bt1', 'keel']
+    heights = dict(heights)
+    widths = dict(widths)
+    for k in range(len(stations)):
+        points = [(widths[name][k], heights[name][k]) for name in heights
+                  if heights[name][k] is not None]
+        assert points == sorted(points, reverse=True)
+    for k, section in enumerate(sections):
+        sheer, bottom = section[0], section[-1]
+        assert widths['sheer'][k] == pytest.approx(sheer[0], abs=1e-5)
+        assert heights['sheer'][k] == pytest.approx(sheer[1], abs=1e-5)
+        assert heights['keel'][k] == pytest.approx(bottom[1], abs=1e-5)
+        if bottom[1] < 1.0:
+            assert heights['wl1'][k] == 1.0
+        else:
+            assert heights['wl1'][k] is None
+
+    # a waterline reads the half breadth off the section between points
+    section = sections[2]
+    for p, q in zip(section, section[1:]):
+        if (p[1] - 1.0) * (q[1] - 1.0) < 0:
+            width = p[0] + (1.0 - p[1]) / (q[1] - p[1]) * (q[0] - p[0])
+    assert widths['wl1'][2] == pytest.approx(width, abs=1e-5)
+
+    # even stations fall just inside the ends of the mesh
+    stations, heights, widths = offsets_slice.slice_table(filename, count=5)
+    assert stations[0] == pytest.approx(0.0, abs=0.01)
+    assert stations[-1] == pytest.approx(21.0, abs=0.01)
+    assert None not in dict(heights)['sheer']
+
+
+def test_between_stations(tmpdir):
+    # the mesh joins sheer to sheer and keel to keel, so halfway between
+    # stations it is halfway between the lines, the transom bay too
+    offset_data = offsets_reader.offset_reader(
+        os.path.join(TESTDATA, 'SportDory.csv'))
+    filename = str(tmpdir.join('dory.stl'))
+    offsets_mesh.export_stl(offset_data, filename, half_hull=False)
+
+    sections = offset_data['sections']
+    stations = [(s0[0][2] + s1[0][2]) / 2.0
+                for s0, s1 in zip(sections, sections[1:])]
+    stations, heights, widths = offsets_slice.slice_table(filename, stations)
+    heights = dict(heights)
+    widths = dict(widths)
+    for k, (s0, s1) in enumerate(zip(sections, sections[1:])):
+        assert widths['sheer'][k] == pytest.approx(
+            (s0[0][0] + s1[0][0]) / 2.0, abs=1e-5)
+        assert heights['sheer'][k] == pytest.approx(
+            (s0[0][1] + s1[0][1]) / 2.0, abs=1e-5)
+        assert heights['keel'][k] == pytest.approx(
+            (s0[-1][1] + s1[-1][1]) / 2.0, abs=1e-5)
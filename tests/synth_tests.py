@@ -0,0 +1,39 @@
+'''
+Synthetic tables must read back through parse_csv_offsets()
+'''
+
+import offsets_reader
+import offsets_synth
+
+
+def test_di_to_fie():
+    assert offsets_reader.di_to_fie(0.0) == '0-0-0'
+    assert offsets_reader.di_to_fie(52.5) == '4-4-4'
+    assert offsets_reader.di_to_fie(11.97) == '1-0-0'
+    for d in ['0-0-1', '1-7-4', '11-6-0', '0-11-7']:
+        assert offsets_reader.di_to_fie(offsets_reader.fie_to_di(d)) == d
+
+
+def test_generated_table_parses(tmpdir):
+    filename = str(tmpdir.join('hull.csv'))
+    offsets_synth.generate(filename, stations=21, lines=6, gaps=3)
+    lines, line_order, angles = offsets_reader.parse_csv_offsets(filename)
+
+    assert line_order == ['sheer', 'chine', 'line1', 'line2', 'line3', 'keel']
+    assert angles is None
+    assert all(len(points) == 21 for points in lines.values())
+    assert lines['keel'][-3:] == [[], [], []]
+    assert all(lines['sheer'])
+
+
+def test_generated_fie_table(tmpdir):
+    filename = str(tmpdir.join('hull.csv'))
+    offsets_synth.generate(filename, units='fie', stations=9, lines=3,
+                           chines=0, length=96.0)
+    lines, line_order, angles = offsets_reader.parse_csv_offsets(filename)
+
+    assert [p[2] for p in lines['sheer']] == [12.0 * i for i in range(9)]
+    # all values land on eighths of an inch
+    for points in lines.values():
+        for p in points:
+            assert all(v * 8 == int(v * 8) for v in p)
@@ -0,0 +1,90 @@
+'''
+OffsetTable must agree with the reader after any sequence of edits
+'''
+
+import glob
+import json
+import os
+
+import offsets_hydro
+import offsets_reader
+from offsets_table import OffsetTable
+
+TESTDATA = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        os.pardir, 'testdata')
+
+
+def reader_output(filename):
+    offset_data = offsets_reader.offset_reader(filename)
+    return json.dumps(offsets_reader.rake_ends(offset_data))
+
+
+def test_matches_reader():
+    for filename in glob.glob(os.path.join(TESTDATA, '*.csv')):
+        table = OffsetTable.from_csv(filename)
+        assert json.dumps(table.offset_data()) == reader_output(filename)
+
+
+def test_edits_are_tracked(tmpdir):
+    filename = os.path.join(TESTDATA, 'Cartopper.csv')
+    table = OffsetTable.from_csv(filename)
+    table.offset_data()
+    assert table.dirty() == (set(), set())
+
+    table.set_width('chine', 4, 22.0)
+    assert table.dirty() == ({4}, {'chine'})
+
+    # setting the same value again changes nothing
+    table.set_height('gunwale', 5, table.heights['gunwale'][5])
+    assert table.dirty() == ({4}, {'chine'})
+
+    section = table.section(4)
+    assert section[1] == (22.0, 20.75, 48.0)
+    assert table.dirty() == (set(), set())
+
+    # the edited table must match a fresh read of the same edit
+    with open(filename) as f:
+        text = f.read()
+    edited = str(tmpdir.join('edited.csv'))
+    with open(edited, 'w') as f:
+        f.write(text.replace('1-9-0,1-9-4', '1-10-0,1-9-4', 1))
+    assert json.dumps(table.offset_data()) == reader_output(edited)
+
+
+def test_missing_offsets():
+    table = OffsetTable.from_csv(os.path.join(TESTDATA, 'SportDory.csv'))
+    assert table.line('line1')[6] == []
+    n = len(table.section(6))
+
+    table.set_offset('line1', 6, 0.2, 1.5)
+    assert table.line('line1')[6] == (0.2, 1.5, 20.0)
+    assert len(table.section(6)) == n + 1
+
+    table.set_width('line1', 6, 'x')
+    assert len(table.section(6)) == n
+
+
+def test_angles_and_volume():
+    table = OffsetTable.from_csv(os.path.join(TESTDATA, 'Cartopper.csv'))
+    before = table.raked_end(0)
+    table.set_angles(bow_angle=80)
+    after = table.raked_end(0)
+    assert before[0] != after[0]
+    assert after == table.raked_end(0)
+
+    volume = table.volume()
+    areas = [offsets_hydro.section_area(s) for s in table.sections()]
+    assert abs(volume - offsets_hydro.volume(table.stations, areas)) < 1e-9
+
+    table.set_width('gunwale', 5, table.widths['gunwale'][5] + 1.0)
+    assert table.volume() > volume
+
+
+def test_to_csv(tmpdir):
+    out = str(tmpdir.join('edited.csv'))
+    table = OffsetTable.from_csv(os.path.join(TESTDATA,
+                                              'SportDoryWithAngle.csv'))
+    table.set_offset('sheer', 3, 3.1, 2.4)
+    table.set_station(7, 21.25)
+    table.to_csv(out)
+    assert OffsetTable.from_csv(out).offset_data() == table.offset_data()
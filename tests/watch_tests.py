@@ -0,0 +1,89 @@
+'''
+Incremental updates in watch mode must give the same files as a
+fresh conversion
+'''
+
+import argparse
+import os
+import shutil
+
+import offsets_reader
+import offsets_watch
+
+TESTDATA = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        os.pardir, 'testdata')
+
+
+def outputs(filename, exts=offsets_watch.OUTPUTS):
+    base = os.path.splitext(filename)[0]
+    result = {}
+    for ext in exts:
+        with open(base + '.' + ext, 'rb') as f:
+            result[ext] = f.read()
+    return result
+
+
+def edit_and_compare(tmpdir, table, old, new):
+    filename = str(tmpdir.join(table))
+    shutil.copy(os.path.join(TESTDATA, table), filename)
+
+    state = offsets_watch.HullState(filename)
+    state.update()
+
+    with open(filename) as f:
+        text = f.read()
+    assert old in text
+    with open(filename, 'w') as f:
+        f.write(text.replace(old, new, 1))
+
+    count = state.update()
+    incremental = outputs(filename)
+    offsets_watch.HullState(filename).update()
+    assert incremental == outputs(filename)
+
+    return count
+
+
+def test_json_matches_reader(tmpdir):
+    filename = str(tmpdir.join('Cartopper.csv'))
+    shutil.copy(os.path.join(TESTDATA, 'Cartopper.csv'), filename)
+    offsets_watch.HullState(filename, outputs=['json']).update()
+    watched = outputs(filename, ['json'])['json']
+
+    args = argparse.Namespace(filename=filename, bow_angle=90,
+                              transom_angle=90, precision=None,
+                              backend='json')
+    offsets_reader.main(args)
+    assert outputs(filename, ['json'])['json'] == watched
+
+
+def test_cell_edit(tmpdir):
+    count = edit_and_compare(tmpdir, 'Cartopper.csv', '1-8-6', '1-9-6')
+    assert count == 1
+
+
+def test_end_station_edit(tmpdir):
+    assert edit_and_compare(tmpdir, 'Cartopper.csv', '0-7-6', '0-7-7') == 1
+
+
+def test_fill_in_missing_cell(tmpdir):
+    count = edit_and_compare(tmpdir, 'SportDoryWithAngle.csv',
+                             '1.084,x', '1.084,1.5')
+    assert count == 0
+    count = edit_and_compare(tmpdir, 'SportDoryWithAngle.csv',
+                             '1.4,1.168', 'x,1.168')
+    assert count == 1
+
+
+def test_angle_edit(tmpdir):
+    count = edit_and_compare(tmpdir, 'SportDoryWithAngle.csv',
+                             'angle,,45', 'angle,,50')
+    assert count == 2
+
+
+def test_unchanged(tmpdir):
+    filename = str(tmpdir.join('Cartopper.csv'))
+    shutil.copy(os.path.join(TESTDATA, 'Cartopper.csv'), filename)
+    state = offsets_watch.HullState(filename)
+    assert state.update() == 13
+    assert state.update() == 0
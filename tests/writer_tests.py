@@ -0,0 +1,121 @@
+'''
+The streaming JSON writer must load the same as json.dump() and stay
+within the requested precision
+'''
+
+import glob
+import io
+import json
+import os
+import shutil
+
+import pytest
+
+import linestable
+import offsets_reader
+import offsets_watch
+import offsets_writer
+
+TESTDATA = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        os.pardir, 'testdata')
+
+
+def reader_output(filename):
+    return offsets_reader.rake_ends(offsets_reader.offset_reader(filename))
+
+
+def written(offset_data, precision=None, backend='json'):
+    opf = io.StringIO()
+    offsets_writer.write_json(opf, offset_data, precision, backend)
+    return opf.getvalue()
+
+
+def test_full_precision_matches_json_dump():
+    for filename in glob.glob(os.path.join(TESTDATA, '*.csv')):
+        offset_data = reader_output(filename)
+        assert written(offset_data) == json.dumps(offset_data)
+
+
+def test_precision():
+    assert offsets_writer.parse_precision('1/64') == 1 / 64.0
+    assert offsets_writer.parse_precision('0.01') == 0.01
+    assert offsets_writer.parse_precision('0') is None
+    assert offsets_writer.decimals(1 / 64.0) == 2
+
+    offset_data = reader_output(os.path.join(TESTDATA, 'SportDory.csv'))
+    text = written(offset_data, 1 / 64.0)
+    assert len(text) < len(json.dumps(offset_data))
+
+    rounded = json.loads(text)
+    for s0, s1 in zip(offset_data['sections'], rounded['sections']):
+        for p0, p1 in zip(s0, s1):
+            assert all(abs(a - b) <= 1 / 128.0 for a, b in zip(p0, p1))
+
+
+@pytest.mark.skipif(
+    offsets_writer.resolve_backend('auto') != 'orjson',
+    reason='orjson is not installed')
+def test_orjson_backend():
+    offset_data = reader_output(
+        os.path.join(TESTDATA, 'SportDoryWithAngle.csv'))
+    for precision in [None, 0.01]:
+        assert (json.loads(written(offset_data, precision, 'orjson')) ==
+                json.loads(written(offset_data, precision)))
+
+
+def test_watch_precision(tmpdir):
+    filename = str(tmpdir.join('Cartopper.csv'))
+    shutil.copy(os.path.join(TESTDATA, 'Cartopper.csv'), filename)
+    offsets_watch.HullState(filename, outputs=['json'],
+                            precision=0.01).update()
+    with open(str(tmpdir.join('Cartopper.json'))) as f:
+        assert f.read() == written(reader_output(filename), 0.01)
+
+
+def test_table_round_trip(tmpdir):
+    out = str(tmpdir.join('table.csv'))
+    for filename in glob.glob(os.path.join(TESTDATA, '*.csv')):
+        lines, line_order, angles = offsets_reader.parse_csv_offsets(filename)
+        offsets_writer.export_table(lines, out, line_order, angles)
+        assert offsets_reader.parse_csv_offsets(out) == (lines, line_order,
+                                                         angles)
+
+        # feet-inches-eighths round to the nearest eighth once, after
+        # that the table reads back the same
+        offsets_writer.export_table(lines, out, line_order, angles,
+                                    units='fie')
+        rounded = offsets_reader.parse_csv_offsets(out)
+        for name in lines:
+            for p0, p1 in zip(lines[name], rounded[0][name]):
+                assert all(abs(a - b) <= 1 / 16.0 for a, b in zip(p0, p1))
+        offsets_writer.export_table(rounded[0], out, rounded[1], rounded[2],
+                                    units='fie')
+        assert offsets_reader.parse_csv_offsets(out) == rounded
+
+    # a table in feet-inches-eighths is already on eighths
+    filename = os.path.join(TESTDATA, 'Cartopper.csv')
+    lines, line_order, angles = offsets_reader.parse_csv_offsets(filename)
+    offsets_writer.export_table(lines, out, line_order, angles, units='fie')
+    assert offsets_reader.parse_csv_offsets(out)[0] == lines
+
+
+def test_fie_cells():
+    fmt = offsets_writer.cell_formatter('fie')
+    assert offsets_writer.format_cells([137.9375, 0.0, None, 'x', -1.3],
+                                       fmt) == ['11-6-0', '0-0-0', 'x', 'x',
+                                                '-1.25']
+    assert offsets_writer.format_cells(
+        [0.1 + 0.2], offsets_writer.cell_formatter()) == [repr(0.1 + 0.2)]
+    # the reader converts the same way
+    assert offsets_reader.di_to_fie(-1.3) == '-1.25'
+
+
+def test_table_labels(tmpdir):
+    # linestable table keeps the station names of the header row
+    filename = os.path.join(TESTDATA, 'SportDoryWithAngle.csv')
+    out = str(tmpdir.join('new.csv'))
+    assert linestable.main(['table', filename, '-o', out]) == 0
+    with open(out) as f:
+        header = f.readline().strip().split(',')
+    assert header == ['axis', 'name', 'Transom', '1', '2', '3', '4', '5',
+                      '5.5', 'Stem']